@@ -1,5 +1,11 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Stdlib packages the app never imports. Keep http/urllib, asyncio and multiprocessing (batch mode uses it).
+EXCLUDES = ['unittest', 'doctest', 'pydoc', 'pydoc_data', 'pdb', 'lib2to3', 'idlelib', 'turtle', 'turtledemo',
+            'tkinter.test', 'test', 'sqlite3', 'distutils', 'setuptools', 'pip', 'ensurepip', 'venv', 'curses',
+            'xmlrpc', 'ftplib', 'imaplib', 'smtplib', 'mailbox', 'tomllib', 'pickletools']
+# Tcl/Tk payload the app does not use: time zone database, message catalogues, demos and sample images.
+TCL_UNUSED = ('tzdata', 'msgs', 'demos', 'images', 'sample')
 
 a = Analysis(
     ['main.py'],
@@ -10,10 +16,13 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
+a.datas = [d for d in a.datas
+           if not (d[0].replace('\\', '/').startswith(('_tcl_data/', '_tk_data/', 'tcl/', 'tk/'))
+                   and any(part in TCL_UNUSED for part in d[0].replace('\\', '/').split('/')))]
 pyz = PYZ(a.pure)
 
 exe = EXE(
@@ -0,0 +1 @@
+# Synthetic-data benchmarks for the conversion stages (python -m benchmarks.run)
@@ -0,0 +1,160 @@
+import argparse  # Command-line options
+import json  # Results and baseline format
+import os  # Used for file system path operations
+import platform  # Recorded with the results (timings only compare on similar machines)
+import sys  # Exit codes
+import tempfile  # Synthetic files are written to a scratch folder
+import time  # Stage timings
+import tracemalloc  # Peak memory per stage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Run from anywhere
+
+from benchmarks.synth import DELIMITERS, ENCODINGS, Scenario, generate
+from examsoft_to_blackboard.audit import AuditState
+from examsoft_to_blackboard.core import merge_scores, write_audit_report, write_import
+from examsoft_to_blackboard.csvio import open_csv, parse_csv
+from examsoft_to_blackboard.headers import ColumnSchema, score_columns, target_columns
+from examsoft_to_blackboard.roster import RosterIndex
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = [100, 10000, 100000]
+STAGES = ["parse", "index", "match", "dedup", "write", "audit_report"]
+
+
+def run_stages(es_path, bb_path, out_dir, measure):  # Run the conversion stage by stage as the app does
+    # measure(stage, fn) runs fn() and returns its result; the stages share their outputs like the GUI's
+    # "Generate" path: parse ExamSoft, index the gradebook, instant audit, merge/dedup, write the two files.
+    es_rows, es_headers = measure("parse", lambda: parse_csv(es_path))
+
+    def _index():
+        with open_csv(bb_path) as (headers, rows):
+            return RosterIndex.build(rows, headers)
+
+    roster = measure("index", _index)
+    schema = ColumnSchema(es_headers, score_columns(es_headers)[1])
+
+    def _match():
+        audit = AuditState()
+        audit.set_examsoft(es_rows, schema)
+        audit.set_roster(roster)
+        return audit.counts()
+
+    measure("match", _match)
+    res = measure("dedup", lambda: merge_scores(es_rows, schema, roster))
+    out = os.path.join(out_dir, "BB_Import.csv")
+    measure("write", lambda: write_import(out, res["rows"], target_columns(roster.headers)[0]))
+    measure("audit_report", lambda: write_audit_report(out, res))
+    return len(es_rows), roster.row_count
+
+
+def bench(scenario, repeat=3, memory=True, work_dir=None):  # {"scenario", "stages": {stage: metrics}}
+    # Each stage keeps its best time over `repeat` runs. Peak memory comes from one extra run under
+    # tracemalloc (kept separate because tracing slows every allocation down).
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        es_path, bb_path = os.path.join(tmp, "examsoft.csv"), os.path.join(tmp, "gradebook.csv")
+        es_count, bb_count = generate(scenario, es_path, bb_path)
+        seconds = {}
+
+        def timed(stage, fn):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            seconds[stage] = min(seconds.get(stage, elapsed), elapsed)
+            return result
+
+        for _ in range(max(1, repeat)): run_stages(es_path, bb_path, tmp, timed)
+
+        peaks = {}
+
+        def traced(stage, fn):
+            tracemalloc.start()
+            try:
+                result = fn()
+                peaks[stage] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            return result
+
+        if memory: run_stages(es_path, bb_path, tmp, traced)
+        sizes = {"examsoft_mb": os.path.getsize(es_path) / 1e6, "gradebook_mb": os.path.getsize(bb_path) / 1e6}
+
+    stages = {}
+    for stage in STAGES:
+        rows = bb_count if stage == "index" else es_count
+        metrics = {"seconds": round(seconds[stage], 6),
+                   "rows_per_sec": round(rows / seconds[stage]) if seconds[stage] else None}
+        if memory: metrics["peak_mb"] = round(peaks[stage] / 1e6, 3)
+        stages[stage] = metrics
+    return {"scenario": dict(scenario.as_dict(), gradebook_rows=bb_count,
+                             **{k: round(v, 3) for k, v in sizes.items()}), "stages": stages}
+
+
+def compare(results, baseline, tolerance):  # Human-readable regressions against a saved baseline
+    # A stage regresses when it is more than `tolerance` (0.25 = 25%) slower, or uses that much more memory,
+    # than the baseline run for the same row count. Tiny stages (under 5 ms) are skipped: they are noise.
+    old = {str(r["scenario"]["rows"]): r["stages"] for r in baseline.get("results", [])}
+    problems = []
+    for r in results:
+        rows = str(r["scenario"]["rows"])
+        if rows not in old: continue
+        for stage, new in r["stages"].items():
+            base = old[rows].get(stage)
+            if not base: continue
+            if new["seconds"] >= 0.005 and new["seconds"] > base["seconds"] * (1 + tolerance):
+                problems.append(f"{rows} rows / {stage}: {new['seconds']:.4f}s vs {base['seconds']:.4f}s")
+            if "peak_mb" in new and base.get("peak_mb") and new["peak_mb"] >= 1 and \
+                    new["peak_mb"] > base["peak_mb"] * (1 + tolerance):
+                problems.append(f"{rows} rows / {stage}: {new['peak_mb']:.1f} MB vs {base['peak_mb']:.1f} MB")
+    return problems
+
+
+def print_table(result):  # One block per scenario
+    s = result["scenario"]
+    print(f"\n{s['rows']} rows ({s['students']} students, {s['gradebook_rows']} in gradebook, "
+          f"{s['encoding']}, {s['delimiter']!r})")
+    for stage, m in result["stages"].items():
+        peak = f"{m['peak_mb']:9.2f} MB" if "peak_mb" in m else ""
+        print(f"  {stage:<13}{m['seconds']:10.4f} s {m['rows_per_sec'] or 0:>12,} rows/s {peak}")
+
+
+def build_parser():  # Define the command-line interface
+    parser = argparse.ArgumentParser(prog="benchmarks.run",
+                                     description="Time each conversion stage on synthetic exports.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="ExamSoft row counts (default: 100 10000 100000; up to 1000000)")
+    parser.add_argument("--retake-rate", type=float, default=0.05, help="Extra attempts per student (default 0.05)")
+    parser.add_argument("--mismatch-rate", type=float, default=0.02,
+                        help="Share of students in only one of the two files (default 0.02)")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="utf-8-sig")
+    parser.add_argument("--delimiter", choices=sorted(DELIMITERS), default="comma")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the best is kept")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--out", help="Write the results as JSON (e.g. benchmarks/baseline.json)")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH,
+                        help="Fail when a stage is slower than the baseline (default file: benchmarks/baseline.json)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before --compare fails")
+    return parser
+
+
+def main(argv=None):  # Entry point: python -m benchmarks.run
+    args = build_parser().parse_args(argv)
+    results = []
+    for rows in args.sizes:
+        scenario = Scenario(rows, args.retake_rate, args.mismatch_rate, args.encoding, DELIMITERS[args.delimiter])
+        results.append(bench(scenario, args.repeat, not args.no_memory))
+        print_table(results[-1])
+    report = {"python": platform.python_version(), "platform": platform.platform(), "results": results}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for p in problems: print(f"REGRESSION {p}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import argparse  # Command-line options
+import json  # Results and baseline format
+import os  # Used for file system path operations
+import platform  # Recorded with the results (timings only compare on similar machines)
+import statistics  # Median over the runs
+import subprocess  # Every measurement runs in a fresh process
+import sys  # Exit codes and the interpreter to launch
+import tempfile  # Scratch working folder, so the app's log and config files land outside the repo
+import time  # Wall-clock timings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+PROBE_ENV = "EXAMSOFT_STARTUP_PROBE"  # main.py closes its window as soon as it is drawn when this is set
+IMPORT_SCRIPT = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def _env(home):  # Environment for a measured process: the repo on the path, a throwaway home folder
+    env = dict(os.environ, PYTHONPATH=ROOT, HOME=home, USERPROFILE=home)
+    env.pop("EXAMSOFT_PROFILE", None)
+    env[PROBE_ENV] = "1"
+    return env
+
+
+def has_display():  # Tk can open a window here
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def measure(name, cmd, runs, cwd, env, reported=False):  # Median seconds of `runs` fresh processes (one warm-up)
+    # With reported=True the process prints its own timing (seconds) on stdout; otherwise wall time is used.
+    times = []
+    for i in range(runs + 1):
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError(f"{name} failed: {proc.stderr.strip().splitlines()[-1:] or proc.returncode}")
+        if i: times.append(float(proc.stdout.split()[-1]) if reported else elapsed)  # The first run warms caches
+    return {"seconds": round(statistics.median(times), 4), "min": round(min(times), 4), "runs": runs}
+
+
+def bench(runs=10, exe=None, window=None):  # {check: {"seconds", "min", "runs"}}
+    # import: `import main` inside a running interpreter (module-level work: imports, logging, metrics sink).
+    # process: interpreter start + import, as seen from outside. window: launch main.py until the first window
+    # is drawn (needs a display). exe: the same for a PyInstaller build, which adds the one-file unpacking.
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(tmp)
+        results["import"] = measure("import", [sys.executable, "-c", IMPORT_SCRIPT], runs, tmp, env, reported=True)
+        results["process"] = measure("process", [sys.executable, "-c", "import main"], runs, tmp, env)
+        if window if window is not None else has_display():
+            results["window"] = measure("window", [sys.executable, os.path.join(ROOT, "main.py")], runs, tmp, env)
+        if exe: results["exe"] = measure("exe", [os.path.abspath(exe)], runs, tmp, env)
+    return results
+
+
+def compare(results, baseline, tolerance):  # Human-readable regressions against a saved baseline
+    # Checks under 20 ms are skipped: process start-up jitter is larger than any change there.
+    problems = []
+    for check, new in results.items():
+        base = baseline.get("results", {}).get(check)
+        if base and new["seconds"] >= 0.02 and new["seconds"] > base["seconds"] * (1 + tolerance):
+            problems.append(f"{check}: {new['seconds']:.4f}s vs {base['seconds']:.4f}s")
+    return problems
+
+
+def build_parser():  # Define the command-line interface
+    parser = argparse.ArgumentParser(prog="benchmarks.startup", description="Time how long the app takes to start.")
+    parser.add_argument("--runs", type=int, default=10, help="Launches per check; the median is kept (default 10)")
+    parser.add_argument("--exe", help="Also time a PyInstaller build, e.g. dist/ExamSoft_To_Blackboard_Converter.exe")
+    parser.add_argument("--no-window", dest="window", action="store_false", default=None,
+                        help="Skip the window launch even when a display is available")
+    parser.add_argument("--out", help="Write the results as JSON (e.g. benchmarks/startup_baseline.json)")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH,
+                        help="Fail when startup is slower than the baseline (default: benchmarks/startup_baseline.json)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before --compare fails")
+    return parser
+
+
+def main(argv=None):  # Entry point: python -m benchmarks.startup
+    args = build_parser().parse_args(argv)
+    results = bench(args.runs, args.exe, args.window)
+    for check, m in results.items():
+        print(f"  {check:<9}{m['seconds'] * 1000:9.1f} ms  (min {m['min'] * 1000:.1f} ms, {m['runs']} runs)")
+    report = {"python": platform.python_version(), "platform": platform.platform(), "results": results}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for p in problems: print(f"REGRESSION {p}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
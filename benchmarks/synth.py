@@ -0,0 +1,70 @@
+import csv  # Used for writing the synthetic exports
+import random  # Seeded so every run generates the same files
+
+FIRST_NAMES = ["Stacy", "Nolan", "Maria", "José", "Chen", "Aisha", "Liam", "Zoë", "Ravi", "Hannah", "Omar", "Léa",
+               "Tyler", "Mei", "Kwame", "Sofia"]
+LAST_NAMES = ["Garcia", "Lopez", "Smith", "Nguyen", "Müller", "O'Brien", "Patel", "Kim", "Johnson", "Brown",
+              "Dubois", "Okafor", "Rossi", "Jensen", "Novák", "Tanaka"]
+EXAMSOFT_HEADERS = ["StudentID", "Last Name", "First Name", "Email", "Pts", "Letter", "%", "Raw"]
+GRADEBOOK_HEADERS = ["Last Name", "First Name", "Username", "Student ID", "Last Access", "Availability",
+                     "Quiz 2026-01-09 [Total Pts: 100 Percentage] |1736330",
+                     "Exam 2026-01-09 [Total Pts: 100 Percentage] |1736331",
+                     "Quiz 2026-01-14 [Total Pts: 100 Percentage] |1736721",
+                     "Exam 2026-01-14 [Total Pts: 100 Percentage] |1736722"]
+ENCODINGS = ["utf-8-sig", "utf-8", "latin-1"]  # ExamSoft writes a BOM; hand-saved files often do not
+DELIMITERS = {"comma": ",", "semicolon": ";", "tab": "\t"}
+
+
+class Scenario:  # Shape of one synthetic ExamSoft export + Blackboard gradebook pair
+    # rows: ExamSoft data rows (attempts), retake_rate: extra attempts per student, mismatch_rate: share of
+    # students that are only in one of the two files (half ExamSoft-only, half gradebook-only).
+    def __init__(self, rows, retake_rate=0.05, mismatch_rate=0.02, encoding="utf-8-sig", delimiter=",",
+                 seed=1):  # Define a function
+        self.rows, self.retake_rate, self.mismatch_rate = rows, retake_rate, mismatch_rate
+        self.encoding, self.delimiter, self.seed = encoding, delimiter, seed
+
+    @property
+    def students(self):  # Distinct students taking the exam
+        return max(1, round(self.rows / (1 + self.retake_rate)))
+
+    def as_dict(self):  # Recorded next to the results
+        return {"rows": self.rows, "students": self.students, "retake_rate": self.retake_rate,
+                "mismatch_rate": self.mismatch_rate, "encoding": self.encoding, "delimiter": self.delimiter}
+
+
+def _student(i, rnd):  # (last, first, username, student id) for student number i
+    first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+    return last, first, f"s{i:07d}", str(20000000 + i)
+
+
+def _score(rnd):  # ExamSoft score cells: (pts, letter, %, raw), with the odd blank or decimal value
+    roll = rnd.random()
+    if roll < 0.02: return "", "", "", ""
+    pct = 0 if roll < 0.05 else round(rnd.uniform(40, 100), 1) if roll < 0.25 else rnd.randint(40, 100)
+    letter = "A" if pct >= 90 else "B" if pct >= 80 else "C" if pct >= 70 else "F"
+    return round(pct * 0.75, 2), letter, pct, round(pct * 0.38)
+
+
+def generate(scenario, examsoft_path, gradebook_path):  # Write both files; returns (examsoft rows, gradebook rows)
+    rnd = random.Random(scenario.seed)
+    n = scenario.students
+    students = [_student(i, rnd) for i in range(n)]
+    split = int(n * scenario.mismatch_rate / 2)
+    es_students = students[split:]  # The first `split` students are gradebook-only
+    bb_students = students[:n - split]  # The last `split` students are ExamSoft-only
+    attempts = es_students + [rnd.choice(es_students) for _ in range(scenario.rows - len(es_students))]
+    rnd.shuffle(attempts)
+
+    with open(examsoft_path, 'w', newline='', encoding=scenario.encoding) as f:
+        writer = csv.writer(f, delimiter=scenario.delimiter)
+        writer.writerow(EXAMSOFT_HEADERS)
+        for last, first, username, sid in attempts:
+            writer.writerow([sid, last, first, f"{username}@example.edu", *_score(rnd)])
+
+    with open(gradebook_path, 'w', newline='', encoding=scenario.encoding) as f:
+        writer = csv.writer(f, delimiter=scenario.delimiter)
+        writer.writerow(GRADEBOOK_HEADERS)
+        blanks = [""] * (len(GRADEBOOK_HEADERS) - 6)
+        for last, first, username, sid in bb_students:
+            writer.writerow([last, first, username, sid, "12/16/2025 12:56", "Yes", *blanks])
+    return len(attempts), len(bb_students)
@@ -0,0 +1,82 @@
+import argparse  # Command-line options
+import csv  # Reads back the import file to check what the server received
+import json  # Results format
+import os  # Used for file system path operations
+import platform  # Recorded with the results
+import sys  # Exit codes
+import tempfile  # Synthetic files are written to a scratch folder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Run from anywhere
+
+from benchmarks.synth import Scenario, generate
+from examsoft_to_blackboard.core import convert
+from examsoft_to_blackboard.mockserver import MockGradebookServer
+from examsoft_to_blackboard.upload import GradebookClient, upload_import
+
+
+def expected_grades(import_path, server):  # {(column ID, username): score} the server should end up with
+    with open(import_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    target = rows[0][-1]
+    cid = next(c for c, name in server.columns.items() if target.startswith(name))
+    return {(cid, r[2]): float(r[-1]) for r in rows[1:] if r[2] in server.users and r[-1]}
+
+
+def bench(rows, workers, batch_size, latency, fail_rate, throttle_every):  # [{run metrics}], one per worker count
+    # One synthetic exam is converted once; then, for every worker count, a fresh mock server receives the
+    # whole import and its grade table is compared with the file.
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        es_path, bb_path = os.path.join(tmp, "examsoft.csv"), os.path.join(tmp, "gradebook.csv")
+        generate(Scenario(rows), es_path, bb_path)
+        out = os.path.join(tmp, "BB_Import.csv")
+        convert(es_path, bb_path, out, allow_zeros=True, index_dir=None)
+        for w in workers:
+            with MockGradebookServer.from_gradebook(bb_path, latency=latency, fail_rate=fail_rate,
+                                                    throttle_every=throttle_every) as server:
+                with GradebookClient(server.url, server.course_id, key=server.key, secret=server.secret,
+                                     workers=w, batch_size=batch_size, backoff=0.01) as client:
+                    summary = upload_import(out, client)[0]
+                    opened = client.pool.opened
+                expected = expected_grades(out, server)
+                ok = all(server.grades.get(k) == v for k, v in expected.items())
+                results.append({"workers": w, "grades": summary["sent"], "seconds": summary["seconds"],
+                                "grades_per_s": round(summary["sent"] / summary["seconds"]) if summary["seconds"] else 0,
+                                "failed": len(summary["failed"]), "retries": summary["retries"],
+                                "requests": server.requests, "connections": opened,
+                                "peak_in_flight": server.peak_in_flight, "verified": ok and len(expected) == summary["sent"]})
+    return results
+
+
+def build_parser():  # Define the command-line interface
+    parser = argparse.ArgumentParser(prog="benchmarks.upload",
+                                     description="Upload a synthetic exam to the local mock gradebook API and check it.")
+    parser.add_argument("--rows", type=int, default=20000, help="ExamSoft rows in the synthetic exam (default 20000)")
+    parser.add_argument("--workers", default="1,8,32", help="Comma-separated worker counts to compare (default 1,8,32)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Grades per worker batch (default 50)")
+    parser.add_argument("--latency", type=float, default=0.002,
+                        help="Seconds the server waits per request, standing in for the network (default 0.002)")
+    parser.add_argument("--fail-rate", type=float, default=0.01, help="Share of requests answered 503 (default 0.01)")
+    parser.add_argument("--throttle-every", type=int, default=500, help="Answer every Nth request 429 (default 500)")
+    parser.add_argument("--out", help="Write the results as JSON")
+    return parser
+
+
+def main(argv=None):  # Entry point: python -m benchmarks.upload
+    args = build_parser().parse_args(argv)
+    workers = [int(w) for w in args.workers.split(",")]
+    results = bench(args.rows, workers, args.batch_size, args.latency, args.fail_rate, args.throttle_every)
+    for r in results:
+        print(f"  {r['workers']:>3} workers {r['seconds']:8.2f} s {r['grades_per_s']:>8,} grades/s  "
+              f"{r['retries']} retries, {r['connections']} connections, {r['peak_in_flight']} in flight"
+              f"{'' if r['verified'] else '  MISMATCH'}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(),
+                       "settings": vars(args), "results": results}, f, indent=1)
+            f.write("\n")
+    return 0 if all(r["verified"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
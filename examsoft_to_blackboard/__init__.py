@@ -0,0 +1,39 @@
+# GUI-free conversion core shared by the Tk app (main.py) and the command line (python -m examsoft_to_blackboard)
+# The names below are re-exported lazily (module __getattr__): importing the package, or one submodule of it,
+# loads nothing else, so the app and the CLI only pay for the modules they use.
+import importlib  # Loads a submodule the first time one of its names is used
+
+_EXPORTS = {  # submodule -> names re-exported from it
+    "attempts": ("DEFAULT_POLICY", "POLICIES", "Attempts", "check_policy", "policy_for"),
+    "audit": ("AuditState",),
+    "batch": ("convert_batch",),
+    "core": ("IMPORT_COLUMNS", "StudentScore", "TooManyZeros", "audit_counts", "build_import", "convert",
+             "examsoft_students", "in_roster", "merge_scores", "patch_gradebook", "preview_rows", "resolve_columns",
+             "roster_names", "scores_by_username", "too_many_zeros", "write_audit_report", "write_import"),
+    "fanout": ("convert_sections",),
+    "csvio": ("Cancelled", "ParsedFileCache", "csv_cache", "detect_format", "file_signature", "format_cache",
+              "load_csv", "open_csv", "parse_csv"),
+    "headers": ("ColumnSchema", "GradeColumn", "HeaderIndex", "as_schema", "choose_target_column", "column_id",
+                "find_column", "header_index", "recall", "remember", "score_columns", "target_columns", "tokenize"),
+    "identity": ("IdentityResolver", "Match", "NameIndex", "ids_compatible", "normalise_id", "normalise_name"),
+    "preview": ("PreviewTable",),
+    "results": ("ResultCache", "diff_rows"),
+    "roster": ("RosterIndex", "load_roster", "username_from_email"),
+    "scores": ("ScoreParser", "parse_score", "read_score"),
+    "stats": ("ScoreStats", "distribution"),
+    "watch": ("Watcher",),
+}
+_SOURCE = {name: module for module, names in _EXPORTS.items() for name in names}
+__all__ = sorted(_SOURCE)
+
+
+def __getattr__(name):  # Import the defining submodule on first use and cache the name here
+    module = _SOURCE.get(name)
+    if module is None: raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():  # Define a function
+    return sorted(set(globals()) | _SOURCE.keys())
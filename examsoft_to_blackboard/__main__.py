@@ -0,0 +1,5 @@
+import sys  # Exit with the command's status code
+
+from .cli import main
+
+sys.exit(main())
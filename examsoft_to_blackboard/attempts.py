@@ -0,0 +1,49 @@
+POLICIES = {  # How several attempts by one student become the score that is exported
+    "max": "Highest attempt",
+    "latest": "Latest attempt",
+    "first": "First attempt",
+    "mean": "Average of all attempts",
+    "drop_lowest": "Average, dropping the lowest attempt",
+}
+DEFAULT_POLICY = "max"  # What the converter has always done
+AVERAGING = ("mean", "drop_lowest")  # Policies whose score is computed rather than taken from one attempt
+
+
+def check_policy(policy):  # The policy name, or DEFAULT_POLICY for None; ValueError for anything unknown
+    policy = policy or DEFAULT_POLICY
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown attempt policy '{policy}'. Use one of: {', '.join(POLICIES)}.")
+    return policy
+
+
+def policy_for(target, history, policy=None):  # Explicit policy, else the one remembered for the target column
+    return check_policy(policy or history.get(target))
+
+
+class Attempts:  # Running totals over one student's attempts (the attempts themselves are never kept)
+    # "row" is the ExamSoft row number of the student's most recent attempt, which decides "latest" when two
+    # ExamSoft IDs turn out to be the same student.
+    __slots__ = ("total", "count", "low", "row")
+
+    def __init__(self, score, row):  # First attempt
+        self.total, self.count, self.low, self.row = score, 1, score, row
+
+    def add(self, score, row):  # Another attempt, later in the file
+        self.total += score
+        self.count += 1
+        if score < self.low: self.low = score
+        self.row = row
+
+    def merge(self, other):  # Fold in the attempts of the same student filed under another ExamSoft ID
+        self.total += other.total
+        self.count += other.count
+        self.low = min(self.low, other.low)
+        self.row = max(self.row, other.row)
+
+    def score(self, policy):  # (number, text) for an averaging policy, rounded like parse_score()
+        if policy == "drop_lowest" and self.count > 1:
+            num = (self.total - self.low) / (self.count - 1)
+        else:
+            num = self.total / self.count
+        num = round(num, 2)
+        return num, str(num)
@@ -0,0 +1,58 @@
+from .core import examsoft_students, in_roster, preview_rows
+from .headers import as_schema
+from .identity import IdentityResolver
+from .metrics import stage
+
+
+class AuditState:  # Live roster match for the GUI, kept between selections and updated one side at a time
+    # The ExamSoft students ({username: student ID}) and the roster are each built once per file; the match is
+    # redone only when one of them is swapped (dictionary lookups by student ID, then username; no file reads). The score column only affects the
+    # preview, which is cached per column until either file changes. preview() may run on a worker thread:
+    # it works from one snapshot of both files, so a swap on the Tk thread never mixes old and new data.
+    def __init__(self):  # Define a function
+        self.clear()
+
+    def clear(self):  # Forget both files
+        self.es_rows, self.es_schema, self.es_students = None, None, {}
+        self.roster = None
+        self.matched = frozenset()
+        self._snapshot = (None, None, None, {})  # (rows, schema, roster, {(score column, limit): preview rows})
+
+    def set_examsoft(self, rows, headers, students=None):  # New ExamSoft file (students may be precomputed)
+        self.es_rows, self.es_schema = rows, as_schema(headers)
+        self.es_students = students if students is not None else examsoft_students(rows, headers)
+        self._rematch()
+
+    def set_roster(self, roster):  # New gradebook (a RosterIndex or any {username: name} mapping)
+        self.roster = roster
+        self._rematch()
+
+    def _rematch(self):  # Recompute the matched usernames after either side changed
+        self._snapshot = (self.es_rows, self.es_schema, self.roster, {})
+        with stage("audit", rows=len(self.es_students)) as rec:
+            roster = self.roster
+            if roster is None:
+                self.matched = frozenset()
+            elif hasattr(roster, "by_student_id"):  # Usernames as a set intersection, then IDs for the rest
+                resolver = IdentityResolver(roster)
+                by_username = self.es_students.keys() & roster.by_username.keys()
+                rest = (u for u, sid in self.es_students.items()
+                        if u not in by_username and in_roster(roster, u, sid, resolver))
+                self.matched = frozenset(by_username).union(rest)
+            else:
+                self.matched = frozenset(u for u in self.es_students if u in roster)
+            rec["matched"] = len(self.matched)
+
+    @property
+    def ready(self):  # Both files loaded
+        return self.es_rows is not None and self.roster is not None
+
+    def counts(self):  # (matched, total) ExamSoft students found in the roster, as audit_counts()
+        return len(self.matched), len(self.es_students)
+
+    def preview(self, score_col, limit=None):  # Preview rows for a score column (cached until a file changes)
+        rows, schema, roster, previews = self._snapshot
+        if rows is None or not score_col: return []
+        key = (score_col, limit)
+        if key not in previews: previews[key] = preview_rows(rows, schema, score_col, roster, limit)
+        return previews[key]
@@ -0,0 +1,103 @@
+import csv  # Used for writing the combined import file
+import os  # Used for file system path operations
+
+from .attempts import policy_for
+from .core import (IMPORT_COLUMNS, TooManyZeros, audit_report_path, has_mismatches, merge_scores, patch_gradebook,
+                   scores_by_username, too_many_zeros, write_audit_header, write_audit_section)
+from .csvio import open_csv
+from .headers import ColumnSchema, recall, score_columns, target_columns
+from .metrics import stage
+from .roster import load_roster
+
+def parse_exam_spec(spec):  # "exam1.csv=Exam 1 [Total Pts: 100] |123" -> ("exam1.csv", "Exam 1 ... |123")
+    path, sep, target = spec.partition("=")
+    return path, (target if sep else None)
+
+
+def _score_exam(path, score_col, roster, policy=None):  # Worker process: one score per student for one export
+    with open_csv(path) as (es_headers, es_rows):  # Streamed: the worker never holds the whole export
+        if not ColumnSchema(es_headers).email: raise ValueError(f"{path}: Missing 'Email' column.")
+        if not score_col:
+            score_col = score_columns(es_headers)[1]
+            if not score_col: raise ValueError(f"{path}: No score column found.")
+        elif score_col not in es_headers:
+            raise ValueError(f"{path}: Score column '{score_col}' not found.")
+        res = merge_scores(es_rows, ColumnSchema(es_headers, score_col), roster, policy=policy)
+    res.update(path=path, score_col=score_col, policy=policy)
+    return res
+
+
+def resolve_targets(exams, columns, mapping_history, score_col=None):  # Target column for every (path, target) pair
+    # Explicit targets win; otherwise the column last used for that file name, then the one remembered for
+    # the score column. Two exams can never share a column, and an exam without a mapping is an error
+    # rather than a guess.
+    targets, taken = [], set()
+    for path, target in exams:
+        if target and target not in columns:
+            raise ValueError(f"Target column '{target}' not found in the Blackboard gradebook.")
+        if target in taken: raise ValueError(f"Target column '{target}' is mapped to more than one exam.")
+        if target: taken.add(target)
+    for path, target in exams:
+        if not target:
+            for key in (os.path.basename(path), score_col or "%"):  # "%" is the app's default score column
+                target = recall(mapping_history, key, columns, taken)
+                if target: break
+            if not target: raise ValueError(f"No target column for '{path}'. Pass it as {path}=<column>.")
+            taken.add(target)
+        targets.append(target)
+    return targets
+
+
+def convert_batch(exams, gradebook_path, out, score_col=None, mapping_history=None, allow_zeros=False,
+                  workers=None, patch=False, policy=None,
+                  policy_history=None):  # Convert N ExamSoft exports into one multi-column Blackboard import
+    # exams is a list of (examsoft_path, target_column_or_None). Returns a dict with the combined "rows",
+    # the per-exam results ("exams", each with "target"), "out" and "audit_path". With patch=True `out` is
+    # the original gradebook with every target column filled in, instead of the short import file. Each exam
+    # uses `policy` for repeated attempts or, without one, the policy remembered for its target column.
+    roster = load_roster(gradebook_path)  # One roster index shared by every exam (and saved for the next run)
+    targets = resolve_targets(exams, target_columns(roster.headers), mapping_history or {}, score_col)
+    paths = [path for path, _ in exams]
+    policies = [policy_for(target, policy_history or {}, policy) for target in targets]
+    workers = min(len(paths), workers or os.cpu_count() or 1)
+    with stage("match", exams=len(paths), workers=workers) as rec:
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor  # Imported here: multiprocessing is slow to load
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_score_exam, paths, [score_col] * len(paths), [roster] * len(paths),
+                                        policies))
+        else:
+            results = [_score_exam(path, score_col, roster, p) for path, p in zip(paths, policies)]
+        rec["students"] = sum(len(res["rows"]) for res in results)
+    for res, target in zip(results, targets):
+        res["target"] = target
+        if too_many_zeros(res) and not allow_zeros:
+            raise TooManyZeros(f"{res['path']}: {res['zero_count']} students have a score of 0.")
+
+    students = {}  # username -> (first StudentScore seen, {target: best StudentScore}), in first-seen order
+    for res in results:
+        target = res["target"]
+        for rec in res["rows"]:
+            scores = students.setdefault(rec.username, (rec, {}))[1]
+            prev = scores.get(target)
+            if prev is None or rec.score > prev.score: scores[target] = rec
+    rows = [first.as_row()[:-1] + [scores[t].text if t in scores else "" for t in targets]
+            for first, scores in students.values()]
+    if patch:
+        patch_gradebook(gradebook_path, out, {res["target"]: scores_by_username(res["rows"]) for res in results})
+    else:
+        with stage("write", rows=len(rows)), open(out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(IMPORT_COLUMNS + targets)
+            writer.writerows(rows)
+
+    audit_path = None
+    if any(has_mismatches(res) for res in results):
+        audit_path = audit_report_path(out)
+        with stage("audit_report", exams=len(results)), open(audit_path, 'w', encoding='utf-8') as f:
+            write_audit_header(f)
+            for res in results:
+                f.write(f"--- {res['target']} ({os.path.basename(res['path'])}) ---\n")
+                write_audit_section(f, res)
+                f.write("\n")
+    return {"rows": rows, "exams": results, "out": out, "audit_path": audit_path}
@@ -0,0 +1,298 @@
+import argparse  # Command-line parsing
+import logging  # Used to report errors
+import os  # Used for file system path operations
+import sys  # Exit codes and stderr
+
+from . import config, metrics
+from .attempts import DEFAULT_POLICY, POLICIES
+from .batch import convert_batch, parse_exam_spec
+from .core import TooManyZeros, convert
+from .fanout import convert_sections, section_name
+from .headers import remember
+from .results import ResultCache
+
+log = logging.getLogger(__name__)
+
+POLICY_HELP = ("How repeated attempts by one student are scored: "
+               + ", ".join(f"{k} ({v.lower()})" for k, v in POLICIES.items())
+               + ". Default: the policy last used for the target column, else max")
+
+
+def policy_note(policy):  # " (average of all attempts)", or "" for the default policy
+    return "" if policy == DEFAULT_POLICY else f" ({POLICIES[policy].lower()})"
+
+
+def build_parser():  # Define the command-line interface
+    parser = argparse.ArgumentParser(prog="examsoft_to_blackboard",
+                                     description="Convert ExamSoft score exports into Blackboard Ultra import files.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress and errors to stderr")
+    parser.add_argument("--metrics", metavar="FILE", help="Append per-stage timings to FILE as JSON lines")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Save a cProfile file and tracemalloc allocation peaks for the run in DIR")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("convert", help="Convert one ExamSoft export against a Blackboard gradebook")
+    p.add_argument("--examsoft", required=True, help="ExamSoft Exam Taker Results CSV")
+    p.add_argument("--gradebook", required=True, help="Blackboard Ultra gradebook export CSV")
+    p.add_argument("--column", help="Blackboard target column (default: remembered mapping or best name match)")
+    p.add_argument("--score-column", help="ExamSoft score column (default: the '%%' column, as in the app)")
+    p.add_argument("--policy", choices=list(POLICIES), help=POLICY_HELP)
+    p.add_argument("--out", help="Output CSV (default: BB_Import_<examsoft name> next to the ExamSoft file)")
+    p.add_argument("--allow-zeros", action="store_true",
+                   help="Write the file even when more than 20%% of students scored 0")
+    p.add_argument("--no-save-mapping", action="store_true", help="Do not remember the column mapping")
+    p.add_argument("--stream", action="store_true",
+                   help="Read both files row by row so memory stays flat on very large exports")
+    p.add_argument("--patch", action="store_true",
+                   help="Write a copy of the whole gradebook with the target column filled in")
+    p.add_argument("--no-cache", action="store_true",
+                   help="Always re-read and re-merge, even when the inputs are unchanged since the last run")
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser("batch", help="Convert several ExamSoft exports into one multi-column gradebook upload")
+    p.add_argument("exams", nargs="+", metavar="EXAMSOFT[=COLUMN]",
+                   help="ExamSoft CSV, optionally followed by =<Blackboard column> "
+                        "(default: the column last used for that file name)")
+    p.add_argument("--gradebook", required=True, help="Blackboard Ultra gradebook export CSV")
+    p.add_argument("--score-column", help="ExamSoft score column for every exam (default: the '%%' column)")
+    p.add_argument("--policy", choices=list(POLICIES), help=POLICY_HELP)
+    p.add_argument("--out", required=True, help="Combined output CSV")
+    p.add_argument("--workers", type=int, help="Parallel parser processes (default: one per CPU core)")
+    p.add_argument("--allow-zeros", action="store_true",
+                   help="Write the file even when more than 20%% of an exam's students scored 0")
+    p.add_argument("--no-save-mapping", action="store_true", help="Do not remember the column mappings")
+    p.add_argument("--patch", action="store_true",
+                   help="Write a copy of the whole gradebook with every target column filled in")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("sections", help="Split one ExamSoft export across the gradebooks of several course sections")
+    p.add_argument("gradebooks", nargs="+", metavar="GRADEBOOK[=COLUMN]",
+                   help="Blackboard gradebook export of one section, optionally followed by =<Blackboard column> "
+                        "(default: the column last used for that gradebook, else the best name match)")
+    p.add_argument("--examsoft", required=True, help="ExamSoft Exam Taker Results CSV covering every section")
+    p.add_argument("--out-dir", required=True,
+                   help="Folder for one BB_Import_<gradebook name>.csv per section and the audit report")
+    p.add_argument("--score-column", help="ExamSoft score column (default: the '%%' column)")
+    p.add_argument("--policy", choices=list(POLICIES), help=POLICY_HELP)
+    p.add_argument("--workers", type=int, help="Section files read and written at the same time (default: one per CPU core)")
+    p.add_argument("--allow-zeros", action="store_true",
+                   help="Write the files even when more than 20%% of students scored 0")
+    p.add_argument("--no-save-mapping", action="store_true", help="Do not remember the column mappings")
+    p.add_argument("--patch", action="store_true",
+                   help="Write a copy of each whole gradebook with its target column filled in")
+    p.set_defaults(func=cmd_sections)
+
+    p = sub.add_parser("watch", help="Convert every ExamSoft export dropped into a folder, until stopped")
+    p.add_argument("inbox", help="Folder to watch for ExamSoft CSV exports")
+    p.add_argument("--gradebook", required=True, help="Blackboard Ultra gradebook export CSV")
+    p.add_argument("--outbox", required=True,
+                   help="Folder for the results: one sub-folder per export, failures in failed/")
+    p.add_argument("--score-column", help="ExamSoft score column for every export (default: the '%%' column)")
+    p.add_argument("--policy", choices=list(POLICIES), help=POLICY_HELP)
+    p.add_argument("--workers", type=int, default=2, help="Exports converted at the same time (default 2)")
+    p.add_argument("--settle", type=float, default=2.0,
+                   help="Seconds a file must stay unchanged before it is converted (default 2)")
+    p.add_argument("--interval", type=float, default=1.0, help="Seconds between folder scans (default 1)")
+    p.add_argument("--once", action="store_true", help="Convert what is in the inbox, then exit")
+    p.add_argument("--allow-zeros", action="store_true",
+                   help="Convert exports even when more than 20%% of students scored 0")
+    p.add_argument("--no-save-mapping", action="store_true", help="Do not remember the column mappings")
+    p.add_argument("--patch", action="store_true",
+                   help="Write a copy of the whole gradebook with the target column filled in")
+    p.add_argument("--no-cache", action="store_true", help="Always re-read and re-merge unchanged exports")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("upload", help="Send the grades in an import file straight to a Blackboard course")
+    p.add_argument("file", help="Import file written by convert or batch (or a patched gradebook, with --column)")
+    p.add_argument("--url", required=True, help="Blackboard Learn address, e.g. https://blackboard.example.edu")
+    p.add_argument("--course", required=True, help="Course ID as the API takes it: _123_1 or courseId:BIO101-2026")
+    p.add_argument("--column", action="append",
+                   help="Only upload this column of the file (repeatable; default: every score column)")
+    p.add_argument("--token", default=os.environ.get("BLACKBOARD_TOKEN"),
+                   help="OAuth access token (default: $BLACKBOARD_TOKEN)")
+    p.add_argument("--key", default=os.environ.get("BLACKBOARD_KEY"),
+                   help="REST application key, used when there is no token (default: $BLACKBOARD_KEY)")
+    p.add_argument("--secret", default=os.environ.get("BLACKBOARD_SECRET"),
+                   help="REST application secret (default: $BLACKBOARD_SECRET)")
+    p.add_argument("--workers", type=int, default=8, help="Requests in flight at once (default 8)")
+    p.add_argument("--batch-size", type=int, default=50, help="Grades handed to a worker at a time (default 50)")
+    p.add_argument("--retries", type=int, default=4,
+                   help="Extra attempts after a throttled, failed or dropped request (default 4)")
+    p.set_defaults(func=cmd_upload)
+
+    p = sub.add_parser("mock-server", help="Run a local stand-in for the Blackboard gradebook API, for testing uploads")
+    p.add_argument("--gradebook", required=True, help="Gradebook export whose columns and students it serves")
+    p.add_argument("--port", type=int, default=8765, help="Port on 127.0.0.1 (default 8765)")
+    p.add_argument("--course", default="_1_1", help="Course ID it answers to (default _1_1)")
+    p.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    p.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with a 503 (0-1)")
+    p.set_defaults(func=cmd_mock_server)
+    return parser
+
+
+def cmd_convert(args):  # "convert" sub-command
+    cfg = config.load_config()
+    mapping_history, policies = cfg.get("mapping_history", {}), cfg.get("attempt_policies", {})
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(args.examsoft)),
+                                   f"BB_Import_{os.path.basename(args.examsoft)}")
+    try:
+        res = convert(args.examsoft, args.gradebook, out, target=args.column, score_col=args.score_column,
+                      mapping_history=mapping_history, allow_zeros=args.allow_zeros, streaming=args.stream,
+                      patch=args.patch, results=None if args.no_cache else ResultCache(), policy=args.policy,
+                      policy_history=policies)
+    except TooManyZeros as e:
+        print(f"error: {e} Re-run with --allow-zeros to write the file anyway.", file=sys.stderr)
+        return 3
+    if not args.no_save_mapping:
+        remember(mapping_history, res["score_col"], res["target"])
+        policies[res["target"]] = res["policy"]
+        config.save_config({"mapping_history": mapping_history, "attempt_policies": policies})
+    stats = res["stats"]
+    print(f"{len(res['rows'])} scores mapped to '{res['target']}'{policy_note(res['policy'])} -> {out}")
+    print(f"Avg: {stats['avg']}% | High: {stats['high']} | Low: {stats['low']}")
+    dist = res.get("distribution")
+    if dist and dist["count"]:
+        print(f"Median: {dist['median']} | Middle half: {dist['p25']}-{dist['p75']} | Std dev: {dist['stdev']}")
+        if dist["outliers"]: print(f"{len(dist['outliers'])} unusual scores flagged in the audit report")
+    diff = res.get("diff")
+    if diff is not None:
+        print("No grades changed since the last run." if not (diff["changed"] or diff["added"] or diff["removed"]) else
+              f"Since the last run: {len(diff['changed'])} grades changed, {len(diff['added'])} new, "
+              f"{len(diff['removed'])} removed.")
+        for u, old, new in diff["changed"]: print(f"  {u}: {old} -> {new}")
+    if res.get("resolved"):
+        print(f"{len(res['resolved'])} students matched by student ID or name instead of username (see the audit report)")
+    if res.get("modified"):
+        print(f"{len(res['modified'])} score cells were ambiguous or only partly a number (see the audit report)")
+    if res["audit_path"]:
+        print(f"Roster mismatches: {len(res['not_in_bb'])} in ExamSoft only, {len(res['not_in_es'])} missing scores"
+              f" -> {res['audit_path']}")
+    return 0
+
+
+def cmd_batch(args):  # "batch" sub-command
+    cfg = config.load_config()
+    mapping_history, policies = cfg.get("mapping_history", {}), cfg.get("attempt_policies", {})
+    exams = [parse_exam_spec(spec) for spec in args.exams]
+    try:
+        res = convert_batch(exams, args.gradebook, args.out, score_col=args.score_column,
+                            mapping_history=mapping_history, allow_zeros=args.allow_zeros, workers=args.workers,
+                            patch=args.patch, policy=args.policy, policy_history=policies)
+    except TooManyZeros as e:
+        print(f"error: {e} Re-run with --allow-zeros to write the file anyway.", file=sys.stderr)
+        return 3
+    for exam in res["exams"]:
+        stats = exam["stats"]
+        print(f"{os.path.basename(exam['path'])} -> '{exam['target']}'{policy_note(exam['policy'])}: "
+              f"{len(exam['rows'])} scores (Avg: {stats['avg']}% | High: {stats['high']} | Low: {stats['low']})")
+        if not args.no_save_mapping:
+            remember(mapping_history, os.path.basename(exam["path"]), exam["target"])
+            policies[exam["target"]] = exam["policy"]
+    if not args.no_save_mapping:
+        config.save_config({"mapping_history": mapping_history, "attempt_policies": policies})
+    if args.patch:
+        print(f"Gradebook with {len(res['exams'])} columns filled written to {res['out']}")
+    else:
+        print(f"{len(res['rows'])} students written to {res['out']}")
+    if res["audit_path"]: print(f"Roster mismatches found -> {res['audit_path']}")
+    return 0
+
+
+def cmd_sections(args):  # "sections" sub-command
+    cfg = config.load_config()
+    mapping_history, policies = cfg.get("mapping_history", {}), cfg.get("attempt_policies", {})
+    sections = [parse_exam_spec(spec) for spec in args.gradebooks]
+    try:
+        res = convert_sections(args.examsoft, sections, args.out_dir, score_col=args.score_column,
+                               mapping_history=mapping_history, allow_zeros=args.allow_zeros, workers=args.workers,
+                               patch=args.patch, policy=args.policy, policy_history=policies)
+    except TooManyZeros as e:
+        print(f"error: {e} Re-run with --allow-zeros to write the files anyway.", file=sys.stderr)
+        return 3
+    for s in res["sections"]:
+        print(f"{section_name(s['gradebook'])} -> '{s['target']}'{policy_note(res['policy'])}: {s['rows']} scores, "
+              f"{len(s['not_in_es'])} missing -> {s['out']}")
+        if not args.no_save_mapping:
+            remember(mapping_history, os.path.basename(s["gradebook"]), s["target"])
+            policies[s["target"]] = res["policy"]
+    if not args.no_save_mapping:
+        config.save_config({"mapping_history": mapping_history, "attempt_policies": policies})
+    stats = res["stats"]
+    print(f"{sum(s['rows'] for s in res['sections'])} scores across {len(res['sections'])} sections (Avg: {stats['avg']}% | High: {stats['high']} | Low: {stats['low']})")
+    if res["not_in_bb"]: print(f"{len(res['not_in_bb'])} students are in no section's gradebook")
+    if res["audit_path"]: print(f"Roster mismatches found -> {res['audit_path']}")
+    return 0
+
+
+def print_watch_result(summary):  # One line per export handled by `watch`
+    name = os.path.basename(summary["path"])
+    if summary["status"] != "converted":
+        print(f"{name}: FAILED: {summary['error']}", file=sys.stderr, flush=True)
+        return
+    stats = summary["stats"]
+    print(f"{name} -> '{summary['target']}'{policy_note(summary['policy'])}: {summary['rows']} scores "
+          f"(Avg: {stats['avg']}% | High: {stats['high']} | Low: {stats['low']}) -> {summary['out']}"
+          + (f" [audit: {summary['audit_path']}]" if summary["audit_path"] else ""), flush=True)
+
+
+def cmd_watch(args):  # "watch" sub-command
+    from .watch import Watcher  # Only this command needs the folder watcher
+    if not os.path.isdir(args.inbox): raise ValueError(f"Inbox folder not found: {args.inbox}")
+    watcher = Watcher(args.inbox, args.gradebook, args.outbox, workers=args.workers, settle=args.settle,
+                      interval=args.interval, score_col=args.score_column, allow_zeros=args.allow_zeros,
+                      patch=args.patch, save_mapping=not args.no_save_mapping,
+                      results=None if args.no_cache else ResultCache(), on_result=print_watch_result,
+                      policy=args.policy)
+    if not args.once: print(f"Watching {os.path.abspath(args.inbox)} (Ctrl+C to stop)", flush=True)
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        print("Stopped.", file=sys.stderr)
+    return 0
+
+
+def cmd_upload(args):  # "upload" sub-command
+    from .upload import GradebookClient, upload_import  # Only this command needs http.client
+    with GradebookClient(args.url, args.course, token=args.token, key=args.key, secret=args.secret,
+                         workers=args.workers, batch_size=args.batch_size, retries=args.retries) as client:
+        summaries = upload_import(args.file, client, columns=args.column)
+    failed = 0
+    for s in summaries:
+        print(f"'{s['header']}': {s['sent']} grades sent in {s['seconds']}s"
+              + (f" ({s['retries']} retries)" if s["retries"] else "")
+              + (f", {len(s['failed'])} FAILED" if s["failed"] else ""))
+        for username, status, message in s["failed"]: print(f"  {username}: {status or 'no response'} {message}")
+        failed += len(s["failed"])
+    return 4 if failed else 0
+
+
+def cmd_mock_server(args):  # "mock-server" sub-command
+    from .mockserver import MockGradebookServer  # Only this command needs the HTTP server
+    server = MockGradebookServer.from_gradebook(args.gradebook, course_id=args.course, port=args.port,
+                                                latency=args.latency, fail_rate=args.fail_rate)
+    print(f"Mock gradebook API at {server.url} for course {server.course_id}: {len(server.columns)} columns, "
+          f"{len(server.users)} students. Key: {server.key}  Secret: {server.secret}  (Ctrl+C to stop)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Stopped after {server.requests} requests; {len(server.grades)} grades received.", file=sys.stderr)
+    finally:
+        server.server_close()
+    return 0
+
+
+def main(argv=None):  # Entry point for `python -m examsoft_to_blackboard`
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        format='%(levelname)s - %(message)s')
+    if not args.verbose: metrics.log.propagate = False  # Metrics go to --metrics only, not to stderr
+    if args.metrics: metrics.open_sink(args.metrics)
+    if args.profile: metrics.enable_profiling(args.profile)
+    else: metrics.profiling_from_env()
+    try:
+        with metrics.profiled(args.command), metrics.stage(args.command):
+            return args.func(args)
+    except (OSError, ValueError) as e:
+        log.debug("Conversion failed", exc_info=True)
+        print(f"error: {e}", file=sys.stderr)
+        return 2
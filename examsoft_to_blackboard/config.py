@@ -0,0 +1,25 @@
+import json  # To read/write configuration files in JSON format
+import os  # Used for file system path operations
+
+CONFIG_PATH = os.path.join(os.path.expanduser("~"), ".examsoft_converter_config")
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".examsoft_converter_cache")  # Roster indexes and other caches
+METRICS_PATH = os.path.join(os.path.expanduser("~"), ".examsoft_converter_metrics.jsonl")  # App stage timings (opt-in)
+
+
+def load_config(path=CONFIG_PATH):  # Load saved configuration (last folder, mapping history)
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f: return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def save_config(config, path=CONFIG_PATH):  # Save configuration, merging into what is already on disk
+    try:
+        data = load_config(path)
+        data.update(config)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+    except OSError:
+        pass
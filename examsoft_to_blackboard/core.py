@@ -0,0 +1,397 @@
+import csv  # Used for writing CSV files
+import os  # Used for file system path operations
+from datetime import datetime  # To get current date/time for audit logs
+
+from .attempts import AVERAGING, Attempts, check_policy, policy_for
+from .csvio import SCAN_CHUNK, detect_format, load_csv, open_csv
+from .identity import IdentityResolver
+from .headers import ColumnSchema, as_schema, choose_target_column, find_column, score_columns, target_columns
+from .metrics import stage
+from .roster import ROSTER_DIR, RosterIndex, load_roster, username_from_email
+from .scores import GUESSES, ScoreParser
+from .stats import MAX_OUTLIERS, ScoreStats, distribution
+
+ZERO_SCORE_WARNING = 0.2  # Ask before exporting when more than this share of students scored 0
+IMPORT_COLUMNS = ["Last Name", "First Name", "Username", "Student ID"]  # Followed by the target column
+
+
+class TooManyZeros(ValueError):  # Raised by convert() when the zero-score share needs a human decision
+    def __init__(self, message, result=None):  # result: the merge that was not written, for callers to inspect
+        super().__init__(message)
+        self.result = result
+
+
+class StudentScore:  # Winning attempt for one student; the numeric score is kept next to its formatted text
+    __slots__ = ("last", "first", "username", "student_id", "score", "text")
+
+    def __init__(self, last, first, username, student_id, score, text):  # Define a function
+        self.last, self.first, self.username, self.student_id = last, first, username, student_id
+        self.score, self.text = score, text
+
+    def as_row(self):  # Output row for the import CSV (IMPORT_COLUMNS + score)
+        return [self.last, self.first, self.username, self.student_id, self.text]
+
+
+def roster_names(bb_rows, bb_headers):  # RosterIndex (acts as {username: "First Last"}) for gradebook rows
+    return RosterIndex.build(bb_rows, bb_headers)
+
+
+def examsoft_students(es_rows, es_headers):  # {username: student ID} from the ExamSoft email and ID columns
+    schema = as_schema(es_headers)
+    e_c, sid_c = schema.email, schema.student_id
+    return {username_from_email(r.get(e_c, "")): (r.get(sid_c, "").strip() if sid_c else "")
+            for r in es_rows if r.get(e_c)}
+
+
+def in_roster(roster, username, student_id="", resolver=None):  # Student found by ID or username
+    # A RosterIndex is searched by student ID, then username (see identity.IdentityResolver); a plain
+    # {username: name} dict by username only. Pass a resolver to reuse it over many lookups.
+    if not hasattr(roster, "by_student_id"): return username in roster
+    return (resolver or IdentityResolver(roster)).exact((student_id or "").strip(), "", username=username) is not None
+
+
+def audit_counts(es_rows, es_headers, roster):  # (matched, total) ExamSoft students found in the roster
+    students = examsoft_students(es_rows, es_headers)
+    resolver = IdentityResolver(roster) if hasattr(roster, "by_student_id") else None
+    return sum(1 for u, sid in students.items() if in_roster(roster, u, sid, resolver)), len(students)
+
+
+def preview_rows(es_rows, es_headers, score_col, roster, limit=12):  # ((user, id, score), tags); limit=None: all
+    schema = as_schema(es_headers, score_col)
+    e_col, id_col, score_col = schema.email, schema.student_id, schema.score
+    resolver = IdentityResolver(roster) if hasattr(roster, "by_student_id") else None
+    picked = []
+    for i, row in enumerate(es_rows):
+        if limit is not None and i >= limit: break
+        if row.get(e_col, "").strip(): picked.append(row)
+    raws = [row.get(score_col, "") for row in picked]
+    _, texts, guesses = ScoreParser().column(raws)
+    items = []
+    for row, r, c, guess in zip(picked, raws, texts, guesses):
+        u = username_from_email(row[e_col].strip())
+        tags = []
+        if guess or c != r.strip(): tags.append("modified")  # Rewritten, or a value that needed a guess
+        sid = row.get(id_col, "") if id_col else ""
+        if roster and not in_roster(roster, u, sid, resolver): tags.append("missing")
+        items.append(((u, sid, c), tags))
+    return items
+
+
+def merge_scores(es_rows, schema, roster, progress=None, total=None,
+                 policy=None):  # One pass, one score per student
+    # es_rows may be any iterable (a list or a streaming reader); only the per-student score table, running
+    # stats and the audit lists are kept. schema is the file's ColumnSchema (including the score column) and
+    # roster is a RosterIndex (or any {username: name} dict). Returns one StudentScore per student ("rows"),
+    # the number of CSV records read ("row_count"; a quoted cell may span lines, so not the file's line count),
+    # the zero-score count, avg/high/low stats (over every attempt), the "distribution" of those attempts
+    # (stats.distribution: quantiles, histogram, per-section figures when the export has a section column,
+    # and the exported scores outside the usual range) and the two audit lists (in ExamSoft only / missing
+    # from ExamSoft). The statistics are streamed (stats.ScoreStats), so they add no per-row memory.
+    # policy (attempts.POLICIES, default "max") decides which attempt counts: max/first/latest build a
+    # StudentScore only when an attempt takes over; mean/drop_lowest add every attempt to a per-student
+    # attempts.Attempts accumulator and are scored once, at the end, without keeping the attempts.
+    # With a RosterIndex, each student is then matched once by student ID, username, and finally by name
+    # (identity.IdentityResolver) and takes the gradebook's username; "resolved" lists the matches the
+    # username alone would have missed or that disagree, as [student, username, method, confidence], and
+    # "matched_by" counts students per method. "modified" lists the attempts whose score cell needed a guess
+    # (scores.GUESSES: a possible decimal comma, a cell only partly a number, or no number at all).
+    # progress(text, fraction) is called every few thousand rows and may raise Cancelled to stop; fraction is
+    # None when the total row count is unknown.
+    unique_s = {}
+    first_seen = {}  # Same keys as unique_s -> (ExamSoft ID, email, username) of the student's first row
+    not_in_bb = {}  # Same keys -> [(row number, audit line)] for rows whose username is not in the roster
+    modified = []  # Audit lines for score cells read with a guess
+    zero_count = 0
+    scores, sections = ScoreStats(), {}  # Every attempt; per section when the export has a section column
+    e_c, sid_c, f_c, l_c, s_c = schema.email, schema.student_id or schema.email, schema.first, schema.last, schema.score
+    id_c, sec_c = schema.student_id, schema.section
+    read = ScoreParser().read
+    policy = check_policy(policy)
+    keep_max, take_latest = policy == "max", policy == "latest"
+    attempts = {} if policy != "max" and policy != "first" else None  # Same keys as unique_s -> Attempts
+    idx = 1  # Row number of the last record read (the header is row 1)
+    for idx, row in enumerate(es_rows, start=2):
+        if progress and idx % 2000 == 0:
+            progress(f"Matching scores to roster... ({idx - 1} of {total})" if total else
+                     f"Matching scores to roster... ({idx - 1} rows)", idx / total if total else None)
+        raw_e = row.get(e_c, "").strip()
+        if not raw_e: continue
+        username = username_from_email(raw_e)
+        raw_s = row.get(s_c)
+        s_num, s_val, guess = read(raw_s)
+        if guess: modified.append(f"Row {idx}: {row.get(f_c)} {row.get(l_c)} ({username}): "
+                                  f"'{raw_s.strip()}' read as {s_val} ({GUESSES[guess]})")
+        sid = row.get(sid_c, "").strip() or username
+        scores.add(s_num)
+        if sec_c:
+            section = (row.get(sec_c) or "").strip() or "(none)"
+            (sections.get(section) or sections.setdefault(section, ScoreStats())).add(s_num)
+        zero_count += (1 if s_num == 0 else 0)
+        best = unique_s.get(sid)
+        if best is None:
+            first_seen[sid] = (row.get(id_c, "").strip() if id_c else "", raw_e, username)
+            if attempts is not None: attempts[sid] = Attempts(s_num, idx)
+        elif attempts is not None:
+            attempts[sid].add(s_num, idx)
+        if best is None or (s_num > best.score if keep_max else take_latest):
+            unique_s[sid] = StudentScore(row.get(l_c), row.get(f_c), username, sid, s_num, s_val)
+        if roster and username not in roster: not_in_bb.setdefault(sid, []).append(
+            (idx, f"Row {idx}: {row.get(f_c)} {row.get(l_c)} ({username})"))
+    unique_s, resolved, matched_by = _resolve_students(unique_s, first_seen, not_in_bb, roster, policy, attempts)
+    if policy in AVERAGING:
+        for key, rec in unique_s.items(): rec.score, rec.text = attempts[key].score(policy)
+    rows = list(unique_s.values())
+    count = scores.count
+    stats = {"avg": round(scores.total / count, 1) if count else 0, "high": scores.high if count else 0,
+             "low": scores.low if count else 0}
+    matched = {r.username for r in rows}
+    not_in_es = [f"- {name} ({u})" for u, name in roster.items() if u not in matched]
+    return {"rows": rows, "row_count": idx - 1, "zero_count": zero_count, "stats": stats,
+            "not_in_bb": [line for _, line in sorted(e for lines in not_in_bb.values() for e in lines)],
+            "not_in_es": not_in_es, "resolved": resolved, "matched_by": matched_by, "modified": modified,
+            "distribution": distribution(scores, sections, rows)}
+
+
+def _resolve_students(unique_s, first_seen, not_in_bb, roster, policy="max",
+                      attempts=None):  # Match each student once against the roster
+    # Returns (StudentScore per student, resolved, matched_by) as described in merge_scores(). Matched
+    # students are keyed by gradebook row, so two ExamSoft IDs resolving to one student are combined under the
+    # policy (their Attempts merged, re-keyed like the result); their lines are dropped from not_in_bb
+    # (modified in place).
+    matched_by = {"id": 0, "username": 0, "name": 0}
+    if not hasattr(roster, "by_student_id"):  # Plain {username: name} dict: usernames only
+        matched_by["username"] = sum(1 for r in unique_s.values() if r.username in roster)
+        return unique_s, [], matched_by
+    usernames, student_ids = roster.columns["username"], roster.columns["student_id"]
+    found = IdentityResolver(roster).resolve((k, *first_seen[k], r.first, r.last) for k, r in unique_s.items())
+    merged, resolved = {}, []
+    for key, rec in unique_s.items():
+        match = found.get(key)
+        if match is None:
+            merged[key] = rec
+            continue
+        username = usernames[match.row]
+        if match.confidence < 1 or username != rec.username:
+            resolved.append([f"{rec.first} {rec.last} ({rec.username})", username, match.method, match.confidence])
+        rec.username, rec.student_id = username, student_ids[match.row] or rec.student_id
+        not_in_bb.pop(key, None)
+        prev = merged.get(match.row)
+        if prev is None:
+            matched_by[match.method] += 1
+            merged[match.row] = rec
+            if attempts is not None: attempts[match.row] = attempts.pop(key)
+            continue
+        if attempts is not None:
+            acc, other = attempts[match.row], attempts.pop(key)
+            if policy == "latest" and other.row > acc.row: merged[match.row] = rec
+            acc.merge(other)
+        elif policy == "max" and rec.score > prev.score:
+            merged[match.row] = rec
+    return merged, resolved, matched_by
+
+
+def build_import(es_rows, es_headers, bb_rows, bb_headers, score_col, progress=None, roster=None,
+                 policy=None):  # Match, dedup, stats for already-parsed files
+    # A prebuilt RosterIndex (e.g. from load_roster) can be passed as `roster` instead of the gradebook rows.
+    roster = roster if roster is not None else roster_names(bb_rows, bb_headers)
+    with stage("match", rows=len(es_rows)) as rec:
+        res = merge_scores(es_rows, as_schema(es_headers, score_col), roster, progress, len(es_rows), policy)
+        rec["students"] = len(res["rows"])
+    return res
+
+
+def too_many_zeros(res):  # True when the zero-score share warrants a confirmation
+    rows = res["rows"]
+    return bool(rows) and (res["zero_count"] / len(rows)) > ZERO_SCORE_WARNING
+
+
+def write_import(out, rows, target):  # Write the Blackboard import CSV from StudentScore rows
+    with stage("write", rows=len(rows)), open(out, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(IMPORT_COLUMNS + [target])
+        writer.writerows(r.as_row() for r in rows)
+
+
+def scores_by_username(rows):  # {username: score text} from StudentScore rows, best score per username
+    best = {}
+    for r in rows:
+        prev = best.get(r.username)
+        if prev is None or r.score > prev.score: best[r.username] = r
+    return {u: r.text for u, r in best.items()}
+
+
+def patch_gradebook(gradebook_path, out, columns, check=None):  # Write the gradebook back with scores filled in
+    # columns is {target column: {username: score text}}. The original export is streamed through once, row by
+    # row, in its own encoding and delimiter: every other cell is copied unchanged and each target cell is
+    # overwritten only where a score exists. Target columns are matched by name, then by their |ID suffix.
+    # Returns {"rows": gradebook rows written, "filled": {target: cells written}}.
+    encoding, dialect = detect_format(gradebook_path)
+    filled = {target: 0 for target in columns}
+    count = 0
+    with stage("patch", file=os.path.basename(gradebook_path), columns=len(columns)) as rec, \
+            open_csv(gradebook_path, raw=True) as (headers, rows), \
+            open(out, 'w', newline='', encoding=encoding, buffering=SCAN_CHUNK) as f:
+        u_col = ColumnSchema([h.strip() for h in headers]).username
+        u_idx = find_column(headers, u_col) if u_col else None
+        if u_idx is None: raise ValueError("Missing 'Username' column in the Blackboard gradebook.")
+        targets = []
+        for target, scores in columns.items():
+            idx = find_column(headers, target)
+            if idx is None: raise ValueError(f"Target column '{target}' not found in the Blackboard gradebook.")
+            targets.append((idx, target, scores))
+        writer = csv.writer(f, dialect=dialect)
+        writer.writerow(headers)
+        width = len(headers)
+        for count, row in enumerate(rows, start=1):
+            if check and count % 5000 == 0: check()
+            if len(row) > u_idx:
+                username = row[u_idx].lower().strip()
+                for idx, target, scores in targets:
+                    score = scores.get(username)
+                    if score is None: continue
+                    if len(row) < width: row.extend([""] * (width - len(row)))
+                    row[idx] = score
+                    filled[target] += 1
+            writer.writerow(row)
+        rec["rows"] = count
+    return {"rows": count, "filled": filled}
+
+
+def has_mismatches(res):  # True when the audit report has something to say
+    return bool(res["not_in_bb"] or res["not_in_es"] or res.get("resolved") or res.get("modified"))
+
+
+def has_changes(res):  # True when a cached re-run found grades that differ from the previous run
+    diff = res.get("diff")
+    return bool(diff and (diff["added"] or diff["removed"] or diff["changed"]))
+
+
+def write_diff_section(f, diff):  # Grades that changed since the previous run for the same column
+    f.write(f"\n🔁 CHANGED SINCE LAST RUN ({len(diff['changed'])} changed, {len(diff['added'])} new, "
+            f"{len(diff['removed'])} removed):\n")
+    for u, old, new in diff["changed"]: f.write(f"- {u}: {old} -> {new}\n")
+    for u, new in diff["added"]: f.write(f"+ {u}: {new}\n")
+    for u, old in diff["removed"]: f.write(f"x {u}: {old} (no longer in the ExamSoft file)\n")
+
+
+def write_distribution_section(f, dist):  # Quantiles, histogram, sections and unusual scores (stats.distribution)
+    f.write(f"DISTRIBUTION ({dist['count']} scores): Median {dist['median']} | Middle half {dist['p25']}-"
+            f"{dist['p75']} | 10th-90th percentile {dist['p10']}-{dist['p90']} | Std dev {dist['stdev']}\n")
+    peak = max((n for _, _, n in dist["histogram"]), default=0) or 1
+    for lo, hi, n in dist["histogram"]:
+        label = f"< {hi}" if lo is None else f"> {lo}" if hi is None else f"{lo}-{hi}"
+        bar = "█" * round(n / peak * 40)
+        f.write(f"  {label:>7} | {bar + ' ' if bar else ''}{n}\n")
+    if dist["sections"]:
+        f.write("BY SECTION:\n")
+        for name, s in dist["sections"].items():
+            f.write(f"- {name}: {s['count']} scores, Avg {s['mean']} | Median {s['median']} | "
+                    f"High {s['high']} | Low {s['low']}\n")
+    outliers = dist["outliers"]
+    if outliers:
+        low, high = dist["fences"]
+        f.write(f"\n📉 UNUSUAL SCORES ({len(outliers)}) - outside {low} to {high}, please check:\n")
+        for student, username, score, side in outliers[:MAX_OUTLIERS]:
+            f.write(f"- {student} ({username}): {score} ({side})\n")
+        if len(outliers) > MAX_OUTLIERS: f.write(f"... and {len(outliers) - MAX_OUTLIERS} more\n")
+    f.write("\n")
+
+
+def write_audit_section(f, res):  # Stats, distribution and roster mismatch lists for one conversion
+    stats, not_in_bb, not_in_es = res["stats"], res["not_in_bb"], res["not_in_es"]
+    f.write(f"STATS: Avg {stats['avg']}% | High {stats['high']} | Low {stats['low']}\n\n")
+    if res.get("distribution"): write_distribution_section(f, res["distribution"])
+    if not_in_bb: f.write(
+        f"⚠️ IN EXAMSOFT ONLY ({len(not_in_bb)}):\n" + "\n".join([f"- {s}" for s in not_in_bb]) + "\n")
+    if not_in_es: f.write(f"\n⚠️ MISSING SCORES ({len(not_in_es)}):\n" + "\n".join(not_in_es) + "\n")
+    if res.get("resolved"): write_resolved_section(f, res["resolved"])
+    if res.get("modified"): write_modified_section(f, res["modified"])
+
+
+def write_modified_section(f, modified):  # Score cells whose value had to be guessed (scores.GUESSES)
+    f.write(f"\n✏️ SCORES READ WITH A GUESS ({len(modified)}) - please check:\n")
+    for line in modified: f.write(f"- {line}\n")
+
+
+def write_resolved_section(f, resolved):  # Students matched by student ID or name rather than username
+    f.write(f"\n🔗 MATCHED BY STUDENT ID OR NAME ({len(resolved)}) - please check:\n")
+    for student, username, method, confidence in resolved:
+        f.write(f"- {student} -> {username} (by {method}, confidence {confidence:.2f})\n")
+
+
+def write_audit_header(f):  # Title block shared by every audit report
+    f.write("EXAMSOFT TO BLACKBOARD AUDIT REPORT\n")
+    f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
+    f.write("=" * 35 + "\n\n")
+
+
+def audit_report_path(out):  # Audit_Report.txt lives next to the import file
+    return os.path.normpath(os.path.join(os.path.dirname(out), "Audit_Report.txt"))
+
+
+def write_audit_report(out, res):  # Write Audit_Report.txt next to the import file; returns its path or None
+    if not (has_mismatches(res) or has_changes(res)): return None
+    a_path = audit_report_path(out)
+    with stage("audit_report", rows=len(res["not_in_bb"]) + len(res["not_in_es"])), \
+            open(a_path, 'w', encoding='utf-8') as f:
+        write_audit_header(f)
+        write_audit_section(f, res)
+        if has_changes(res): write_diff_section(f, res["diff"])
+    return a_path
+
+
+def resolve_columns(es_headers, bb_headers, score_col=None, target=None,
+                    mapping_history=None):  # Validate or pick the (score column, target column) pair
+    if not ColumnSchema(es_headers).email: raise ValueError("Missing 'Email' column.")
+    if not score_col:
+        score_col = score_columns(es_headers)[1]
+        if not score_col: raise ValueError("No score column found in the ExamSoft file.")
+    elif score_col not in es_headers:
+        raise ValueError(f"Score column '{score_col}' not found in the ExamSoft file.")
+    columns = target_columns(bb_headers or [])
+    if not target:
+        target = choose_target_column(columns, score_col, mapping_history or {})
+        if not target: raise ValueError("No score columns found in the Blackboard gradebook.")
+    elif target not in columns:
+        raise ValueError(f"Target column '{target}' not found in the Blackboard gradebook.")
+    return score_col, target
+
+
+def convert(examsoft_path, gradebook_path, out, target=None, score_col=None, mapping_history=None,
+            allow_zeros=False, progress=None, streaming=False, index_dir=ROSTER_DIR, patch=False,
+            results=None, policy=None, policy_history=None):  # Headless equivalent of the GUI "Generate" button
+    # Returns the merge result plus "target", "score_col", "policy", "out" and "audit_path".
+    # Raises ValueError for unusable input, and TooManyZeros unless allow_zeros is set.
+    # The gradebook is only ever read through its roster index, which is saved under index_dir and reused
+    # until the gradebook changes (index_dir=None: build it in memory only). With streaming=True the
+    # ExamSoft rows are merged as they are read instead of going through the parsed-file cache. With
+    # patch=True `out` is a copy of the whole gradebook with the target column filled in (patch_gradebook).
+    # results is an optional results.ResultCache: unchanged inputs then skip parse and merge, and the result
+    # carries a "diff" against the last exported run for the same gradebook column. policy is the attempt policy
+    # (attempts.POLICIES); without one, the policy remembered for the target column in policy_history is used.
+    roster = load_roster(gradebook_path, index_dir)
+    with open_csv(examsoft_path) as (es_headers, _):  # Only the header row is read here
+        score_col, target = resolve_columns(es_headers, roster.headers, score_col, target, mapping_history)
+    policy = policy_for(target, policy_history or {}, policy)
+
+    def _merge():
+        if streaming:
+            with open_csv(examsoft_path) as (headers, es_rows), stage("match", streaming=True) as rec:
+                res = merge_scores(es_rows, ColumnSchema(headers, score_col), roster, progress, policy=policy)
+                rec.update(rows=res["row_count"], students=len(res["rows"]))
+            return res
+        es_rows, headers = load_csv(examsoft_path)
+        return build_import(es_rows, headers, None, None, score_col, progress, roster=roster, policy=policy)
+
+    res = (results.merge(examsoft_path, roster, score_col, target, _merge, policy, gradebook_path) if results
+           else _merge())
+    if too_many_zeros(res) and not allow_zeros:
+        res.update(target=target, score_col=score_col, policy=policy)
+        raise TooManyZeros(f"{res['zero_count']} students have a score of 0.", res)
+    if patch:
+        patch_gradebook(gradebook_path, out, {target: scores_by_username(res["rows"])})
+    else:
+        write_import(out, res["rows"], target)
+    res.update(target=target, score_col=score_col, policy=policy, out=out, audit_path=write_audit_report(out, res))
+    if results: results.set_last(gradebook_path, target, res["key"])  # Only an exported run is diffed against
+    return res
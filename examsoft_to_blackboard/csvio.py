@@ -0,0 +1,168 @@
+import codecs  # BOM constants and incremental UTF-8 validation
+import csv  # Used for reading CSV files
+import logging  # Used to log read errors
+import mmap  # Encoding detection scans the file without reading it into memory
+import os  # Used for file system path operations
+import threading  # Locks so worker threads can share the cache
+from collections import OrderedDict  # Ordered storage for the parsed-file cache (LRU eviction)
+from contextlib import contextmanager  # open_csv() keeps the file open while rows are streamed
+
+from .metrics import stage
+
+log = logging.getLogger(__name__)
+
+
+class Cancelled(Exception):  # Raised inside long-running work once the caller asks it to stop
+    pass
+
+
+def file_signature(path):  # (normalised path, (mtime, size)): changes whenever the file is edited or replaced
+    st = os.stat(path)
+    return os.path.normcase(os.path.abspath(path)), (st.st_mtime_ns, st.st_size)
+
+
+class ParsedFileCache:  # Share one parse of each CSV between every consumer (preview, audit, export)
+    # Entries are keyed on (path, mtime, size): editing or replacing a file on disk changes its key,
+    # so the stale parse is dropped on the next lookup. At most `max_entries` files are kept and the
+    # least recently used one is evicted first (the app only ever needs the ExamSoft + Blackboard pair).
+    def __init__(self, max_entries=4):  # Define a function
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # normalised path -> ((mtime, size), (rows, headers))
+        self._lock = threading.RLock()  # Lookups come from several worker threads
+        self._loading = {}  # normalised path -> Lock held while that file is being loaded
+
+    def lookup(self, path):  # Return the cached (rows, headers) or None if missing/stale
+        norm, sig = file_signature(path)
+        with self._lock:
+            entry = self._entries.get(norm)
+            if entry is None: return None
+            if entry[0] != sig:
+                del self._entries[norm]
+                return None
+            self._entries.move_to_end(norm)
+            return entry[1]
+
+    def store(self, path, result):  # Remember a parse and evict the oldest entries over the limit
+        norm, sig = file_signature(path)
+        with self._lock:
+            self._entries[norm] = (sig, result)
+            self._entries.move_to_end(norm)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, path, loader):  # Cached result, or run loader() once even if several threads ask
+        # Threads asking for the same file wait for one load; different files load side by side (the
+        # cache-wide lock is only held for the lookups, never while loader() runs).
+        norm = os.path.normcase(os.path.abspath(path))
+        with self._lock:
+            cached = self.lookup(path)
+            if cached is not None: return cached
+            loading = self._loading.setdefault(norm, threading.Lock())
+        try:
+            with loading:
+                cached = self.lookup(path)  # Loaded by the thread this one waited for
+                if cached is not None: return cached
+                result = loader()
+                self.store(path, result)
+                return result
+        finally:
+            with self._lock:
+                if self._loading.get(norm) is loading: del self._loading[norm]
+
+    def invalidate(self, path=None):  # Forget one file, or everything when no path is given
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.normcase(os.path.abspath(path)), None)
+
+
+BOMS = [(codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')]
+SCAN_CHUNK = 1 << 20  # Bytes checked (and later decoded) per step
+SNIFF_CHARS = 2048  # Text handed to csv.Sniffer
+
+
+def _is_utf8(buf):  # True when the whole buffer decodes as UTF-8; ASCII-only chunks are skipped cheaply
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for start in range(0, len(buf), SCAN_CHUNK):
+            chunk = buf[start:start + SCAN_CHUNK]
+            if not chunk.isascii(): decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _detect_format(path):  # One sequential scan over a memory-mapped copy of the file
+    with stage("detect_format", file=os.path.basename(path)) as rec:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0: return 'utf-8', csv.excel
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                head = buf[:4]
+                encoding = next((enc for bom, enc in BOMS if head.startswith(bom)), None)
+                if encoding is None:  # No BOM: the whole file must be valid UTF-8, not just its first kilobyte
+                    encoding = 'utf-8' if _is_utf8(buf) else 'latin-1'  # Plain utf-8, so patching adds no BOM
+                sample = buf[:SNIFF_CHARS * 4].decode(encoding, errors='ignore')[:SNIFF_CHARS]
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        # What a writer needs to reproduce the file (patch_gradebook): the header row's line ending, and
+        # quotes around every field when the header's first one is quoted (e.g. "Last Name","First Name",...).
+        end = sample.find("\n")
+        style = {"lineterminator": "\r\n" if end < 0 or sample[end - 1:end] == "\r" else "\n"}
+        if sample[:1] == dialect.quotechar: style["quoting"] = csv.QUOTE_ALL
+        if any(getattr(dialect, k) != v for k, v in style.items()):
+            dialect = type("dialect", (dialect,), style)  # A subclass: csv.excel itself stays as it is
+        rec.update(encoding=encoding, delimiter=dialect.delimiter)
+    return encoding, dialect
+
+
+format_cache = ParsedFileCache(max_entries=32)  # Detection result per file version
+
+
+def detect_format(path):  # (encoding, dialect) of a CSV file, detected once per file version
+    return format_cache.get_or_load(path, lambda: _detect_format(path))
+
+
+@contextmanager
+def open_csv(path, raw=False):  # Stream a CSV: yields (headers, rows) where rows is a one-pass iterator of dicts
+    # Only the current row is held in memory, so this is what the large-file paths use.
+    # raw=True yields the header row exactly as written and rows as plain lists, for rewriting a file as is.
+    encoding, dialect = detect_format(path)
+    with open(path, mode='r', newline='', encoding=encoding, buffering=SCAN_CHUNK) as f:
+        if raw:
+            reader = csv.reader(f, dialect=dialect)
+            yield next(reader, []), reader
+            return
+        reader = csv.DictReader(f, dialect=dialect)
+        if reader.fieldnames: reader.fieldnames = [col.strip() for col in reader.fieldnames]
+        yield reader.fieldnames or [], reader
+
+
+def parse_csv(path, check=None):  # Read a CSV file into (rows, headers), detecting encoding and delimiter
+    with stage("parse", file=os.path.basename(path)) as rec, open_csv(path) as (headers, reader):
+        if check is None:
+            data = list(reader)
+        else:  # Give a background job the chance to cancel while huge files are read
+            data = []
+            for i, row in enumerate(reader):
+                if i % 5000 == 0: check()
+                data.append(row)
+        rec["rows"] = len(data)
+    return data, headers
+
+
+csv_cache = ParsedFileCache()
+
+
+def load_csv(path, check=None):  # Return (rows, headers) for a CSV, parsing it only once per file version
+    # Rows are shared between callers through csv_cache, so they must be treated as read-only.
+    try:
+        return csv_cache.get_or_load(path, lambda: parse_csv(path, check))
+    except Cancelled:
+        raise
+    except Exception as e:
+        log.error(f"Read Error: {e}")
+        raise
@@ -0,0 +1,113 @@
+import os  # Used for file system path operations
+from concurrent.futures import ThreadPoolExecutor  # Per-section files are written side by side
+
+from .attempts import policy_for
+from .core import (TooManyZeros, audit_report_path, merge_scores, patch_gradebook, resolve_columns,
+                   scores_by_username, too_many_zeros, write_audit_header, write_distribution_section, write_import,
+                   write_modified_section, write_resolved_section)
+from .csvio import open_csv
+from .headers import ColumnSchema, choose_target_column, recall, target_columns
+from .metrics import stage
+from .roster import RosterIndex, load_roster
+
+
+def section_name(gradebook_path):  # "exports/BIO101-02_Gradebook.csv" -> "BIO101-02_Gradebook"
+    return os.path.splitext(os.path.basename(gradebook_path))[0]
+
+
+def section_targets(sections, rosters, score_col, mapping_history):  # Target column per (gradebook, target) pair
+    # Explicit targets win; otherwise the column last used for that gradebook file, then the app's choice for
+    # the score column (remembered mapping, name match, first column). Each course has its own column IDs, so
+    # every gradebook is resolved on its own.
+    targets = []
+    for (path, target), roster in zip(sections, rosters):
+        columns = target_columns(roster.headers)
+        if target and target not in columns:
+            raise ValueError(f"Target column '{target}' not found in {os.path.basename(path)}.")
+        if not target:
+            target = (recall(mapping_history, os.path.basename(path), columns)
+                      or choose_target_column(columns, score_col, mapping_history))
+            if not target: raise ValueError(f"No score columns found in {os.path.basename(path)}.")
+        targets.append(target)
+    return targets
+
+
+def convert_sections(examsoft_path, sections, out_dir, score_col=None, mapping_history=None, allow_zeros=False,
+                     workers=None, patch=False, policy=None,
+                     policy_history=None):  # Split one ExamSoft export across several section gradebooks
+    # sections is a list of (gradebook_path, target_column_or_None). The gradebooks' roster indexes are
+    # combined into one, so the export is read and merged once (one pass, students matched by ID, username
+    # or name across every section) and each student is routed to the section(s) they are enrolled in.
+    # One import file per section (a patched gradebook copy with patch=True) is written to out_dir, the
+    # files in parallel, and a single Audit_Report.txt covers them all: students in no section, and each
+    # section's students without a score. Returns {"sections": [{"gradebook", "target", "out", "rows",
+    # "not_in_es"}], "rows", "not_in_bb", "resolved", "modified", "stats", "distribution", "score_col", "policy",
+    # "audit_path"}.
+    paths = [path for path, _ in sections]
+    workers = max(1, min(len(paths), workers or os.cpu_count() or 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rosters = list(pool.map(load_roster, paths))
+    with open_csv(examsoft_path) as (es_headers, _):  # Only the header row is read here
+        score_col, _ = resolve_columns(es_headers, rosters[0].headers, score_col, None, mapping_history)
+    targets = section_targets(sections, rosters, score_col, mapping_history or {})
+    policy = policy_for(targets[0], policy_history or {}, policy)  # One merge, so one policy for every section
+
+    combined = RosterIndex.combine(rosters)
+    owners = {}  # username -> indexes of the sections listing it (usually one)
+    for s, roster in enumerate(rosters):
+        for u in roster.by_username: owners.setdefault(u, []).append(s)
+    with open_csv(examsoft_path) as (headers, es_rows), stage("match", sections=len(paths)) as rec:
+        res = merge_scores(es_rows, ColumnSchema(headers, score_col), combined, policy=policy)
+        rec.update(rows=res["row_count"], students=len(res["rows"]))
+    if too_many_zeros(res) and not allow_zeros:
+        raise TooManyZeros(f"{res['zero_count']} students have a score of 0.")
+
+    routed = [[] for _ in paths]
+    for r in res["rows"]:
+        for s in owners.get(r.username, ()): routed[s].append(r)
+    os.makedirs(out_dir, exist_ok=True)
+    prefix = "BB_Gradebook_" if patch else "BB_Import_"
+    outs = [os.path.join(out_dir, f"{prefix}{section_name(p)}.csv") for p in paths]
+
+    def _write(s):  # Worker: one section's file
+        if patch: patch_gradebook(paths[s], outs[s], {targets[s]: scores_by_username(routed[s])})
+        else: write_import(outs[s], routed[s], targets[s])
+
+    with stage("write", sections=len(paths), workers=workers), ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_write, range(len(paths))))
+
+    summary = []
+    for s, roster in enumerate(rosters):
+        scored = {r.username for r in routed[s]}
+        summary.append({"gradebook": paths[s], "target": targets[s], "out": outs[s], "rows": len(routed[s]),
+                        "not_in_es": [f"- {name} ({u})" for u, name in roster.items() if u not in scored]})
+    result = {"sections": summary, "rows": res["rows"], "not_in_bb": res["not_in_bb"], "resolved": res["resolved"],
+              "modified": res["modified"],
+              "stats": res["stats"], "distribution": res["distribution"], "zero_count": res["zero_count"],
+              "score_col": score_col, "policy": policy}
+    result["audit_path"] = write_sections_report(result)
+    return result
+
+
+def write_sections_report(res):  # One Audit_Report.txt next to the section files; returns its path or None
+    if not (res["not_in_bb"] or res["resolved"] or res["modified"] or any(s["not_in_es"] for s in res["sections"])): return None
+    a_path = audit_report_path(res["sections"][0]["out"])
+    with stage("audit_report", sections=len(res["sections"])), open(a_path, 'w', encoding='utf-8') as f:
+        write_audit_header(f)
+        stats = res["stats"]
+        f.write(f"STATS: Avg {stats['avg']}% | High {stats['high']} | Low {stats['low']}\n\n")
+        if res.get("distribution"): write_distribution_section(f, res["distribution"])
+        f.write(f"SECTIONS ({len(res['sections'])}):\n")
+        for s in res["sections"]:
+            f.write(f"- {section_name(s['gradebook'])} -> '{s['target']}': {s['rows']} scores, "
+                    f"{len(s['not_in_es'])} missing -> {os.path.basename(s['out'])}\n")
+        if res["not_in_bb"]:
+            f.write(f"\n⚠️ IN EXAMSOFT ONLY - IN NO SECTION ({len(res['not_in_bb'])}):\n"
+                    + "\n".join(f"- {line}" for line in res["not_in_bb"]) + "\n")
+        for s in res["sections"]:
+            if s["not_in_es"]:
+                f.write(f"\n⚠️ MISSING SCORES - {section_name(s['gradebook'])} ({len(s['not_in_es'])}):\n"
+                        + "\n".join(s["not_in_es"]) + "\n")
+        if res["resolved"]: write_resolved_section(f, res["resolved"])
+        if res["modified"]: write_modified_section(f, res["modified"])
+    return a_path
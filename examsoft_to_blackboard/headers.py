@@ -0,0 +1,194 @@
+import re  # Header tokens and Blackboard's column metadata
+from functools import lru_cache  # One HeaderIndex per distinct header row
+
+SCORE_KEYWORDS = ("score", "percent", "point")  # Found anywhere in a token they mark a score column ("subscores")
+SCORE_PREFIXES = ("%", "pts", "pct", "raw")  # Short ones only at the start of a token, so "attempts" is not one
+ROSTER_COLUMNS = {"last name", "first name", "username", "student id", "last access", "availability", "email",
+                  "child course id"}  # Token-joined names of the gradebook's non-score columns
+SECTION_HEADERS = {"section", "section name", "section id", "class section", "course section", "group"}  # Whole names
+FIELD_ALIASES = {  # Token sequences naming each student field, best first. A header equal to one matches; failing
+    # that, a header containing every token of the first one does ("Student ID Number"), so "Last Access"
+    # can never stand in for "Last Name" and "Student Email" never for "Student ID". A bare "ID" column is
+    # not taken as the student ID: it could be any identifier, and student IDs are matched first.
+    "email": [("email",), ("email", "address"), ("e", "mail")],
+    "username": [("username",), ("user", "name"), ("user", "id"), ("login",)],
+    "student_id": [("student", "id"), ("studentid",), ("student", "number"), ("student", "no"),
+                   ("exam", "taker", "id")],
+    "first": [("first", "name"), ("first",), ("firstname",), ("given", "name")],
+    "last": [("last", "name"), ("last",), ("lastname",), ("surname",), ("family", "name")],
+}
+HISTORY_DECAY = 0.5  # Each new mapping halves the weight of the older ones for the same key
+MAX_REMEMBERED = 5  # Targets kept per mapping_history key
+MATCH_QUALITY = {"header": 1.0, "id": 0.9, "name": 0.6}  # How a remembered target was found among today's columns
+
+_CAMEL = re.compile(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")  # "StudentID" -> "Student ID"
+_TOKEN = re.compile(r"%|[a-z]+|\d+(?:\.\d+)?")
+_BB_COLUMN = re.compile(r"^(?P<name>.*?)\s*\[\s*Total\s+Pts:\s*(?:up\s+to\s+)?(?P<points>\d+(?:\.\d+)?)\s*"
+                        r"(?P<display>[^\]]*)\]\s*(?:\|\s*(?P<id>\d+))?\s*$", re.IGNORECASE)
+
+
+def tokenize(text):  # "StudentID" -> ("student", "id"); "Quiz_1 (%)" -> ("quiz", "1", "%")
+    return tuple(_TOKEN.findall(_CAMEL.sub(" ", text or "").lower()))
+
+
+def is_score_token(token):  # "scores", "subscore", "pts", "percentage", "%"... but not "attempts"
+    return token.startswith(SCORE_PREFIXES) or any(k in token for k in SCORE_KEYWORDS)
+
+
+class GradeColumn:  # A Blackboard gradebook header split into its parts
+    # "Quiz 1 [Total Pts: 100 Percentage] |1736330" -> name "Quiz 1", points 100.0, display "percentage",
+    # id "1736330". Headers without the metadata keep the whole (stripped) header as the name.
+    __slots__ = ("header", "name", "points", "display", "id")
+
+    def __init__(self, header):  # Define a function
+        self.header = header
+        m = _BB_COLUMN.match(header.strip())
+        if m:
+            self.name, self.points = m.group("name").strip(), float(m.group("points"))
+            self.display, self.id = m.group("display").strip().lower(), m.group("id")
+        else:
+            self.name, self.points, self.display, self.id = header.strip(), None, "", column_id(header)
+            if self.id: self.name = header.rpartition("|")[0].strip()
+
+
+class HeaderIndex:  # One file's header row, tokenised and indexed once
+    # Student fields are resolved by FIELD_ALIASES, score columns by their tokens, and gradebook columns by
+    # exact header, |ID and name, so every lookup afterwards is a dict hit however many columns there are.
+    # Use header_index() to share one index between every consumer of the same header row.
+    # Built complete in __init__ and never changed afterwards, so worker threads can share one.
+    __slots__ = ("headers", "tokens", "parsed", "fields", "by_header", "by_id", "by_name")
+
+    def __init__(self, headers):  # Define a function
+        self.headers = list(headers)
+        self.tokens = [tokenize(h) for h in self.headers]
+        self.parsed = [GradeColumn(h) for h in self.headers]
+        self.by_header, self.by_id, self.by_name = {}, {}, {}
+        for i, (h, col) in enumerate(zip(self.headers, self.parsed)):
+            self.by_header.setdefault(h.strip(), i)
+            if col.id: self.by_id.setdefault(col.id, i)
+            self.by_name.setdefault(col.name.lower(), []).append(i)
+        self.fields = {field: self._resolve(aliases) for field, aliases in FIELD_ALIASES.items()}
+
+    def _resolve(self, aliases):  # Header for one field: an exact alias first (in alias order), then a superset
+        for alias in aliases:
+            for h, tokens in zip(self.headers, self.tokens):
+                if tokens == alias: return h
+        key = set(aliases[0])
+        return next((h for h, tokens in zip(self.headers, self.tokens) if key <= set(tokens)), "")
+
+    def field(self, name):  # Header of a student field ("email", "username", ...), or ""
+        return self.fields[name]
+
+    def score_columns(self):  # Candidate ExamSoft score columns and the default choice ("%" first)
+        found = [h for h, tokens in zip(self.headers, self.tokens) if any(map(is_score_token, tokens))]
+        return found, next((h for h in found if "%" in h), found[0] if found else "")
+
+    def target_columns(self):  # Gradebook columns that can receive scores, in file order
+        return [h for h, tokens in zip(self.headers, self.tokens) if " ".join(tokens) not in ROSTER_COLUMNS]
+
+    def find(self, target):  # Index of a target column: exact name first, then the same column ID
+        i = self.by_header.get(target.strip())
+        if i is not None: return i
+        cid = column_id(target)
+        return self.by_id.get(cid) if cid else None
+
+    def locate(self, target):  # (header, how) for a remembered target among these columns, or (None, None)
+        # how is "header" (unchanged), "id" (renamed, same column) or "name" (same name in another gradebook,
+        # e.g. next term's copy of the course; only when exactly one column has it).
+        i = self.by_header.get(target.strip())
+        if i is not None: return self.headers[i], "header"
+        cid = column_id(target)
+        if cid and cid in self.by_id: return self.headers[self.by_id[cid]], "id"
+        same = self.by_name.get(GradeColumn(target).name.lower(), [])
+        return (self.headers[same[0]], "name") if len(same) == 1 else (None, None)
+
+
+@lru_cache(maxsize=32)
+def _index(headers):  # Cached HeaderIndex for a header tuple
+    return HeaderIndex(headers)
+
+
+def header_index(headers):  # Shared HeaderIndex for a header row (built once per distinct row)
+    return _index(tuple(headers or ()))
+
+
+class ColumnSchema:  # Column names resolved once per file and reused for every row (and by preview/audit/export)
+    __slots__ = ("email", "username", "student_id", "first", "last", "score", "section")
+
+    def __init__(self, headers, score=""):  # Define a function
+        fields = header_index(headers).fields
+        self.email, self.username, self.student_id = fields["email"], fields["username"], fields["student_id"]
+        self.first, self.last = fields["first"], fields["last"]
+        self.score = score
+        self.section = next((h for h in headers or [] if h.strip().lower() in SECTION_HEADERS), "")  # Per-section stats
+
+    def with_score(self, score):  # Same file, different score column (no header rescan)
+        other = ColumnSchema.__new__(ColumnSchema)
+        for name in ColumnSchema.__slots__: setattr(other, name, getattr(self, name))
+        other.score = score
+        return other
+
+
+def as_schema(headers, score=None):  # Accept either a header list or an already resolved ColumnSchema
+    if isinstance(headers, ColumnSchema):
+        return headers if score is None or score == headers.score else headers.with_score(score)
+    return ColumnSchema(headers, score or "")
+
+
+def score_columns(headers):  # Candidate ExamSoft score columns and the default choice
+    return header_index(headers).score_columns()
+
+
+def target_columns(headers):  # Gradebook columns that can receive scores
+    return header_index(headers).target_columns()
+
+
+def column_id(header):  # Blackboard column ID: "Quiz 1 [Total Pts: 100 Percentage] |1736330" -> "1736330"
+    _, sep, cid = header.rpartition("|")
+    cid = cid.strip()
+    return cid if sep and cid.isdigit() else None
+
+
+def find_column(headers, target):  # Index of a target column: exact name first, then the same column ID
+    return header_index(headers).find(target)
+
+
+def remembered(mapping_history, key):  # {target: weight} remembered for a key (older plain-string entries: weight 1)
+    value = mapping_history.get(key)
+    if isinstance(value, str): return {value: 1.0}
+    return dict(value) if isinstance(value, dict) else {}
+
+
+def remember(mapping_history, key, target):  # Record that `key` (score column or file name) was mapped to target
+    # Every earlier target for the key loses half its weight and this one gains 1, so the usual choice wins
+    # over a one-off. Only the MAX_REMEMBERED heaviest are kept.
+    weights = {t: w * HISTORY_DECAY for t, w in remembered(mapping_history, key).items()}
+    weights[target] = weights.get(target, 0.0) + 1.0
+    best = sorted(weights.items(), key=lambda item: -item[1])[:MAX_REMEMBERED]
+    mapping_history[key] = {t: round(w, 4) for t, w in best}
+
+
+def recall(mapping_history, key, columns, taken=()):  # Best remembered target for key among columns, or None
+    # Each remembered target is looked up in today's columns (HeaderIndex.locate) and scored by its weight
+    # times MATCH_QUALITY, so a mapping survives a renamed column or a new copy of the course.
+    weights = remembered(mapping_history, key)
+    if not weights: return None
+    index, best, best_score = header_index(columns), None, 0.0
+    for target, weight in weights.items():
+        header, how = index.locate(target)
+        if header is None or header in taken: continue
+        score = weight * MATCH_QUALITY[how]
+        if score > best_score: best, best_score = header, score
+    return best
+
+
+def choose_target_column(columns, score_col, mapping_history):  # Remembered mapping, name match, or first column
+    hist = recall(mapping_history, score_col, columns)
+    if hist: return hist
+    wanted = tuple(t for t in tokenize(score_col) if not is_score_token(t))  # "Quiz 3 %" -> quiz, 3
+    if wanted:
+        names = [tokenize(col.name) for col in header_index(columns).parsed]
+        named = next((c for c, name in zip(columns, names) if name == wanted), None)
+        named = named or next((c for c, name in zip(columns, names) if set(wanted) <= set(name)), None)
+        if named: return named
+    return columns[0] if columns else ""
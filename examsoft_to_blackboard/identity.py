@@ -0,0 +1,135 @@
+import unicodedata  # Accent folding for name comparison
+
+from .roster import username_from_email
+
+NAME_THRESHOLD = 0.8  # Lowest name similarity (Dice coefficient over trigrams) accepted as a match
+NAME_MARGIN = 0.08  # The best name candidate must beat the runner-up by this much, or nobody is matched
+NAME_WEIGHT = 0.95  # A name match is never reported as certain as an ID or username match
+CONFLICT_CONFIDENCE = 0.6  # Student ID and username point at two different gradebook rows
+MAX_POSTINGS = 200  # Trigrams shared by more roster rows than this are too common to narrow the search
+
+
+def normalise_id(value):  # "0012345 " -> "12345": spreadsheets drop leading zeros from numeric IDs
+    value = (value or "").strip().lower()
+    return (value.lstrip("0") or value) if value.isdigit() else value
+
+
+def ids_compatible(a, b):  # Same student ID, allowing one mistyped or swapped character (blank: unknown)
+    a, b = normalise_id(a), normalise_id(b)
+    if not a or not b or a == b: return True
+    if len(a) != len(b): return False
+    diff = [i for i, (x, y) in enumerate(zip(a, b)) if x != y]
+    return len(diff) == 1 or (len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]]
+                               and a[diff[1]] == b[diff[0]])
+
+
+def normalise_name(first, last):  # "Zoë", "O'Brien" -> "brien o zoe" (accent-free, case-free, word order free)
+    text = unicodedata.normalize("NFKD", f"{first or ''} {last or ''}")
+    text = "".join(c if c.isalpha() else " " for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join(sorted(text.split()))
+
+
+def name_grams(name):  # Character trigrams of a normalised name, padded so short names still have some
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Match:  # Gradebook row an ExamSoft student was resolved to
+    __slots__ = ("row", "method", "confidence")  # method: "id", "username" or "name"; confidence 0..1
+
+    def __init__(self, row, method, confidence):  # Define a function
+        self.row, self.method, self.confidence = row, method, confidence
+
+
+class NameIndex:  # Trigram inverted index over a set of gradebook rows, for fuzzy name search
+    # Only rows sharing a distinctive trigram with the query are scored (trigrams common to more than
+    # MAX_POSTINGS rows are not used to find candidates), so a search touches a small block of the roster
+    # instead of every row.
+    def __init__(self, roster, rows):  # Define a function
+        first, last = roster.columns["first"], roster.columns["last"]
+        self.grams = {}  # row -> trigram set
+        self.postings = {}  # trigram -> [row, ...]
+        for i in rows:
+            grams = name_grams(normalise_name(first[i], last[i]))
+            if len(grams) < 3: continue
+            self.grams[i] = grams
+            for g in grams: self.postings.setdefault(g, []).append(i)
+
+    def search(self, first, last, accept=None):  # (row, similarity) of the best unambiguous candidate, or None
+        # accept(row) can veto candidates (e.g. a different student ID) before they are scored.
+        query = name_grams(normalise_name(first, last))
+        if len(query) < 3: return None
+        candidates = set()  # Rows sharing at least one distinctive trigram with the query
+        for g in query:
+            rows = self.postings.get(g, ())
+            if len(rows) <= MAX_POSTINGS: candidates.update(rows)
+        best, runner_up = (None, 0.0), 0.0
+        for i in candidates:
+            grams = self.grams[i]
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score < NAME_THRESHOLD - NAME_MARGIN or (accept and not accept(i)): continue  # Cannot matter
+            if score > best[1]: best, runner_up = (i, score), best[1]
+            elif score > runner_up: runner_up = score
+        if best[0] is None or best[1] < NAME_THRESHOLD or best[1] - runner_up < NAME_MARGIN: return None
+        return best
+
+
+class IdentityResolver:  # Match ExamSoft students to gradebook rows: student ID, then username, then name
+    # resolve() takes each distinct ExamSoft student once (not every attempt): exact() costs two dictionary
+    # lookups, and the students it cannot place go through by_name() together, after every exact match is
+    # known, so name matches can only take gradebook rows nobody else claimed.
+    def __init__(self, roster):  # roster: a RosterIndex
+        self.roster = roster
+        self._ids = None  # normalise_id(student ID) -> row, built on the first ID that misses the exact lookup
+
+    def find_id(self, student_id):  # Row for an ExamSoft student ID (already stripped), or None
+        if not student_id: return None
+        by_id = self.roster.by_student_id
+        i = by_id.get(student_id)
+        if i is not None: return i
+        if self._ids is None:  # Only IDs that normalise differently need an entry here
+            self._ids = {normalise_id(sid): i for sid, i in by_id.items() if sid[:1] == "0" or not sid.isdigit()}
+        key = normalise_id(student_id)
+        i = self._ids.get(key)
+        return i if i is not None else by_id.get(key)
+
+    def exact(self, student_id, email, username=None):  # Match by student ID, then by email/username, or None
+        # student_id is expected stripped; username may be passed when the caller already has it.
+        roster = self.roster
+        by_id = roster.by_student_id.get(student_id) if student_id else None
+        if by_id is None and student_id: by_id = self.find_id(student_id)
+        by_user = roster.by_email.get(email.lower().strip()) if email and roster.by_email else None
+        if by_user is None and (email or username):
+            by_user = roster.by_username.get(username or username_from_email(email))
+        if by_id is not None and not roster.columns["username"][by_id]: by_id = None  # Cannot be imported
+        if by_id is None:
+            return Match(by_user, "username", 1.0) if by_user is not None else None
+        if by_user is None or by_user == by_id: return Match(by_id, "id", 1.0)
+        return Match(by_id, "id", CONFLICT_CONFIDENCE)  # The ID wins, but the audit report asks for a check
+
+    def resolve(self, students):  # {key: Match} for (key, student ID, email, username, first, last) students
+        matches, pending = {}, []
+        for key, student_id, email, username, first, last in students:
+            match = self.exact(student_id, email, username)
+            if match: matches[key] = match
+            else: pending.append((key, student_id, first, last))
+        matches.update(self.by_name(pending, {m.row for m in matches.values()}))
+        return matches
+
+    def by_name(self, students, claimed):  # {key: Match} for (key, student ID, first, last) students, by name
+        # Each gradebook row goes to at most one student, the closest one; rows in `claimed` are never used,
+        # nor rows whose student ID clearly differs (ids_compatible): same name, different person.
+        usernames, student_ids = self.roster.columns["username"], self.roster.columns["student_id"]
+        pool = [i for i, u in enumerate(usernames) if u and i not in claimed]
+        if not students or not pool: return {}
+        index = NameIndex(self.roster, pool)
+        found = []
+        for key, student_id, first, last in students:
+            hit = index.search(first, last, lambda i: ids_compatible(student_id, student_ids[i]))
+            if hit: found.append((hit[1], key, hit[0]))
+        matches, taken = {}, set()
+        for score, key, row in sorted(found, key=lambda f: -f[0]):
+            if row in taken: continue
+            taken.add(row)
+            matches[key] = Match(row, "name", round(score * NAME_WEIGHT, 2))
+        return matches
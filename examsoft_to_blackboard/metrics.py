@@ -0,0 +1,122 @@
+import json  # One JSON object per metrics record
+import logging  # Records go through a logger, so they also land in converter_debug.log
+import os  # Used for file system path operations
+import sys  # Platform check for peak memory sampling
+import threading  # Profile file names are unique per thread
+import time  # Stage timers
+from contextlib import contextmanager  # stage() / profiled() wrap a block of work
+from datetime import datetime  # Profile file names
+
+log = logging.getLogger(__name__)  # "examsoft_to_blackboard.metrics": the message is the JSON record
+PROFILE_ENV = "EXAMSOFT_PROFILE"  # Set to a folder to capture cProfile + tracemalloc data for every job
+METRICS_ENV = "EXAMSOFT_METRICS"  # Set (to anything) to record stage timings in the app
+
+_profile_dir = None  # Set by enable_profiling()
+
+
+def _peak_rss_mb():  # Process peak resident memory so far, or None where it cannot be read cheaply
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class _Counters(ctypes.Structure):  # PROCESS_MEMORY_COUNTERS
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaNonPagedPoolUsage", ctypes.c_size_t), ("PagefileUsage", ctypes.c_size_t),
+                            ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = _Counters()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                     ctypes.byref(counters), counters.cb)
+            return round(counters.PeakWorkingSetSize / 1e6, 1)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux, bytes on macOS
+        return round(peak / (1e6 if sys.platform == "darwin" else 1e3), 1)
+    except Exception:
+        return None
+
+
+def emit(record):  # Write one metrics record (a dict) if anyone is listening
+    if log.isEnabledFor(logging.INFO): log.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def stage(name, **fields):  # Time a block of work and emit {"stage", "seconds", "peak_*_mb", ...fields}
+    # The block receives the record and may add counters to it, e.g. `rec["rows"] = len(rows)`.
+    # peak_traced_mb (only while tracemalloc runs) is the peak since the latest stage started, so for nested
+    # stages it covers the tail after the last inner one. Without a listener a stage costs one level check.
+    rec = {"stage": name, **fields}
+    if not log.isEnabledFor(logging.INFO):
+        yield rec
+        return
+    tracemalloc = sys.modules.get("tracemalloc")  # Only loaded once enable_profiling() asked for it
+    tracing = tracemalloc is not None and tracemalloc.is_tracing()
+    if tracing: tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec["error"] = type(e).__name__
+        raise
+    finally:
+        rec["seconds"] = round(time.perf_counter() - start, 6)
+        if rec.get("rows") and rec["seconds"]: rec["rows_per_sec"] = round(rec["rows"] / rec["seconds"])
+        if tracing: rec["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        rec["peak_rss_mb"] = _peak_rss_mb()
+        emit(rec)
+
+
+def open_sink(path):  # Also append metrics records, one JSON object per line, to `path`
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    if log.getEffectiveLevel() > logging.INFO: log.setLevel(logging.INFO)
+    return handler
+
+
+def enable_profiling(profile_dir, trace_memory=True):  # Opt in to cProfile files per job and tracemalloc peaks
+    global _profile_dir
+    os.makedirs(profile_dir, exist_ok=True)
+    _profile_dir = profile_dir
+    if trace_memory:
+        import tracemalloc  # Opt-in allocation tracing (imported here to keep it out of normal startup)
+        if not tracemalloc.is_tracing(): tracemalloc.start()
+    if log.getEffectiveLevel() > logging.INFO: log.setLevel(logging.INFO)
+
+
+def profiling_from_env():  # enable_profiling() when EXAMSOFT_PROFILE names a folder
+    folder = os.environ.get(PROFILE_ENV)
+    if folder: enable_profiling(folder)
+    return folder
+
+
+@contextmanager
+def profiled(name):  # Run a block under cProfile when profiling is enabled; writes <dir>/<name>-<time>.prof
+    if _profile_dir is None:
+        yield
+        return
+    import cProfile  # Opt-in per-job profiles
+    import tracemalloc
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:  # Python 3.12+: only one profiler may run at a time (another job is being profiled)
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        if tracemalloc.is_tracing():  # Largest live allocations by source line, taken before the profile is saved
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, cProfile.__file__)])
+            top = snapshot.statistics("lineno")[:10]
+            emit({"stage": "allocations", "name": name,
+                  "top": [{"where": str(s.traceback), "mb": round(s.size / 1e6, 3), "count": s.count} for s in top]})
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(_profile_dir, f"{name}-{stamp}-{threading.get_ident()}.prof")
+        profile.dump_stats(path)
+        emit({"stage": "profile", "name": name, "path": path})
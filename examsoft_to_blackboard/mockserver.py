@@ -0,0 +1,163 @@
+import base64  # Checks the Basic auth header of token requests
+import json  # Request and response bodies
+import random  # Injected failures
+import re  # Route matching
+import secrets  # Access tokens
+import threading  # The server runs on a background thread
+import time  # Simulated latency
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Keep-alive HTTP/1.1, one thread per connection
+from urllib.parse import parse_qs, unquote, urlsplit  # Query strings and encoded path segments
+
+from .headers import column_id, target_columns
+from .roster import load_roster
+from .upload import API_PREFIX, TOKEN_PATH, column_name
+
+PAGE_SIZE = 100  # Columns per page, as Blackboard pages its lists
+_COLUMNS = re.compile(r"^/v2/courses/([^/]+)/gradebook/columns$")
+_GRADE = re.compile(r"^/v2/courses/([^/]+)/gradebook/columns/([^/]+)/users/([^/]+)$")
+
+
+class _Handler(BaseHTTPRequestHandler):  # Routes one request to the MockGradebookServer
+    protocol_version = "HTTP/1.1"  # Keep connections open between requests, like the real API
+    disable_nagle_algorithm = True  # Headers and body are two writes: don't hold the body back for an ACK
+
+    def setup(self):  # New connection
+        super().setup()
+        with self.server.lock: self.server.connections += 1
+
+    def log_message(self, fmt, *args):  # Quiet: a benchmark sends tens of thousands of requests
+        pass
+
+    def _reply(self, status, body, headers=None):  # Send a JSON response with a Content-Length
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items(): self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):  # Raw request body
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _handle(self, method):  # Shared entry point: latency, fault injection, auth, routing
+        srv = self.server
+        body = self._body()
+        with srv.lock:
+            srv.requests += 1
+            srv.in_flight += 1
+            srv.peak_in_flight = max(srv.peak_in_flight, srv.in_flight)
+            fault = srv.rng.random() < srv.fail_rate
+            throttle = srv.throttle_every and srv.requests % srv.throttle_every == 0
+        try:
+            if srv.latency: time.sleep(srv.latency)
+            if throttle: return self._reply(429, {"status": 429, "message": "Too many requests"}, {"Retry-After": "0"})
+            if fault: return self._reply(503, {"status": 503, "message": "Service unavailable (injected)"})
+            url = urlsplit(self.path)
+            if not url.path.startswith(API_PREFIX): return self._reply(404, {"status": 404, "message": "Not found"})
+            path = url.path[len(API_PREFIX):]
+            if method == "POST" and path == TOKEN_PATH: return self._token()
+            if self.headers.get("Authorization") not in srv.tokens:
+                return self._reply(401, {"status": 401, "message": "Bearer token is invalid"})
+            m = _COLUMNS.match(path)
+            if method == "GET" and m: return self._columns(unquote(m.group(1)), parse_qs(url.query))
+            m = _GRADE.match(path)
+            if method == "PATCH" and m: return self._grade(*(unquote(g) for g in m.groups()), body)
+            self._reply(404, {"status": 404, "message": "Not found"})
+        finally:
+            with srv.lock: srv.in_flight -= 1
+
+    def _token(self):  # POST /v1/oauth2/token (client credentials)
+        srv = self.server
+        expected = base64.b64encode(f"{srv.key}:{srv.secret}".encode("utf-8")).decode("ascii")
+        if self.headers.get("Authorization") != f"Basic {expected}":
+            return self._reply(401, {"error": "invalid_client", "message": "Invalid key or secret"})
+        token = secrets.token_hex(16)
+        with srv.lock: srv.tokens.add(f"Bearer {token}")
+        self._reply(200, {"access_token": token, "token_type": "bearer", "expires_in": 3600})
+
+    def _columns(self, course, query):  # GET .../gradebook/columns, paged
+        srv = self.server
+        if course != srv.course_id: return self._reply(404, {"status": 404, "message": "Course not found"})
+        offset = int(query.get("offset", ["0"])[0])
+        page = [{"id": cid, "name": name, "score": {"possible": 100.0}}
+                for cid, name in list(srv.columns.items())[offset:offset + PAGE_SIZE]]
+        body = {"results": page}
+        if offset + PAGE_SIZE < len(srv.columns):
+            body["paging"] = {"nextPage": f"{API_PREFIX}/v2/courses/{course}/gradebook/columns?offset={offset + PAGE_SIZE}"}
+        self._reply(200, body)
+
+    def _grade(self, course, column, user, body):  # PATCH .../columns/{column}/users/{user}
+        srv = self.server
+        if course != srv.course_id or column not in srv.columns:
+            return self._reply(404, {"status": 404, "message": "Gradebook column not found"})
+        username = user[len("userName:"):] if user.startswith("userName:") else srv.by_pk.get(user)
+        if username not in srv.users:
+            return self._reply(404, {"status": 404, "message": f"User {user} is not enrolled"})
+        try:
+            score = float(json.loads(body)["score"])
+        except (ValueError, KeyError, TypeError):
+            return self._reply(400, {"status": 400, "message": "Body must be {\"score\": <number>}"})
+        with srv.lock: srv.grades[(column, username)] = score
+        self._reply(200, {"userId": srv.users[username], "columnId": column, "score": score,
+                          "status": "Graded"})
+
+    def do_GET(self):  # Define a function
+        self._handle("GET")
+
+    def do_POST(self):  # Define a function
+        self._handle("POST")
+
+    def do_PATCH(self):  # Define a function
+        self._handle("PATCH")
+
+
+class MockGradebookServer(ThreadingHTTPServer):  # Local stand-in for the Blackboard gradebook API
+    # Serves the subset GradebookClient uses (token, paged column list, grade PATCH by userName: or user ID)
+    # over keep-alive HTTP/1.1 on 127.0.0.1, keeping every grade in memory (`grades`: {(column ID, username):
+    # score}). `latency` seconds are added to every request; `fail_rate` of requests get a 503 and every
+    # `throttle_every`-th a 429 with Retry-After, so retries can be exercised. Counters (requests,
+    # connections, peak_in_flight) show how the client behaved.
+    daemon_threads = True
+
+    def __init__(self, columns, usernames, course_id="_1_1", host="127.0.0.1", port=0, key="key",
+                 secret="secret", latency=0.0, fail_rate=0.0, throttle_every=0, seed=0):  # columns: {ID: name}
+        super().__init__((host, port), _Handler)
+        self.columns, self.course_id, self.key, self.secret = dict(columns), course_id, key, secret
+        self.users = {u: f"_{i}_1" for i, u in enumerate(usernames, start=1)}  # username -> user ID
+        self.by_pk = {pk: u for u, pk in self.users.items()}
+        self.latency, self.fail_rate, self.throttle_every = latency, fail_rate, throttle_every
+        self.rng = random.Random(seed)
+        self.tokens, self.grades = set(), {}
+        self.requests = self.connections = self.in_flight = self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_gradebook(cls, gradebook_path, **kwargs):  # Server with the columns and students of a gradebook export
+        roster = load_roster(gradebook_path, None)
+        columns = {}
+        for i, header in enumerate(target_columns(roster.headers), start=1):
+            cid = column_id(header)
+            columns[f"_{cid}_1" if cid else f"_{900000 + i}_1"] = column_name(header)
+        return cls(columns, [u for u in roster.columns["username"] if u], **kwargs)
+
+    @property
+    def url(self):  # Base URL to give GradebookClient
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):  # Serve on a background thread; returns self
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-gradebook", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):  # Stop serving and close the socket
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):  # Define a function
+        return self.start()
+
+    def __exit__(self, *exc):  # Define a function
+        self.stop()
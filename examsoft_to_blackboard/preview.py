@@ -0,0 +1,51 @@
+TAG_FILTERS = {"All rows": None, "Missing from gradebook": "missing", "Modified scores": "modified"}
+
+
+def _score_key(value):  # Sort key for the score column: numeric, non-numbers last
+    try:
+        return 0, float(value)
+    except (TypeError, ValueError):
+        return 1, 0.0
+
+
+class PreviewTable:  # Sorted/filtered view over the full preview; the GUI only ever renders a window of it
+    # items are ((user, id, score), tags) pairs from preview_rows(). The view is a list of indices into them,
+    # rebuilt only when the filter or sort changes, so scrolling is a slice.
+    COLUMNS = ("User", "ID", "Score")
+
+    def __init__(self, items):  # Define a function
+        self.items = items
+        self.tag = None  # Only rows carrying this tag ("missing" / "modified"); None shows everything
+        self.sort_col, self.reverse = None, False
+        self._view = range(len(items))
+
+    def set_filter(self, tag):  # Show only rows with this tag (None: all rows)
+        if tag != self.tag:
+            self.tag = tag
+            self._rebuild()
+
+    def sort_by(self, col, reverse=None):  # Sort by a column index; the same column again flips the order
+        self.reverse = (not self.reverse if col == self.sort_col else False) if reverse is None else reverse
+        self.sort_col = col
+        self._rebuild()
+
+    def _rebuild(self):  # Define a function
+        items = self.items
+        view = range(len(items)) if self.tag is None else [i for i, (_, tags) in enumerate(items) if self.tag in tags]
+        if self.sort_col is not None:
+            col = self.sort_col
+            key = (lambda i: _score_key(items[i][0][col])) if col == 2 else (lambda i: items[i][0][col].lower())
+            view = sorted(view, key=key, reverse=self.reverse)
+        self._view = view
+
+    def __len__(self):  # Rows in the current view
+        return len(self._view)
+
+    def window(self, start, count):  # Rows start .. start+count of the current view
+        return [self.items[i] for i in self._view[start:start + count]]
+
+    def counts(self):  # {tag: rows carrying it} over the whole preview
+        counts = {"missing": 0, "modified": 0}
+        for _, tags in self.items:
+            for tag in tags: counts[tag] += 1
+        return counts
@@ -0,0 +1,166 @@
+import gzip  # Compressed on-disk results
+import hashlib  # Content hashes for cache keys
+import json  # Result file format
+import logging  # Used to report cache write errors
+import os  # Used for file system path operations
+import threading  # The GUI may look up results from two worker threads
+
+from . import config
+from .attempts import DEFAULT_POLICY
+from .core import StudentScore
+
+log = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(config.CACHE_DIR, "results")
+RESULT_VERSION = 6  # Bump when the merge output changes for the same inputs (e.g. score parsing rules)
+MAX_CACHE_BYTES = 64 * 1024 * 1024  # Least recently used results are deleted beyond this
+HASH_CHUNK = 1 << 20
+RESULT_KEYS = ("zero_count", "stats", "not_in_bb", "not_in_es", "resolved", "matched_by", "modified",
+               "distribution")  # Besides rows
+
+
+def file_digest(path):  # SHA-1 of a file's contents, read in 1 MiB chunks
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""): h.update(chunk)
+    return h.hexdigest()
+
+
+def roster_digest(roster):  # SHA-1 of every roster row's username, student ID, names and email, in gradebook order
+    # Only what the merge reads (RosterIndex.FIELDS: identity matching uses IDs and emails too) is hashed, so a
+    # fresh gradebook export where only "Last Access" moved still hits.
+    h = hashlib.sha1()
+    for row in zip(*(roster.columns[name] for name in roster.FIELDS)):
+        h.update(("\x1f".join(v or "" for v in row) + "\x1e").encode("utf-8"))  # No name column: None
+    return h.hexdigest()
+
+
+def last_run_id(gradebook_path, target):  # last_runs.json key: the same column in another course is another run
+    gradebook = os.path.normcase(os.path.abspath(gradebook_path)) if gradebook_path else ""
+    return f"{gradebook}\x1f{target}"
+
+
+def diff_rows(old_rows, new_rows):  # Row-level changes between two runs, keyed by username
+    # Returns {"added": [(username, score)], "removed": [(username, score)], "changed": [(username, old, new)]}.
+    old = {r.username: r.text for r in old_rows}
+    new = {r.username: r.text for r in new_rows}
+    return {"added": [(u, s) for u, s in new.items() if u not in old],
+            "removed": [(u, s) for u, s in old.items() if u not in new],
+            "changed": [(u, old[u], s) for u, s in new.items() if u in old and old[u] != s]}
+
+
+def _encode(res):  # JSON-serialisable copy of a merge result
+    data = {k: res[k] for k in RESULT_KEYS}
+    data["rows"] = [[r.last, r.first, r.username, r.student_id, r.score, r.text] for r in res["rows"]]
+    return data
+
+
+def _decode(data):  # Inverse of _encode()
+    res = {k: data[k] for k in RESULT_KEYS}
+    res["rows"] = [StudentScore(*r) for r in data["rows"]]
+    return res
+
+
+class ResultCache:  # Merge results on disk, keyed by what went into them
+    # The key is a hash of the ExamSoft file contents, the roster, the score and target columns and the
+    # attempt policy, so an unchanged re-run skips parse and merge entirely. The last exported result per
+    # (gradebook, target column) is remembered to diff the next run against (so switching policy shows which
+    # grades it moved). Files are touched on every hit and the least recently used ones are deleted once the
+    # folder exceeds max_bytes. Parse and merge run outside the lock, so several conversions can share one
+    # cache; only the folder and last_runs.json bookkeeping is serialised.
+    def __init__(self, cache_dir=RESULTS_DIR, max_bytes=MAX_CACHE_BYTES):  # Define a function
+        self.cache_dir, self.max_bytes = cache_dir, max_bytes
+        self._lock = threading.RLock()  # Guards eviction and last_runs.json
+
+    def key(self, examsoft_path, roster, score_col, target, policy=None):  # Content-addressed key for one conversion
+        parts = [str(RESULT_VERSION), file_digest(examsoft_path), roster_digest(roster), score_col, target]
+        if policy and policy != DEFAULT_POLICY: parts.append(policy)  # Results cached before policies still hit
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key):  # Define a function
+        return os.path.join(self.cache_dir, key + ".json.gz")
+
+    def get(self, key):  # Cached merge result, or None
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                res = _decode(json.load(f))
+            os.utime(path)  # Mark as recently used
+            return res
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, key, res):  # Store a merge result and evict the least recently used ones over the limit
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"  # Two threads may store the same key at once
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=5) as f:
+                json.dump(_encode(res), f, separators=(",", ":"))
+            os.replace(tmp, path)
+            with self._lock: self._evict()
+        except OSError as e:
+            log.warning(f"Result not cached: {e}")
+
+    def _evict(self):  # Delete the oldest results until the folder fits in max_bytes
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json.gz"): continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:  # Replaced or removed meanwhile
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes: break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+
+    def _last_path(self):  # Define a function
+        return os.path.join(self.cache_dir, "last_runs.json")
+
+    def _read_last(self):  # {gradebook + target: key} of the runs behind the current outputs
+        try:
+            with open(self._last_path(), 'r') as f: return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def last_key(self, gradebook_path, target):  # Key of the previous exported run for a gradebook column, or None
+        with self._lock: return self._read_last().get(last_run_id(gradebook_path, target))
+
+    def set_last(self, gradebook_path, target, key):  # Record the run whose output was just written
+        with self._lock:
+            data = self._read_last()
+            data[last_run_id(gradebook_path, target)] = key
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self._last_path(), 'w') as f: json.dump(data, f)
+            except OSError as e:
+                log.warning(f"Last run not recorded: {e}")
+
+    def merge(self, examsoft_path, roster, score_col, target, compute, policy=None,
+              gradebook_path=""):  # Cached or fresh result, with a diff
+        # compute() produces the merge result on a miss. The returned result has "key", "cached" (True when
+        # parse and merge were skipped) and "diff": None on the first run for this gradebook column, otherwise
+        # diff_rows() against the last exported run (all lists empty when nothing changed). The run only
+        # becomes the last one once its output is written: call set_last(gradebook_path, target, res["key"]).
+        key = self.key(examsoft_path, roster, score_col, target, policy)
+        res = self.get(key)
+        cached = res is not None
+        if not cached:
+            res = compute()
+            self.put(key, res)
+        prev_key = self.last_key(gradebook_path, target)
+        if prev_key is None:
+            diff = None
+        elif prev_key == key:
+            diff = {"added": [], "removed": [], "changed": []}
+        else:
+            prev = self.get(prev_key)
+            diff = diff_rows(prev["rows"], res["rows"]) if prev else None
+        res.update(key=key, cached=cached, diff=diff)
+        return res
@@ -0,0 +1,144 @@
+import gzip  # Compressed on-disk roster indexes
+import hashlib  # Stable index file names per gradebook path
+import json  # Index file format
+import logging  # Used to report index write errors
+import os  # Used for file system path operations
+
+from . import config
+from .csvio import ParsedFileCache, file_signature, open_csv
+from .headers import ColumnSchema
+from .metrics import stage
+
+log = logging.getLogger(__name__)
+
+ROSTER_DIR = os.path.join(config.CACHE_DIR, "rosters")
+INDEX_VERSION = 1
+MAX_SAVED_INDEXES = 50  # Oldest index files beyond this are deleted when a new one is written
+
+
+def username_from_email(email):  # "jdoe+exam@school.edu" -> "jdoe" (the Blackboard Username)
+    return email.split('@')[0].split('+')[0].lower().strip()
+
+
+class RosterIndex:  # Gradebook roster with O(1) lookup by username, student ID and normalised email
+    # Rows are stored column-wise (parallel lists) so the index stays small in memory and on disk.
+    # Iterating, `in` and items() behave like the {username: "First Last"} dict of roster_names(),
+    # so the index can be passed anywhere a roster is expected.
+    FIELDS = ("username", "student_id", "first", "last", "email")
+
+    def __init__(self, headers, columns, row_count, source=None):  # Define a function
+        self.headers = headers  # Gradebook header row (target columns are resolved from it)
+        self.columns = columns  # field -> list of values, one entry per indexed row
+        self.row_count = row_count  # Data rows in the gradebook, including rows without a username
+        self.source = source  # (mtime, size) of the gradebook the index was built from
+        self.by_username, self.by_student_id, self.by_email = {}, {}, {}
+        for i, (u, sid, email) in enumerate(zip(columns["username"], columns["student_id"], columns["email"])):
+            if u: self.by_username[u] = i
+            if sid: self.by_student_id[sid] = i
+            if email: self.by_email[email] = i
+
+    @classmethod
+    def build(cls, rows, headers, check=None):  # Index gradebook rows (any iterable, read once)
+        schema = ColumnSchema(headers)
+        u_c, sid_c, f_c, l_c, e_c = schema.username, schema.student_id, schema.first, schema.last, schema.email
+        columns = {name: [] for name in cls.FIELDS}
+        count = 0
+        for count, r in enumerate(rows, start=1):
+            if check and count % 5000 == 0: check()
+            uname = r.get(u_c, "").lower().strip()
+            sid = r.get(sid_c, "").strip() if sid_c else ""
+            if not (uname or sid): continue
+            columns["username"].append(uname)
+            columns["student_id"].append(sid)
+            columns["first"].append(r.get(f_c))
+            columns["last"].append(r.get(l_c))
+            columns["email"].append(r.get(e_c, "").lower().strip() if e_c else "")
+        return cls(list(headers or []), columns, count)
+
+    @classmethod
+    def combine(cls, indexes):  # One index over several gradebooks' rows, in order (headers of the first)
+        # Row i of the result is row i - offset of the gradebook it came from, offsets being the running row
+        # totals. A username enrolled in two gradebooks resolves to its last row, as within one gradebook.
+        columns = {name: [v for idx in indexes for v in idx.columns[name]] for name in cls.FIELDS}
+        return cls(list(indexes[0].headers) if indexes else [], columns, sum(idx.row_count for idx in indexes))
+
+    def name(self, i):  # "First Last" for row i (same format as the audit report always used)
+        return f"{self.columns['first'][i]} {self.columns['last'][i]}"
+
+    def __contains__(self, username):  # Define a function
+        return username in self.by_username
+
+    def __len__(self):  # Define a function
+        return len(self.by_username)
+
+    def __iter__(self):  # Define a function
+        return iter(self.by_username)
+
+    def items(self):  # (username, "First Last") pairs in gradebook order
+        return ((u, self.name(i)) for u, i in self.by_username.items())
+
+    def to_dict(self):  # JSON-serialisable form
+        return {"version": INDEX_VERSION, "source": list(self.source or ()), "headers": self.headers,
+                "row_count": self.row_count, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, data):  # Inverse of to_dict(); None for an unknown version
+        if data.get("version") != INDEX_VERSION: return None
+        return cls(data["headers"], data["columns"], data["row_count"], tuple(data["source"]) or None)
+
+    def save(self, path):  # Write the index as gzip-compressed JSON
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=5) as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):  # Read an index written by save(); None if missing or unreadable
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def index_path(gradebook_path, cache_dir=ROSTER_DIR):  # Where the index for a gradebook is stored
+    norm = os.path.normcase(os.path.abspath(gradebook_path))
+    return os.path.join(cache_dir, hashlib.sha1(norm.encode("utf-8")).hexdigest()[:20] + ".json.gz")
+
+
+def _prune(cache_dir):  # Keep only the most recently written index files
+    try:
+        files = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith(".json.gz")]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for old in files[MAX_SAVED_INDEXES:]: os.remove(old)
+    except OSError:
+        pass
+
+
+roster_cache = ParsedFileCache()  # In-process copies, so repeated lookups skip even the index file
+
+
+def load_roster(gradebook_path, cache_dir=ROSTER_DIR, check=None):  # Roster index for a gradebook, built at most once
+    # The saved index is reused while the gradebook's (mtime, size) is unchanged; otherwise the gradebook
+    # is streamed once, indexed and the index saved again. cache_dir=None keeps everything in memory.
+    def _load():
+        with stage("index", file=os.path.basename(gradebook_path)) as rec:
+            sig = file_signature(gradebook_path)[1]
+            path = index_path(gradebook_path, cache_dir) if cache_dir else None
+            idx = RosterIndex.load(path) if path else None
+            rec["reused"] = idx is not None and idx.source == sig
+            if not rec["reused"]:
+                with open_csv(gradebook_path) as (headers, rows):
+                    idx = RosterIndex.build(rows, headers, check)
+                idx.source = sig
+                if path:
+                    try:
+                        idx.save(path)
+                        _prune(cache_dir)
+                    except OSError as e:
+                        log.warning(f"Roster index not saved: {e}")
+            rec.update(rows=idx.row_count, students=len(idx))
+        return idx
+
+    return roster_cache.get_or_load(gradebook_path, _load)
@@ -0,0 +1,78 @@
+import re  # Regex module for pattern matching in strings
+
+# Everything ExamSoft or a hand-edited export may put in a score cell, normalised to (number, text):
+#   "85.5" / "85.5%" / " 85.5 pts"  -> 85.5
+#   "85,5" / "85,50"                -> 85.5   (comma decimal)
+#   "1,234" / "1,234.5"             -> 1234.0 / 1234.5  (comma before groups of exactly three digits, or with a
+#                                              decimal point: thousands separator; never divided by 1000)
+#   "38/50"                         -> 76.0   (fraction, expressed as a percentage; "38/0" -> 0.0)
+#   "", "N/A", "-", "absent", ...   -> 0.0    (explicitly missing; exported as 0 like before)
+#   anything without a number       -> 0.0
+# The text is what goes into the import file: str(round(value, 2)), e.g. "85.5", "100.0".
+# Cells that needed a guess are reported (read_score's third value, a GUESSES key) so the audit and the
+# preview can flag them: "85,500" / "1,234" could be decimal commas, "1e3" / "1.2.3" / "Q2: 85" are only
+# partly a number, and "abc" has none at all.
+MISSING_VALUES = {"", "n/a", "na", "-", "--", "none", "null", "absent", "excused", "ex"}
+GUESSES = {"ambiguous": "the comma may be a decimal point", "partial": "only part of the cell is a number",
+           "unreadable": "no number found"}  # Why a cell's value is a guess
+_NUMBER = re.compile(r'[-+]?(?:\d[\d,]*)?\.?\d+(?:,\d+)?')
+_FRACTION = re.compile(r'^\s*([-+]?[\d.,]+)\s*/\s*([\d.,]+)\s*$')
+_THOUSANDS = re.compile(r'^[-+]?\d{1,3}(?:,\d{3})+$')
+_AMBIGUOUS = re.compile(r'^[-+]?\d{1,3},\d{3}$')  # One comma group: thousands or three decimals
+_DIGIT = re.compile(r'\d')
+_MEMO_LIMIT = 10000  # Distinct raw values remembered per parser; score columns rarely have more than a few hundred
+
+
+def _to_float(token):  # "85,5" -> 85.5, "1,234" -> 1234.0, "1,234.5" -> 1234.5
+    if "," in token:
+        token = token.replace(",", "") if "." in token or _THOUSANDS.match(token) else token.replace(",", ".")
+    return float(token)
+
+
+def read_score(v):  # Normalise one raw cell to (number, text, guess); guess is None or a GUESSES key
+    raw = str(v).strip() if v is not None else ""
+    if raw.lower() in MISSING_VALUES: return 0.0, "0", None
+    guess = None
+    try:
+        m = _FRACTION.match(raw)
+        if m:
+            den = _to_float(m.group(2))
+            num = _to_float(m.group(1)) / den * 100 if den else 0.0
+            if not den: guess = "unreadable"
+        else:
+            m = _NUMBER.search(raw)
+            if not m: return 0.0, "0", "unreadable"
+            token = m.group(0)
+            num = _to_float(token)
+            if _DIGIT.search(raw, 0, m.start()) or _DIGIT.search(raw, m.end()): guess = "partial"
+            elif _AMBIGUOUS.match(token): guess = "ambiguous"
+    except ValueError:
+        return 0.0, "0", "unreadable"
+    num = round(num, 2)
+    return num, str(num), guess
+
+
+def parse_score(v):  # Normalise one raw cell to (number, text)
+    num, text, _ = read_score(v)
+    return num, text
+
+
+class ScoreParser:  # read_score() with a memo: a score column has few distinct values, so most rows are one lookup
+    def __init__(self):  # Define a function
+        self._memo = {}
+
+    def read(self, v):  # (number, text, guess) for one cell
+        hit = self._memo.get(v)
+        if hit is None:
+            hit = read_score(v)
+            if len(self._memo) < _MEMO_LIMIT: self._memo[v] = hit
+        return hit
+
+    def parse(self, v):  # (number, text) for one cell
+        num, text, _ = self.read(v)
+        return num, text
+
+    def column(self, values):  # A whole column in one pass -> (numbers, texts, guesses), one entry per value
+        read = self.read
+        parsed = [read(v) for v in values]
+        return [p[0] for p in parsed], [p[1] for p in parsed], [p[2] for p in parsed]
@@ -0,0 +1,136 @@
+import asyncio  # Event-loop API for services that embed the converter
+import functools  # Binds each job's index to the progress callback
+import logging  # Used to report failed conversions
+import os  # Used for file system path operations
+import threading  # Cancellation flag shared with the worker thread
+from concurrent.futures import ThreadPoolExecutor  # Blocking parse, merge and write run off the event loop
+
+from .core import TooManyZeros, audit_report_path, convert, scores_by_username, too_many_zeros
+from .csvio import Cancelled
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4  # Conversions running at once
+
+
+def conversion_warnings(res):  # [{"code", "count", "message"}]: what the app would have asked or shown about
+    # Codes: too_many_zeros (the app's "Continue?" prompt), in_examsoft_only and missing_scores (the roster
+    # mismatches behind the "Open Audit Report?" prompt), matched_by_identity, guessed_scores, unusual_scores and
+    # grades_changed.
+    found = []
+
+    def _add(code, count, message):  # Define a function
+        if count: found.append({"code": code, "count": count, "message": message})
+
+    rows = res.get("rows") or []
+    share = round(100 * res["zero_count"] / len(rows)) if rows else 0
+    if too_many_zeros(res):
+        _add("too_many_zeros", res["zero_count"], f"{res['zero_count']} students ({share}%) have a score of 0.")
+    _add("in_examsoft_only", len(res["not_in_bb"]), f"{len(res['not_in_bb'])} ExamSoft students are not in the gradebook.")
+    _add("missing_scores", len(res["not_in_es"]), f"{len(res['not_in_es'])} gradebook students have no ExamSoft score.")
+    resolved = res.get("resolved") or []
+    _add("matched_by_identity", len(resolved),
+         f"{len(resolved)} students were matched by student ID or name instead of username.")
+    modified = res.get("modified") or []
+    _add("guessed_scores", len(modified), f"{len(modified)} score cells were ambiguous or only partly a number.")
+    outliers = (res.get("distribution") or {}).get("outliers") or []
+    _add("unusual_scores", len(outliers), f"{len(outliers)} scores are unusually far from the rest.")
+    diff = res.get("diff")
+    if diff:
+        changed = len(diff["changed"]) + len(diff["added"]) + len(diff["removed"])
+        _add("grades_changed", changed, f"{changed} grades differ from the last run for this column.")
+    return found
+
+
+def _summary(examsoft_path, gradebook_path, out):  # Result skeleton, filled in by AsyncConverter.convert
+    return {"examsoft": examsoft_path, "gradebook": gradebook_path, "out": out, "status": "failed", "error": None,
+            "warnings": [], "audit_path": None, "target": None, "score_col": None, "policy": None, "rows": 0,
+            "scores": {}, "stats": None, "distribution": None, "diff": None}
+
+
+class AsyncConverter:  # asyncio front end to convert(): structured results and warnings instead of dialogs
+    # Each conversion runs on an executor thread (reading, parsing, merging and writing all block), and at
+    # most `concurrency` run at once however many are awaited. Nothing is ever asked: convert() returns a
+    # dict with a "status" of "converted", "needs_confirmation" (too many zero scores: nothing was written,
+    # re-run with allow_zeros=True, which the result cache makes cheap), "failed" (unusable input, with
+    # "error") or "cancelled", plus "warnings" from conversion_warnings() and the grades as "scores"
+    # ({username: text}). Cancelling the awaiting task stops the merge at its next progress check.
+    # mapping_history and policy_history are read, never saved: the service owns its own settings. results is
+    # an optional results.ResultCache and index_dir where roster indexes are saved (None: in memory only).
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, executor=None, results=None, mapping_history=None,
+                 policy_history=None, index_dir=None):  # executor: share one with the rest of the service
+        self.concurrency = max(1, concurrency)
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="convert")
+        self.results, self.index_dir = results, index_dir
+        self.mapping_history, self.policy_history = mapping_history or {}, policy_history or {}
+        self._slots = None  # asyncio.Semaphore, created on the running loop
+
+    async def __aenter__(self):  # Define a function
+        return self
+
+    async def __aexit__(self, *exc):  # Define a function
+        self.close()
+
+    def close(self):  # Shut down the executor if this converter created it
+        if self._own_executor: self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def convert(self, examsoft_path, gradebook_path, out, target=None, score_col=None, allow_zeros=False,
+                      patch=False, policy=None, progress=None):  # One conversion; never raises for bad input
+        # progress(text, fraction) is called on the event loop while scores are matched.
+        if self._slots is None: self._slots = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        stop = threading.Event()
+        summary = _summary(examsoft_path, gradebook_path, out)
+
+        def _progress(text, fraction):  # Runs on the worker thread
+            if stop.is_set(): raise Cancelled()
+            if progress: loop.call_soon_threadsafe(progress, text, fraction)
+
+        def _work():  # Runs on the worker thread
+            if stop.is_set(): raise Cancelled()  # Cancelled while queued behind a shared executor
+            return convert(examsoft_path, gradebook_path, out, target=target, score_col=score_col,
+                           mapping_history=self.mapping_history, allow_zeros=allow_zeros, progress=_progress,
+                           streaming=True, index_dir=self.index_dir, patch=patch, results=self.results,
+                           policy=policy, policy_history=self.policy_history)
+
+        async with self._slots:
+            future = loop.run_in_executor(self.executor, _work)
+            try:
+                res = await asyncio.shield(future)
+                summary.update(status="converted", audit_path=res["audit_path"])
+            except asyncio.CancelledError:
+                stop.set()  # The merge stops at its next progress check; its slot is held until then
+                await asyncio.gather(future, return_exceptions=True)
+                raise
+            except TooManyZeros as e:
+                res = e.result
+                summary.update(status="needs_confirmation", error=str(e))
+            except Cancelled:
+                summary["status"] = "cancelled"
+                return summary
+            except (OSError, ValueError) as e:
+                log.error(f"{os.path.basename(examsoft_path)}: {e}")
+                summary["error"] = str(e) or type(e).__name__
+                return summary
+        summary.update(target=res["target"], score_col=res["score_col"], policy=res["policy"], rows=len(res["rows"]),
+                       scores=scores_by_username(res["rows"]), stats=res["stats"],
+                       distribution=res.get("distribution"), diff=res.get("diff"), warnings=conversion_warnings(res))
+        return summary
+
+    async def convert_many(self, jobs, progress=None):  # Run every job (convert() keyword dicts); results in order
+        # Jobs whose outputs would share a folder are refused up front: each conversion writes its own
+        # Audit_Report.txt next to its output. progress(index, text, fraction) reports on job `index`.
+        folders = {}
+        for i, job in enumerate(jobs):
+            folders.setdefault(audit_report_path(job["out"]), []).append(i)
+        clash = next((idx for idx in folders.values() if len(idx) > 1), None)
+        if clash: raise ValueError(f"Jobs {clash} write to the same folder; give each conversion its own.")
+        return await asyncio.gather(*(
+            self.convert(**job, progress=(functools.partial(progress, i) if progress else None))
+            for i, job in enumerate(jobs)))
+
+
+async def convert_all(jobs, concurrency=DEFAULT_CONCURRENCY, **kwargs):  # One-shot AsyncConverter.convert_many
+    async with AsyncConverter(concurrency, **kwargs) as converter:
+        return await converter.convert_many(jobs)
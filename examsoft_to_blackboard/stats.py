@@ -0,0 +1,90 @@
+import math  # Square root for the standard deviation
+
+BIN_RESOLUTION = 10  # Scores are counted in bins of 1/10 point, so quantiles are exact to 0.1
+BUCKET_WIDTH = 10  # Width of the histogram buckets in the audit report (0-10, 10-20, ... 90-100)
+QUANTILES = (("p10", 0.10), ("p25", 0.25), ("median", 0.50), ("p75", 0.75), ("p90", 0.90))
+OUTLIER_IQR = 1.5  # Tukey fences: flagged below p25 - 1.5 * IQR or above p75 + 1.5 * IQR
+OUTLIER_MIN_COUNT = 10  # Too few scores for quartiles to mean anything below this
+MAX_OUTLIERS = 50  # Listed in the report; the rest are only counted
+
+
+class ScoreStats:  # Streaming statistics over scores: constant memory, one add() per score
+    # Mean and variance use Welford's update (the plain sum is kept as well so "avg" stays exactly what it
+    # always was). Quantiles and the histogram come from a count per 0.1-point bin: percentages only have
+    # about a thousand of those, however many rows the export has.
+    __slots__ = ("count", "total", "mean", "m2", "low", "high", "bins")
+
+    def __init__(self):  # Define a function
+        self.count, self.total, self.mean, self.m2 = 0, 0.0, 0.0, 0.0
+        self.low = self.high = None
+        self.bins = {}  # round(score * BIN_RESOLUTION) -> number of scores
+
+    def add(self, score):  # Count one score
+        self.count += 1
+        self.total += score
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (score - self.mean)
+        if self.low is None or score < self.low: self.low = score
+        if self.high is None or score > self.high: self.high = score
+        b = round(score * BIN_RESOLUTION)
+        self.bins[b] = self.bins.get(b, 0) + 1
+
+    def stdev(self):  # Sample standard deviation (0 for fewer than two scores)
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def quantile(self, q):  # Score below which a share q of the scores fall (nearest rank, to 0.1 point)
+        if not self.count: return 0.0
+        rank, seen = max(1, math.ceil(q * self.count)), 0
+        for b in sorted(self.bins):
+            seen += self.bins[b]
+            if seen >= rank: return b / BIN_RESOLUTION
+        return self.high
+
+    def histogram(self, width=BUCKET_WIDTH):  # [[from, to, count]] buckets over 0-100; 100 goes in the last one
+        # Scores outside 0-100 (bonus points, penalties) get their own open-ended buckets, [None, 0, n] and
+        # [100, None, n], only when there are any.
+        top = 100 // width - 1
+        counts, below, above = [0] * (top + 1), 0, 0
+        for b, n in self.bins.items():
+            score = b / BIN_RESOLUTION
+            if score < 0: below += n
+            elif score > 100: above += n
+            else: counts[min(int(score // width), top)] += n
+        buckets = [[i * width, (i + 1) * width, n] for i, n in enumerate(counts)]
+        if below: buckets.insert(0, [None, 0, below])
+        if above: buckets.append([100, None, above])
+        return buckets
+
+    def fences(self):  # (low, high) Tukey fences, or None when there are too few scores to judge
+        if self.count < OUTLIER_MIN_COUNT: return None
+        p25, p75 = self.quantile(0.25), self.quantile(0.75)
+        iqr = p75 - p25
+        return p25 - OUTLIER_IQR * iqr, p75 + OUTLIER_IQR * iqr
+
+    def summary(self):  # JSON-ready {"count", "mean", "stdev", "low", "high", <quantiles>, "histogram"}
+        data = {"count": self.count, "mean": round(self.mean, 2), "stdev": round(self.stdev(), 2),
+                "low": self.low if self.count else 0, "high": self.high if self.count else 0}
+        data.update((name, self.quantile(q)) for name, q in QUANTILES)
+        data["histogram"] = self.histogram()
+        return data
+
+
+def outliers(stats, rows):  # [[student, username, score, "low"/"high"]] for StudentScore rows outside the fences
+    fences = stats.fences()
+    if fences is None: return []
+    low, high = fences
+    return [[f"{r.first} {r.last}", r.username, r.score, "low" if r.score < low else "high"]
+            for r in rows if r.score < low or r.score > high]
+
+
+def distribution(stats, sections, rows):  # Summary of a merge for the audit report and the result cache
+    # stats is the ScoreStats over every scored attempt, sections {section: ScoreStats} (empty when the
+    # export has no section column) and rows the exported StudentScores, checked against the fences.
+    data = stats.summary()
+    data["sections"] = {name: {k: v for k, v in s.summary().items() if k != "histogram"}
+                        for name, s in sorted(sections.items())}
+    fences = stats.fences()
+    data["fences"] = [round(f, 2) for f in fences] if fences else None
+    data["outliers"] = outliers(stats, rows)
+    return data
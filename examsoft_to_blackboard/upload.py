@@ -0,0 +1,254 @@
+import base64  # Basic auth header for the OAuth token request
+import http.client  # Keep-alive connections (urllib opens a new one per request)
+import json  # Request and response bodies
+import logging  # Used to report retries
+import queue  # Idle connections waiting to be reused
+import random  # Jitter for the retry backoff
+import threading  # Counters shared by the upload workers
+import time  # Backoff sleeps and upload timing
+from concurrent.futures import ThreadPoolExecutor  # Bounded number of requests in flight
+from urllib.parse import quote, urlencode, urlsplit  # Building API paths
+
+from .csvio import open_csv
+from .headers import ColumnSchema, GradeColumn, column_id, target_columns
+from .metrics import stage
+
+log = logging.getLogger(__name__)
+
+API_PREFIX = "/learn/api/public"  # Blackboard Learn REST API
+TOKEN_PATH = "/v1/oauth2/token"
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # Throttled or temporarily unavailable: worth another try
+MAX_BACKOFF = 30.0  # Longest wait between two attempts, in seconds
+DEFAULT_WORKERS = 8  # Requests in flight at once (Blackboard rate-limits per application)
+DEFAULT_BATCH = 50  # Grades handed to a worker at a time
+
+
+class UploadError(OSError):  # The gradebook API refused or never answered a request
+    pass
+
+
+def blackboard_column_id(header):  # "Quiz 1 [Total Pts: 100 Percentage] |1736330" -> "_1736330_1", or None
+    cid = column_id(header)
+    return f"_{cid}_1" if cid else None
+
+
+def column_name(header):  # "Quiz 1 [Total Pts: 100 Percentage] |1736330" -> "Quiz 1" (the name in the API)
+    return GradeColumn(header).name
+
+
+class ConnectionPool:  # Keep-alive HTTP(S) connections to one host, reused most-recently-idle first
+    # A connection is taken for one request and put back afterwards; connections that failed mid-request are
+    # closed instead. The pool never holds more than `size` idle connections.
+    def __init__(self, base_url, size, timeout=30.0):  # Define a function
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Not an http(s) URL: {base_url}")
+        self.scheme, self.host, self.port, self.timeout = parts.scheme, parts.hostname, parts.port, timeout
+        self.base_path = parts.path.rstrip("/")
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.opened = 0  # Connections created so far (a well-used pool stays near `size`)
+        self._lock = threading.Lock()
+
+    def get(self):  # An idle connection, or a new one
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock: self.opened += 1
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            return cls(self.host, self.port, timeout=self.timeout)
+
+    def put(self, conn):  # Return a healthy connection for reuse
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def discard(self, conn):  # Drop a connection that failed
+        conn.close()
+
+    def close(self):  # Close every idle connection
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class GradebookClient:  # Blackboard Learn gradebook API: find columns, write grades
+    # Authenticates with an OAuth token, or with an application key and secret (client credentials, renewed
+    # once if the token expires mid-upload). Requests go through a ConnectionPool; throttling (429) and
+    # server errors (5xx, dropped connections) are retried up to `retries` times with exponential backoff and
+    # jitter, honouring Retry-After. Grade writes are spread over `workers` threads, `batch_size` at a time.
+    def __init__(self, base_url, course_id, token=None, key=None, secret=None, workers=DEFAULT_WORKERS,
+                 batch_size=DEFAULT_BATCH, retries=4, backoff=0.5, timeout=30.0):  # Define a function
+        self.course_id, self.token, self.key, self.secret = course_id, token, key, secret
+        self.workers, self.batch_size = max(1, workers), max(1, batch_size)
+        self.retries, self.backoff = retries, backoff
+        self.pool = ConnectionPool(base_url, self.workers, timeout)
+        self.retried = 0  # Attempts repeated after a throttle or server error
+        self._lock = threading.Lock()  # Guards `retried` and token renewal
+
+    def __enter__(self):  # Define a function
+        return self
+
+    def __exit__(self, *exc):  # Define a function
+        self.pool.close()
+
+    def _course_path(self, rest):  # API path under the course
+        return f"/v2/courses/{quote(self.course_id, safe=':_')}/{rest}"
+
+    def authenticate(self):  # Fetch a token with the application key and secret
+        if not (self.key and self.secret): raise UploadError("A token, or an application key and secret, is needed.")
+        basic = base64.b64encode(f"{self.key}:{self.secret}".encode("utf-8")).decode("ascii")
+        status, data = self.request("POST", TOKEN_PATH, urlencode({"grant_type": "client_credentials"}),
+                                    {"Authorization": f"Basic {basic}",
+                                     "Content-Type": "application/x-www-form-urlencoded"}, auth=False)
+        if status != 200 or "access_token" not in data:
+            raise UploadError(f"Authentication failed ({status}): {data.get('message', '') or data}")
+        self.token = data["access_token"]
+
+    def _delay(self, attempt, retry_after):  # Seconds to wait before attempt `attempt + 1`
+        try:
+            return min(MAX_BACKOFF, float(retry_after))
+        except (TypeError, ValueError):
+            return min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def request(self, method, path, body=None, headers=None, auth=True):  # (status, decoded JSON body)
+        # path is relative to API_PREFIX unless it already starts with it (e.g. a paging link). Raises
+        # UploadError once the retries are used up on errors worth retrying; other statuses are returned. A
+        # 401 renews the token once and resends without using up a retry.
+        if not path.startswith(API_PREFIX): path = API_PREFIX + path
+        path = self.pool.base_path + path
+        renewed, error, attempt = False, "", 0
+        while True:
+            if auth and not self.token: self._renew(None)
+            send = {"Accept": "application/json"}
+            token = self.token
+            if auth: send["Authorization"] = f"Bearer {token}"
+            if isinstance(body, (dict, list)): send["Content-Type"] = "application/json"
+            send.update(headers or {})
+            payload = json.dumps(body) if isinstance(body, (dict, list)) else body
+            conn, retry_after = self.pool.get(), None
+            try:
+                conn.request(method, path, body=payload, headers=send)
+                resp = conn.getresponse()
+                raw, status, retry_after = resp.read(), resp.status, resp.getheader("Retry-After")
+            except (OSError, http.client.HTTPException) as e:
+                self.pool.discard(conn)
+                status, error = None, f"{type(e).__name__}: {e}"
+            else:
+                if resp.will_close: self.pool.discard(conn)
+                else: self.pool.put(conn)
+                if status == 401 and auth and self.key and not renewed:
+                    renewed = True
+                    self._renew(token)
+                    continue
+                if status not in RETRY_STATUSES:
+                    try:
+                        return status, json.loads(raw) if raw else {}
+                    except ValueError:
+                        return status, {"message": raw[:200].decode("utf-8", "replace")}
+                error = f"HTTP {status}"
+            if attempt == self.retries: break
+            with self._lock: self.retried += 1
+            wait = self._delay(attempt, retry_after)
+            log.info(f"{method} {path}: {error}, retrying in {wait:.1f}s")
+            time.sleep(wait)
+            attempt += 1
+        raise UploadError(f"{method} {path} failed after {self.retries + 1} attempts ({error})")
+
+    def _renew(self, stale):  # New token, unless another worker already replaced `stale`
+        with self._lock:
+            if self.token == stale: self.authenticate()
+
+    def columns(self):  # Every gradebook column of the course, following the API's paging links
+        found, path = [], self._course_path("gradebook/columns?" + urlencode({"fields": "id,name,score"}))
+        while path:
+            status, data = self.request("GET", path)
+            if status != 200: raise UploadError(f"Could not list gradebook columns ({status}): {data.get('message', '')}")
+            found.extend(data.get("results", []))
+            path = (data.get("paging") or {}).get("nextPage")
+        return found
+
+    def find_column(self, header, columns=None):  # API column ID for an export header: by |ID, then by name
+        columns = self.columns() if columns is None else columns
+        wanted = blackboard_column_id(header)
+        for col in columns:
+            if wanted and col.get("id") == wanted: return col["id"]
+        name = column_name(header)
+        matches = [col["id"] for col in columns if col.get("name", "").strip() == name]
+        if len(matches) == 1: return matches[0]
+        raise UploadError(f"Gradebook column '{header}' not found in course {self.course_id}"
+                          if not matches else f"Several gradebook columns are named '{name}'.")
+
+    def set_grade(self, column, username, score):  # (status, message) for one grade write
+        path = self._course_path(f"gradebook/columns/{quote(column)}/users/{quote('userName:' + username)}")
+        status, data = self.request("PATCH", path, {"score": score})
+        return status, "" if status == 200 else data.get("message", "")
+
+    def upload_scores(self, column, scores, progress=None, check=None):  # Write {username: score text} to a column
+        # Returns {"column", "sent", "failed": [[username, status, message]], "retries", "seconds"}. Blank scores
+        # are skipped; text that is not a number fails without a request. progress(text, fraction) is called as batches finish; check() may raise Cancelled, which
+        # stops the batches not yet started.
+        items, failed = [], []
+        for u, s in scores.items():
+            s = str(s).strip()
+            if not s: continue
+            try:
+                items.append((u, float(s)))
+            except ValueError:
+                failed.append([u, None, f"Not a number: {s}"])
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        sent, done, start, retried = 0, 0, time.perf_counter(), self.retried
+
+        def _batch(batch):  # Worker: one batch of grade writes, in order
+            out = []
+            for username, score in batch:
+                if check: check()
+                try:
+                    status, message = self.set_grade(column, username, score)
+                except UploadError as e:
+                    status, message = None, str(e)
+                out.append((username, status, message))
+            return out
+
+        with stage("upload", column=column, grades=len(items), workers=self.workers) as rec, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload") as pool:
+            try:
+                for results in pool.map(_batch, batches):
+                    for username, status, message in results:
+                        if status == 200: sent += 1
+                        else: failed.append([username, status, message])
+                    done += 1
+                    if progress: progress(f"Uploading grades... ({sent + len(failed)} of {len(items)})",
+                                          done / len(batches))
+            except BaseException:
+                pool.shutdown(cancel_futures=True)
+                raise
+            rec.update(sent=sent, failed=len(failed), retries=self.retried - retried)
+        return {"column": column, "sent": sent, "failed": failed, "retries": self.retried - retried,
+                "seconds": round(time.perf_counter() - start, 3)}
+
+
+def upload_import(path, client, columns=None, progress=None, check=None):  # Push an import file's grades
+    # path is a file written by convert/batch (or a patched gradebook, in which case pass `columns`: every
+    # column of a gradebook would otherwise be sent). Each target column is matched to the course's
+    # gradebook column by its |ID or name. Returns one upload_scores() summary per column, with "header".
+    with open_csv(path) as (headers, rows):
+        username = ColumnSchema(headers).username
+        if not username: raise ValueError(f"{path}: No 'Username' column.")
+        targets = columns or target_columns(headers)
+        missing = [c for c in targets if c not in headers]
+        if missing: raise ValueError(f"{path}: Column '{missing[0]}' not found.")
+        scores = {t: {} for t in targets}
+        for row in rows:
+            u = (row.get(username) or "").strip()
+            if not u: continue
+            for t in targets: scores[t][u] = row.get(t) or ""
+    api_columns = client.columns()
+    summaries = []
+    for t in targets:
+        summary = client.upload_scores(client.find_column(t, api_columns), scores[t], progress, check)
+        summary["header"] = t
+        summaries.append(summary)
+    return summaries
@@ -0,0 +1,171 @@
+import logging  # Used to report conversions and errors
+import os  # Used for file system path operations
+import shutil  # Moves finished exports out of the inbox (it may be on another drive)
+import threading  # Stop flag and the config-file lock
+import time  # Poll interval and settle timer
+from concurrent.futures import ThreadPoolExecutor  # Bounded pool of concurrent conversions
+from datetime import datetime  # Suffix for repeated export names
+
+from . import config
+from .batch import resolve_targets
+from .core import TooManyZeros, convert
+from .headers import remember, target_columns
+from .metrics import stage
+from .roster import load_roster
+
+log = logging.getLogger(__name__)
+
+FAILED_DIR = "failed"  # Outbox sub-folder for exports that could not be converted
+IGNORED_PREFIXES = (".", "~$")  # Hidden files and Office lock files
+IGNORED_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload")  # Copies still in progress
+
+
+def is_export(name):  # File name looks like a finished CSV export
+    lower = name.lower()
+    return lower.endswith(".csv") and not lower.startswith(IGNORED_PREFIXES) and not lower.endswith(IGNORED_SUFFIXES)
+
+
+def _unique_dir(parent, name):  # parent/name, or parent/name-<time> when an earlier run already used it
+    path = os.path.join(parent, name)
+    if os.path.exists(path): path += datetime.now().strftime("-%Y%m%d-%H%M%S-%f")
+    os.makedirs(path)
+    return path
+
+
+class Watcher:  # Convert every ExamSoft export dropped into `inbox` against one Blackboard gradebook
+    # The inbox is polled (os.scandir: cheap, and it works on network shares where change notifications do
+    # not). A file is converted once its size and mtime have not changed for `settle` seconds, so exports
+    # still being copied in are left alone. Conversions run on a pool of `workers` threads. Each one gets
+    # its own outbox folder: outbox/<export name>/ holds the import file, Audit_Report.txt and the export
+    # itself (moved out of the inbox). Exports that fail go to outbox/failed/ with a <name>.error.txt next to
+    # them. The target column is the one remembered for the file name or score column, as in batch mode,
+    # read from the config file for every export so mappings made in the app meanwhile are picked up; so is
+    # the attempt policy for that column, unless `policy` fixes one for every export.
+    def __init__(self, inbox, gradebook_path, outbox, workers=2, settle=2.0, interval=1.0, score_col=None,
+                 allow_zeros=False, patch=False, save_mapping=True, results=None, on_result=None,
+                 policy=None):  # Define a function
+        self.inbox, self.gradebook_path, self.outbox = inbox, gradebook_path, outbox
+        self.settle, self.interval = settle, interval
+        self.score_col, self.allow_zeros, self.patch = score_col, allow_zeros, patch
+        self.save_mapping, self.results, self.on_result = save_mapping, results, on_result
+        self.policy = policy
+        self.workers = max(1, workers)
+        self._pending = {}  # path -> ((size, mtime_ns), monotonic time the signature was first seen)
+        self._active = set()  # Paths queued or converting
+        self._done = {}  # path -> signature of exports already handled that could not be moved away
+        self._lock = threading.Lock()  # Guards _active/_done and config file writes
+        self._stop = threading.Event()
+
+    def scan(self):  # Exports in the inbox that have settled and are not already being converted
+        now, ready, seen = time.monotonic(), [], set()
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_export(entry.name): continue
+                st = entry.stat()
+                path, sig = entry.path, (st.st_size, st.st_mtime_ns)
+                seen.add(path)
+                with self._lock:
+                    if path in self._active or self._done.get(path) == sig: continue
+                prev = self._pending.get(path)
+                if prev is None or prev[0] != sig:
+                    self._pending[path] = (sig, now)  # New or still growing: restart the settle timer
+                elif sig[0] and now - prev[1] >= self.settle:
+                    ready.append(path)
+        for path in list(self._pending):
+            if path not in seen or path in ready: del self._pending[path]
+        return sorted(ready)
+
+    def convert_one(self, path):  # Convert one export; returns {"path", "status", "out", "audit_path", ...}
+        name = os.path.basename(path)
+        summary = {"path": path, "status": "failed", "out": None, "audit_path": None, "error": None}
+        folder = None
+        try:
+            with stage("watch", file=name) as rec:
+                roster = load_roster(self.gradebook_path)
+                cfg = config.load_config()
+                mapping_history = cfg.get("mapping_history", {})
+                try:
+                    target = resolve_targets([(path, None)], target_columns(roster.headers), mapping_history,
+                                             self.score_col)[0]
+                except ValueError:
+                    raise ValueError(f"No target column remembered for '{name}'. Convert it once in the app or "
+                                     f"with `batch {name}=<column>`, then drop it in again.") from None
+                folder = _unique_dir(self.outbox, os.path.splitext(name)[0])
+                out = os.path.join(folder, f"BB_Import_{name}")
+                res = convert(path, self.gradebook_path, out, target=target, score_col=self.score_col,
+                              allow_zeros=self.allow_zeros, streaming=True, patch=self.patch, results=self.results,
+                              policy=self.policy, policy_history=cfg.get("attempt_policies", {}))
+                rec["rows"] = len(res["rows"])
+            summary.update(status="converted", out=out, audit_path=res["audit_path"], target=res["target"],
+                           policy=res["policy"], rows=len(res["rows"]), stats=res["stats"], diff=res.get("diff"))
+            if self.save_mapping:
+                with self._lock:
+                    cfg = config.load_config()
+                    history, policies = cfg.get("mapping_history", {}), cfg.get("attempt_policies", {})
+                    remember(history, name, res["target"])
+                    policies[res["target"]] = res["policy"]
+                    config.save_config({"mapping_history": history, "attempt_policies": policies})
+            self._archive(path, os.path.join(folder, name))
+        except Exception as e:  # One bad export must not stop the watcher
+            summary["error"] = f"{e} Re-run with --allow-zeros to convert it anyway." \
+                if isinstance(e, TooManyZeros) else str(e) or type(e).__name__
+            log.error(f"{name}: {summary['error']}", exc_info=not isinstance(e, (OSError, ValueError)))
+            if folder: shutil.rmtree(folder, ignore_errors=True)  # No half-written outputs in the outbox
+            self._fail(path, summary["error"])
+        return summary
+
+    def _archive(self, path, dest):  # Move a handled export out of the inbox (or remember it if that fails)
+        try:
+            shutil.move(path, dest)
+        except OSError as e:
+            log.warning(f"{os.path.basename(path)} left in the inbox: {e}")
+            self._skip(path)
+
+    def _skip(self, path):  # Never pick this export up again unless it changes
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock: self._done[path] = (st.st_size, st.st_mtime_ns)
+
+    def _fail(self, path, error):  # Park a failed export in outbox/failed/ with the reason next to it
+        failed = os.path.join(self.outbox, FAILED_DIR)
+        try:
+            os.makedirs(failed, exist_ok=True)
+            dest = os.path.join(failed, os.path.basename(path))
+            if os.path.exists(dest):
+                stem, ext = os.path.splitext(dest)
+                dest = stem + datetime.now().strftime("-%Y%m%d-%H%M%S-%f") + ext
+            with open(dest + ".error.txt", 'w', encoding='utf-8') as f: f.write(error + "\n")
+        except OSError as e:
+            log.warning(f"Could not record the failure of {os.path.basename(path)}: {e}")
+            return self._skip(path)
+        self._archive(path, dest)
+
+    def _finished(self, path, future):  # Worker done: free the slot and report
+        with self._lock: self._active.discard(path)
+        if self.on_result and not future.cancelled():
+            self.on_result(future.result())
+
+    def stop(self):  # Ask run() to return after the conversions already started
+        self._stop.set()
+
+    def run(self, once=False):  # Poll until stop() (or, with once=True, until the inbox has been emptied)
+        # Ctrl+C (or any error) stops polling and drops queued exports; conversions in progress are finished.
+        os.makedirs(self.outbox, exist_ok=True)
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="watch")
+        try:
+            while not self._stop.is_set():
+                for path in self.scan():
+                    with self._lock: self._active.add(path)
+                    pool.submit(self.convert_one, path).add_done_callback(
+                        lambda f, path=path: self._finished(path, f))
+                if once:
+                    with self._lock: idle = not self._active
+                    if idle and not self._pending: break
+                self._stop.wait(self.interval)
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            pool.shutdown(cancel_futures=self._stop.is_set())
@@ -1,19 +1,33 @@
 import tkinter as tk  # GUI library for building the app interface
 from tkinter import filedialog, messagebox, ttk  # GUI library for building the app interface
-import csv  # Used for reading and writing CSV files
 import os  # Used for file system path operations
 import logging  # Used to log debug and error messages
-import re  # Regex module for pattern matching in strings
-import ctypes  # Windows system calls for DPI settings
-import subprocess  # Used to open files/folders externally
-import json  # To read/write configuration files in JSON format
-from datetime import datetime  # To get current date/time for audit logs
-
-# Enable High DPI scaling for crisp text on Windows
-try:
-    ctypes.windll.shcore.SetProcessDpiAwareness(1)  # Ensure proper scaling on high-DPI displays (Windows)
-except Exception:
-    pass
+import sys  # Platform check for the Windows-only DPI call
+import queue  # Thread-safe event queue between the worker pool and the Tk loop
+import threading  # Cancellation flags for background work
+from concurrent.futures import ThreadPoolExecutor  # Worker pool that keeps file I/O off the Tk thread
+
+from examsoft_to_blackboard import config, metrics  # Shared configuration file and stage-timing metrics
+from examsoft_to_blackboard.attempts import POLICIES, policy_for
+from examsoft_to_blackboard.audit import AuditState
+from examsoft_to_blackboard.core import (build_import, examsoft_students, patch_gradebook, scores_by_username,
+                                         too_many_zeros, write_audit_report, write_import)
+from examsoft_to_blackboard.csvio import Cancelled, csv_cache, format_cache, load_csv
+from examsoft_to_blackboard.headers import ColumnSchema, choose_target_column, remember, score_columns, target_columns
+from examsoft_to_blackboard.preview import TAG_FILTERS, PreviewTable
+from examsoft_to_blackboard.results import ResultCache
+from examsoft_to_blackboard.roster import load_roster, roster_cache
+
+PREVIEW_ROWS = 12  # Treeview rows rendered at once by the virtualised preview
+STARTUP_PROBE_ENV = "EXAMSOFT_STARTUP_PROBE"  # Set to exit once the first window is drawn (startup benchmark)
+
+# Enable High DPI scaling for crisp text on Windows (ctypes is only loaded there)
+if sys.platform == "win32":
+    try:
+        import ctypes  # Windows system calls for DPI settings
+        ctypes.windll.shcore.SetProcessDpiAwareness(1)  # Ensure proper scaling on high-DPI displays (Windows)
+    except Exception:
+        pass
 
 # Setup logging
 logging.basicConfig(  # Setup logging configuration
@@ -21,6 +35,28 @@ logging.basicConfig(  # Setup logging configuration
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
+# Stage timings are opt-in: EXAMSOFT_METRICS=1, or EXAMSOFT_PROFILE=<folder> (cProfile + tracemalloc capture for
+# every job), writes them to config.METRICS_PATH and the debug log. Otherwise a stage costs one level check.
+metrics.log.setLevel(logging.WARNING)
+if metrics.profiling_from_env() or os.environ.get(metrics.METRICS_ENV): metrics.open_sink(config.METRICS_PATH)
+
+
+class BackgroundJob:  # Handle given to work running on the worker pool (never touches Tk widgets)
+    def __init__(self, kind, events, on_done, on_error=None, on_cancel=None):  # Define a function
+        self.kind = kind
+        self.events = events
+        self.on_done, self.on_error, self.on_cancel = on_done, on_error, on_cancel
+        self._cancel = threading.Event()
+
+    def cancel(self):  # Ask the worker to stop at its next check()
+        self._cancel.set()
+
+    def check(self):  # Abort the job if cancellation was requested
+        if self._cancel.is_set(): raise Cancelled()
+
+    def progress(self, text, fraction=None):  # Post a progress update to the Tk thread
+        self.check()
+        self.events.put(("progress", self, (text, fraction)))
 
 
 class ExamSoftToBlackboardApp:  # Define the main application class
@@ -34,19 +70,34 @@ class ExamSoftToBlackboardApp:  # Define the main application class
         self.default_font = ("Segoe UI", 10)
         self.root.option_add("*Font", self.default_font)
 
-        self.config_file = os.path.join(os.path.expanduser("~"), ".examsoft_converter_config")
-        config = self.load_config()
-        self.last_dir = config.get("last_dir", os.path.expanduser("~"))
-        self.mapping_history = config.get("mapping_history", {})
+        self.config_file = config.CONFIG_PATH
+        cfg = self.load_config()
+        self.last_dir = cfg.get("last_dir", os.path.expanduser("~"))
+        self.mapping_history = cfg.get("mapping_history", {})
+        self.attempt_policies = cfg.get("attempt_policies", {})  # Target column -> attempt policy
+        self.patch_gradebook = cfg.get("patch_gradebook", False)  # Fill scores into a copy of the gradebook
 
         self.examsoft_file_path = ""
         self.blackboard_file_path = ""
         self.examsoft_score_col = ""
-        self.bb_usernames = set()
-
+        self.es_schema = None  # ColumnSchema of the ExamSoft file, resolved once per selection
+        self.roster_index = None  # RosterIndex of the Blackboard gradebook (saved on disk between sessions)
+        self.audit = AuditState()  # Roster match kept between selections (drives "Roster Sync" and the preview)
+        self.preview_table = None  # PreviewTable behind the virtualised preview
+        self.preview_counts = {}
+        self.preview_offset = 0  # First preview row currently shown
+        self.results = ResultCache()  # Previous conversions: unchanged re-runs skip the merge and report changes
+
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="converter")
+        self._events = queue.Queue()  # (event, job, payload) tuples posted by worker threads
+        self._jobs = {}  # kind -> active BackgroundJob; a new job of the same kind supersedes the old one
+        self._polling = False
+
+        self.setup_status_bar()
         self.setup_scrollable_frame()
         self.setup_ui()
         self.setup_shortcuts()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.es_btn.focus_set()
 
     def center_window(self):  # Function to center the window on the screen
@@ -56,20 +107,12 @@ class ExamSoftToBlackboardApp:  # Define the main application class
         self.root.geometry(f'{w}x{h}+{x}+{y}')
 
     def load_config(self):  # Load saved configuration (e.g., file paths)
-        try:
-            path = os.path.join(os.path.expanduser("~"), ".examsoft_converter_config")
-            if os.path.exists(path):
-                with open(path, 'r') as f: return json.load(f)
-        except:
-            pass
-        return {}
+        return config.load_config(self.config_file)
 
     def save_config(self):  # Save current config to file
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump({"last_dir": self.last_dir, "mapping_history": self.mapping_history}, f)
-        except:
-            pass
+        config.save_config({"last_dir": self.last_dir, "mapping_history": self.mapping_history,
+                            "attempt_policies": self.attempt_policies, "patch_gradebook": self.patch_gradebook},
+                           self.config_file)
 
     def setup_shortcuts(self):  # Bind keyboard shortcuts to actions
         self.root.bind("<Control-o>", lambda e: self.select_examsoft_file())
@@ -77,6 +120,97 @@ class ExamSoftToBlackboardApp:  # Define the main application class
         self.root.bind("<Control-r>", lambda e: self.reset_app())
         self.root.bind("<F1>", lambda e: self.show_help())
 
+    def setup_status_bar(self):  # Progress bar and Cancel button shown while background work runs
+        self.status_bar = tk.Frame(self.root, bg="#ffffff", highlightthickness=1, highlightbackground="#e0e0e0")
+        self.status_label = tk.Label(self.status_bar, text="", bg="#ffffff", font=("Segoe UI", 9), anchor="w")
+        self.status_label.pack(side=tk.LEFT, padx=10, fill=tk.X, expand=True)
+        self.cancel_btn = ttk.Button(self.status_bar, text="Cancel", command=self.cancel_jobs)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=10, pady=5)
+        self.progress_bar = ttk.Progressbar(self.status_bar, length=160, mode="indeterminate")
+        self.progress_bar.pack(side=tk.RIGHT, pady=5)
+
+    def run_in_background(self, kind, text, work, on_done, on_error=None, on_cancel=None):  # Run work(job) off the Tk thread
+        previous = self._jobs.get(kind)
+        if previous: previous.cancel()
+        job = BackgroundJob(kind, self._events, on_done, on_error, on_cancel)
+        self._jobs[kind] = job
+        self._executor.submit(self._run_job, job, work)
+        self._show_busy(text)
+        if not self._polling:
+            self._polling = True
+            self.root.after(50, self._poll_events)
+        return job
+
+    def _run_job(self, job, work):  # Worker-thread wrapper that reports the outcome through the event queue
+        try:
+            job.check()
+            with metrics.profiled(job.kind), metrics.stage(f"job:{job.kind}"):
+                result = work(job)
+            self._events.put(("done", job, result))
+        except Cancelled:
+            self._events.put(("cancelled", job, None))
+        except Exception as e:
+            logging.error(f"Background Error ({job.kind}): {e}")
+            self._events.put(("error", job, e))
+
+    def _poll_events(self):  # Drain worker events on the Tk thread, the only place widgets are touched
+        try:
+            while True:
+                event, job, payload = self._events.get_nowait()
+                if self._jobs.get(job.kind) is not job: continue  # Superseded or cancelled: drop stale results
+                if event == "progress":
+                    self._show_busy(*payload);
+                    continue
+                del self._jobs[job.kind]
+                try:
+                    if event == "done":
+                        job.on_done(payload)
+                    elif event == "error":
+                        (job.on_error or self._show_error)(payload)
+                except Exception as e:
+                    logging.error(f"UI Update Error ({job.kind}): {e}");
+                    self._show_error(e)
+        except queue.Empty:
+            pass
+        if self._jobs:
+            self.root.after(50, self._poll_events)
+        else:
+            self._polling = False
+            self._hide_busy()
+
+    def _show_busy(self, text, fraction=None):  # Show the status bar with a message and optional progress
+        if not self.status_bar.winfo_ismapped():
+            self.status_bar.pack(side=tk.BOTTOM, fill=tk.X, before=self.scrollbar)
+        self.status_label.config(text=text)
+        if fraction is None:
+            if str(self.progress_bar.cget("mode")) != "indeterminate":
+                self.progress_bar.config(mode="indeterminate")
+            self.progress_bar.start(15)
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=round(fraction * 100))
+
+    def _hide_busy(self):  # Hide the status bar once no work is pending
+        self.progress_bar.stop()
+        self.status_bar.pack_forget()
+
+    def _show_error(self, e):  # Default error handler for background jobs
+        messagebox.showerror("Error", str(e))
+
+    def cancel_jobs(self):  # Cancel every running background job (Cancel button)
+        jobs = list(self._jobs.values());
+        self._jobs.clear()
+        for job in jobs:
+            job.cancel()
+            if job.on_cancel: job.on_cancel()
+        self._hide_busy()
+
+    def on_close(self):  # Stop background work before the window goes away
+        for job in self._jobs.values(): job.cancel()
+        self._jobs.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
     def setup_scrollable_frame(self):  # Create scrollable area for main interface
         self.main_canvas = tk.Canvas(self.root, bg="#f3f3f3", highlightthickness=0)
         self.scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.main_canvas.yview)
@@ -90,39 +224,6 @@ class ExamSoftToBlackboardApp:  # Define the main application class
         self.main_canvas.pack(side="left", fill="both", expand=True)
         self.root.bind_all("<MouseWheel>", lambda e: self.main_canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
 
-    def _read_csv(self, path):  # Define a function
-        self.root.config(cursor="wait");
-        self.root.update()
-        try:
-            encoding = 'utf-8-sig'
-            try:
-                with open(path, mode='r', newline='', encoding=encoding) as f:
-                    f.read(1024)
-            except UnicodeDecodeError:
-                encoding = 'latin-1'
-            with open(path, mode='r', newline='', encoding=encoding) as f:
-                sample = f.read(2048);
-                f.seek(0)
-                try:
-                    dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
-                except:
-                    dialect = csv.excel
-                reader = csv.DictReader(f, dialect=dialect);
-                data = list(reader);
-                headers = reader.fieldnames
-            if headers: headers = [col.strip() for col in headers]
-            self.root.config(cursor="");
-            return data, headers
-        except Exception as e:
-            self.root.config(cursor="");
-            logging.error(f"Read Error: {e}");
-            raise
-
-    def _find_header(self, headers, keywords, default=""):  # Define a function
-        for h in headers:
-            if any(k.lower() in h.lower() for k in keywords): return h
-        return default
-
     def _truncate_filename(self, filename, max_length=45):  # Define a function
         if len(filename) <= max_length: return filename
         keep = (max_length - 3) // 2
@@ -178,39 +279,71 @@ class ExamSoftToBlackboardApp:  # Define the main application class
         tk.Label(self.bb_drop_frame, text="Target column:", font=("Segoe UI", 9, "bold")).pack(side=tk.LEFT, padx=5)
         self.bb_col_var = tk.StringVar();
         self.bb_combo = ttk.Combobox(self.bb_drop_frame, textvariable=self.bb_col_var, state="readonly", width=30);
-        self.bb_combo.bind("<<ComboboxSelected>>", lambda e: self.update_preview());
+        self.bb_combo.bind("<<ComboboxSelected>>", lambda e: self._on_target_selected());
         self.bb_combo.pack(side=tk.LEFT, pady=5)
+        tk.Label(self.bb_drop_frame, text="Attempts:", font=("Segoe UI", 9, "bold")).pack(side=tk.LEFT, padx=(15, 5))
+        self.policy_var = tk.StringVar(value=POLICIES["max"])  # Label of the attempt policy (attempts.POLICIES)
+        ttk.Combobox(self.bb_drop_frame, textvariable=self.policy_var, values=list(POLICIES.values()),
+                     state="readonly", width=32).pack(side=tk.LEFT, pady=5)
         self.audit_status_label = tk.Label(self.bb_section, font=("Segoe UI", 9, "bold"))
 
         self.sep2 = ttk.Separator(self.scroll_content, orient='horizontal')
+        self.preview_filter_var = tk.StringVar(value="All rows")
+        self.patch_var = tk.BooleanVar(value=self.patch_gradebook)
+        self.preview_group = None  # Built by _build_preview_group() once a gradebook with target columns is loaded
+        self.success_panel = None  # Built by _build_success_panel() after the first export
+
+    def _build_preview_group(self):  # Mapping preview, treeview and Generate button (built on first use)
         self.preview_group = tk.Frame(self.scroll_content, bg="#f3f3f3");
-        tk.Label(self.preview_group, text="Mapping Preview", font=("Segoe UI", 10, "bold"), bg="#f3f3f3").pack(
-            anchor="w")
-        self.tree = ttk.Treeview(self.preview_group, columns=("User", "ID", "Score"), show='headings', height=8);
-        self.tree.heading("User", text="User");
-        self.tree.heading("ID", text="ID");
-        self.tree.heading("Score", text="Score")
-        self.tree.column("User", width=150);
-        self.tree.column("ID", width=120);
-        self.tree.column("Score", width=100);
-        self.tree.pack(fill=tk.BOTH, expand=True)
+        preview_bar = tk.Frame(self.preview_group, bg="#f3f3f3");
+        preview_bar.pack(fill=tk.X)
+        tk.Label(preview_bar, text="Mapping Preview", font=("Segoe UI", 10, "bold"), bg="#f3f3f3").pack(side=tk.LEFT)
+        filter_combo = ttk.Combobox(preview_bar, textvariable=self.preview_filter_var, values=list(TAG_FILTERS),
+                                    state="readonly", width=22);
+        filter_combo.bind("<<ComboboxSelected>>", lambda e: self.filter_preview());
+        filter_combo.pack(side=tk.RIGHT, pady=3)
+        tk.Label(preview_bar, text="Show:", bg="#f3f3f3", font=("Segoe UI", 9)).pack(side=tk.RIGHT, padx=5)
+        tree_frame = tk.Frame(self.preview_group);
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        # Virtualised: the Treeview only ever holds PREVIEW_ROWS items, refilled from self.preview_table on scroll
+        self.tree = ttk.Treeview(tree_frame, columns=PreviewTable.COLUMNS, show='headings', height=PREVIEW_ROWS);
+        for i, (col, width) in enumerate(zip(PreviewTable.COLUMNS, (150, 120, 100))):
+            self.tree.heading(col, text=col, command=lambda i=i: self.sort_preview(i))
+            self.tree.column(col, width=width)
+        self.tree_scroll = ttk.Scrollbar(tree_frame, orient="vertical", command=self.scroll_preview);
+        self.tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree.bind("<MouseWheel>", self._on_preview_wheel)
         self.tree.tag_configure("missing", foreground="#d83b01");
         self.tree.tag_configure("modified", foreground="#0078d4")
+        self.preview_status = tk.Label(self.preview_group, text="", bg="#f3f3f3", fg="#666666", font=("Segoe UI", 9))
+        self.preview_status.pack(anchor="w")
+        ttk.Checkbutton(self.preview_group, text="Fill scores into a copy of the full gradebook",
+                        variable=self.patch_var).pack(pady=(10, 0), anchor="e")
         self.generate_btn = ttk.Button(self.preview_group, text="Generate Blackboard Import File",
                                        command=self.process_files);
         self.generate_btn.pack(pady=10, anchor="e")
+        self._render_preview()
+        return self.preview_group
 
+    def _build_success_panel(self):  # Export summary panel (built on first use)
         self.success_panel = tk.Frame(self.scroll_content, bg="#ffffff", highlightthickness=1,
                                       highlightbackground="#107c10")
         self.success_label = tk.Label(self.success_panel, font=("Segoe UI", 10, "bold"), bg="#ffffff", fg="#107c10")
         self.success_path_label = tk.Label(self.success_panel, text="", bg="#ffffff", font=("Segoe UI", 9),
                                            wraplength=500)
+        return self.success_panel
 
     def reset_app(self):  # Reset app to initial state (clears selections)
+        self.cancel_jobs()
+        csv_cache.invalidate()
+        format_cache.invalidate()
+        roster_cache.invalidate()
         self.examsoft_file_path = "";
         self.blackboard_file_path = "";
         self.examsoft_score_col = "";
-        self.bb_usernames = set()
+        self.es_schema = self.roster_index = None
+        self.audit.clear()
         self.es_label.config(text="Select source file", fg="#666666");
         self.bb_label.config(text="Select target template", fg="#666666")
         self.es_btn.config(text="Browse...");
@@ -218,15 +351,15 @@ class ExamSoftToBlackboardApp:  # Define the main application class
         self.es_drop_frame.pack_forget();
         self.bb_drop_frame.pack_forget();
         self.bb_section.pack_forget();
-        self.preview_group.pack_forget();
-        self.success_panel.pack_forget()
+        if self.preview_group: self.preview_group.pack_forget()
+        if self.success_panel: self.success_panel.pack_forget()
         self.sep1.pack_forget();
         self.sep2.pack_forget();
         self.audit_status_label.pack_forget()
         self.es_section.configure(style="TLabelframe");
         self.bb_section.configure(style="TLabelframe")
         self.es_btn.focus_set();
-        [self.tree.delete(i) for i in self.tree.get_children()]
+        self._show_preview_rows([])
 
     def show_help(self):  # Show help/instruction window
         help_window = tk.Toplevel(self.root)
@@ -273,438 +406,269 @@ class ExamSoftToBlackboardApp:  # Define the main application class
 
     def on_es_combo_select(self, event):  # Define a function
         self.examsoft_score_col = self.es_col_var.get();
-        self.update_preview();
-        self.perform_instant_audit()
+        self.es_schema = self.es_schema.with_score(self.examsoft_score_col)
+        self.update_preview()  # The match counts do not depend on the score column
 
     def select_examsoft_file(self):  # Prompt user to select ExamSoft CSV
         path = filedialog.askopenfilename(initialdir=self.last_dir, title="Select ExamSoft CSV",
                                           filetypes=[("CSV files", "*.csv")])
         if path:
-            try:
-                self.last_dir = os.path.dirname(path);
-                self.save_config()
-                d, h = self._read_csv(path)
-                if not self._find_header(h, ["email"]): messagebox.showerror("Error", "Missing 'Email' column."); return
-                self.examsoft_file_path = path;
-                self.es_label.config(text=f"📄 {self._truncate_filename(os.path.basename(path))} ({len(d)} rows)",
-                                     fg="#0078d4", font=("Segoe UI", 10, "bold"));
-                self.es_btn.config(text="Change File")
-                self.es_section.configure(style="Success.TLabelframe");
-                self.identify_examsoft_score_column(h)
-                self.sep1.pack(fill=tk.X, padx=50, pady=5);
-                self.bb_section.pack(pady=10, fill=tk.X, padx=30);
-                self.update_preview()
-                self.root.after(100, lambda: self.main_canvas.yview_moveto(0.3));
-                self.perform_instant_audit()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            self.last_dir = os.path.dirname(path);
+            self.save_config()
+            self.run_in_background("examsoft", "Reading ExamSoft file...",
+                                   lambda job: self._load_examsoft(job, path),
+                                   lambda res: self._on_examsoft_loaded(path, *res))
+
+    def _load_examsoft(self, job, path):  # Worker: parse the ExamSoft file and collect its students
+        d, h = load_csv(path, job.check)
+        return d, h, examsoft_students(d, h)
+
+    def _on_examsoft_loaded(self, path, d, h, students):  # Apply a freshly parsed ExamSoft file to the UI
+        schema = ColumnSchema(h)
+        if not schema.email: messagebox.showerror("Error", "Missing 'Email' column."); return
+        self.examsoft_file_path = path;
+        self.es_label.config(text=f"📄 {self._truncate_filename(os.path.basename(path))} ({len(d)} rows)",
+                             fg="#0078d4", font=("Segoe UI", 10, "bold"));
+        self.es_btn.config(text="Change File")
+        self.es_section.configure(style="Success.TLabelframe");
+        self.identify_examsoft_score_column(h)
+        self.es_schema = schema.with_score(self.examsoft_score_col)
+        self.audit.set_examsoft(d, schema, students)
+        self.sep1.pack(fill=tk.X, padx=50, pady=5);
+        self.bb_section.pack(pady=10, fill=tk.X, padx=30);
+        self.update_preview()
+        self.root.after(100, lambda: self.main_canvas.yview_moveto(0.3));
+        self.perform_instant_audit()
 
     def select_blackboard_file(self):  # Prompt user to select Blackboard CSV
         path = filedialog.askopenfilename(initialdir=self.last_dir, title="Select Blackboard CSV",
                                           filetypes=[("CSV files", "*.csv")])
         if path:
-            try:
-                self.last_dir = os.path.dirname(path);
-                self.save_config()
-                d, h = self._read_csv(path);
-                self.blackboard_file_path = path
-                u_col = self._find_header(h, ["username"])
-                self.bb_usernames = {row.get(u_col, "").lower().strip() for row in d if row.get(u_col)}
-                self.bb_label.config(text=f"📄 {self._truncate_filename(os.path.basename(path))} ({len(d)} rows)",
-                                     fg="#0078d4", font=("Segoe UI", 10, "bold"));
-                self.bb_btn.config(text="Change File")
-                ex = {"last name", "first name", "username", "student id", "last access", "availability"}
-                filtered = [col for col in h if col.lower() not in ex]
-                if filtered:
-                    self.bb_section.configure(style="Success.TLabelframe");
-                    self.bb_drop_frame.pack(side=tk.TOP, anchor="w", padx=10, pady=5);
-                    self.bb_combo['values'] = filtered
-                    hist = self.mapping_history.get(self.examsoft_score_col)
-                    self.bb_col_var.set(hist if hist in filtered else next(
-                        (c for c in filtered if self.examsoft_score_col.lower() in c.lower()), filtered[0]))
-                    self.sep2.pack(fill=tk.X, padx=50, pady=5);
-                    self.preview_group.pack(pady=15, fill=tk.BOTH, expand=True, padx=30)
-                self.update_preview();
-                self.root.after(100, lambda: self.main_canvas.yview_moveto(1.0));
-                self.perform_instant_audit()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-
-    def perform_instant_audit(self):  # Compare usernames between both files and show match %
-        if not self.examsoft_file_path or not self.blackboard_file_path: return
-        try:
-            es_d, es_h = self._read_csv(self.examsoft_file_path);
-            bb_d, bb_h = self._read_csv(self.blackboard_file_path)
-            e_c = self._find_header(es_h, ["email"]);
-            u_c = self._find_header(bb_h, ["username"])
-            es_u = {r.get(e_c, "").split('@')[0].split('+')[0].lower().strip() for r in es_d if r.get(e_c)}
-            bb_u = {r.get(u_c, "").lower().strip() for r in bb_d if r.get(u_c)}
-            matches = len(es_u.intersection(bb_u));
-            total = len(es_u)
-            percent = round((matches / total) * 100) if total > 0 else 0
-            self.audit_status_label.config(text=f"📊 Roster Sync: {matches} of {total} matched ({percent}%)",
-                                           fg="#107c10" if percent > 95 else "#d83b01")
-            self.audit_status_label.pack(pady=5, anchor="w", padx=5)
-        except:
-            pass
+            self.last_dir = os.path.dirname(path);
+            self.save_config()
+            self.run_in_background("blackboard", "Reading Blackboard gradebook...",
+                                   lambda job: self._load_blackboard(job, path),
+                                   lambda res: self._on_blackboard_loaded(path, *res))
+
+    def _load_blackboard(self, job, path):  # Worker: load (or build and save) the gradebook's roster index
+        return (load_roster(path, check=job.check),)
+
+    def _on_blackboard_loaded(self, path, index):  # Apply a freshly loaded gradebook to the UI
+        self.blackboard_file_path = path
+        self.roster_index = index
+        self.audit.set_roster(index)
+        self.bb_label.config(text=f"📄 {self._truncate_filename(os.path.basename(path))} ({index.row_count} rows)",
+                             fg="#0078d4", font=("Segoe UI", 10, "bold"));
+        self.bb_btn.config(text="Change File")
+        filtered = target_columns(index.headers)
+        if filtered:
+            self.bb_section.configure(style="Success.TLabelframe");
+            self.bb_drop_frame.pack(side=tk.TOP, anchor="w", padx=10, pady=5);
+            self.bb_combo['values'] = filtered
+            self.bb_col_var.set(choose_target_column(filtered, self.examsoft_score_col, self.mapping_history))
+            self._show_policy()
+            self.sep2.pack(fill=tk.X, padx=50, pady=5);
+            (self.preview_group or self._build_preview_group()).pack(pady=15, fill=tk.BOTH, expand=True, padx=30)
+        self.update_preview();
+        self.root.after(100, lambda: self.main_canvas.yview_moveto(1.0));
+        self.perform_instant_audit()
+
+    def perform_instant_audit(self):  # Show the match % from the kept audit state (no file reads)
+        if not self.audit.ready: return
+        self._show_audit(self.audit.counts())
+
+    def _show_audit(self, counts):  # Update the "Roster Sync" label
+        matches, total = counts
+        percent = round((matches / total) * 100) if total > 0 else 0
+        self.audit_status_label.config(text=f"📊 Roster Sync: {matches} of {total} matched ({percent}%)",
+                                       fg="#107c10" if percent > 95 else "#d83b01")
+        self.audit_status_label.pack(pady=5, anchor="w", padx=5)
 
     def identify_examsoft_score_column(self, h):  # Try to detect which column has the ExamSoft scores
-        cands = ["%", "pts", "raw", "score", "percentage"];
-        found = [col for col in h if any(c.lower() in col.lower() for c in cands)]
+        found, choice = score_columns(h)
         if found:
             self.es_section.configure(style="Highlight.TLabelframe");
             self.es_drop_frame.pack(side=tk.TOP, anchor="w", padx=10, pady=5);
             self.es_combo['values'] = found
-            choice = next((col for col in found if "%" in col), found[0]);
             self.es_col_var.set(choice);
             self.examsoft_score_col = choice
 
-    def show_success_state(self, p, c, stats=None):  # Display success message and export options
+    def show_success_state(self, p, c, stats=None, diff=None,
+                           dist=None):  # Display success message and export options
         self.preview_group.pack_forget();
-        self.success_panel.pack(pady=20, fill=tk.X, padx=30)
+        (self.success_panel or self._build_success_panel()).pack(pady=20, fill=tk.X, padx=30)
         self.success_label.config(text=f"✅ {c} Scores Mapped Successfully!");
         self.success_label.pack(pady=(10, 0))
         if stats: tk.Label(self.success_panel,
                            text=f"Avg: {stats['avg']}% | High: {stats['high']} | Low: {stats['low']}",
                            font=("Segoe UI", 10, "bold"), bg="#ffffff").pack(pady=5)
+        if dist and dist["count"]:
+            outliers = f" | {len(dist['outliers'])} unusual (see audit)" if dist["outliers"] else ""
+            tk.Label(self.success_panel, bg="#ffffff", font=("Segoe UI", 9),
+                     text=f"Median: {dist['median']} | Middle half: {dist['p25']}-{dist['p75']} | "
+                          f"Std dev: {dist['stdev']}{outliers}").pack()
+        if diff is not None:
+            changes = len(diff["changed"]) + len(diff["added"]) + len(diff["removed"])
+            tk.Label(self.success_panel, bg="#ffffff", font=("Segoe UI", 9),
+                     fg="#d83b01" if changes else "#107c10",
+                     text=f"🔁 {len(diff['changed'])} changed, {len(diff['added'])} new, {len(diff['removed'])} "
+                          f"removed since the last run" if changes else "No grade changes since the last run").pack()
         self.success_path_label.config(text=p);
         self.success_path_label.pack(pady=10)
         ttk.Button(self.success_panel, text="Open Exported CSV", command=lambda: os.startfile(p)).pack(pady=5)
-        ttk.Button(self.success_panel, text="Open Folder",
-                   command=lambda: subprocess.Popen(f'explorer /select,"{os.path.normpath(p)}"')).pack(pady=5)
-        ttk.Button(self.success_panel, text="Exit Application", command=self.root.destroy).pack(side=tk.BOTTOM, pady=10)
+        ttk.Button(self.success_panel, text="Open Folder", command=lambda: self._open_folder(p)).pack(pady=5)
+        ttk.Button(self.success_panel, text="Exit Application", command=self.on_close).pack(side=tk.BOTTOM, pady=10)
 
-    def clean_score(self, v):  # Remove extra characters and convert score to number
-        if not v: return "0"
-        n = "".join(re.findall(r'[0-9.]+', str(v)))
-        try:
-            return str(round(float(n or 0), 2))
-        except:
-            return "0"
+    def _open_folder(self, p):  # Show the exported file in Explorer
+        import subprocess  # Only needed when the button is pressed
+        subprocess.Popen(f'explorer /select,"{os.path.normpath(p)}"')
 
-    def update_preview(self):  # Show preview of mapped scores
-        [self.tree.delete(i) for i in self.tree.get_children()]
-        if not self.examsoft_file_path or not self.examsoft_score_col: return
+    def _on_target_selected(self):  # New target column: its remembered attempt policy, then the preview
+        self._show_policy()
+        self.update_preview()
+
+    def _show_policy(self):  # Select the attempt policy remembered for the current target column
         try:
-            d, h = self._read_csv(self.examsoft_file_path);
-            e_col = self._find_header(h, ["email"])
-            for i, row in enumerate(d):
-                if i >= 12: break
-                raw_e = row.get(e_col, "").strip()
-                if not raw_e: continue
-                u = raw_e.split('@')[0].split('+')[0].lower().strip()
-                r = row.get(self.examsoft_score_col, "");
-                c = self.clean_score(r)
-                tags = []
-                if c != r.strip(): tags.append("modified")
-                if self.bb_usernames and u not in self.bb_usernames: tags.append("missing")
-                self.tree.insert("", tk.END, values=(u, row.get("StudentID", row.get("Student ID", "")), c), tags=tags)
-            self.tree.tag_configure("missing", foreground="#d83b01");
-            self.tree.tag_configure("modified", foreground="#0078d4")
-        except Exception:
-            pass
+            policy = policy_for(self.bb_col_var.get(), self.attempt_policies)
+        except ValueError:  # Config edited by hand
+            policy = "max"
+        self.policy_var.set(POLICIES[policy])
+
+    def _selected_policy(self):  # Attempt policy name for the label shown in the combo box
+        return next((name for name, label in POLICIES.items() if label == self.policy_var.get()), "max")
+
+    def update_preview(self):  # Preview every mapped score (built off the Tk thread, shown a window at a time)
+        if not self.examsoft_file_path or not self.examsoft_score_col:
+            self._show_preview_rows([])
+            return
+        audit, score_col = self.audit, self.examsoft_score_col
+        self.run_in_background("preview", "Building preview...", lambda job: audit.preview(score_col),
+                               self._show_preview_rows, on_error=lambda e: None)
+
+    def _show_preview_rows(self, items):  # New preview data: keep the current filter and sort, start at the top
+        previous, table = self.preview_table, PreviewTable(items)
+        table.set_filter(TAG_FILTERS.get(self.preview_filter_var.get()))
+        if previous and previous.sort_col is not None: table.sort_by(previous.sort_col, previous.reverse)
+        self.preview_table, self.preview_counts, self.preview_offset = table, table.counts(), 0
+        self._render_preview()
+
+    def filter_preview(self):  # "Show:" combo box changed
+        if not self.preview_table: return
+        self.preview_table.set_filter(TAG_FILTERS.get(self.preview_filter_var.get()))
+        self.preview_offset = 0
+        self._render_preview()
+
+    def sort_preview(self, col):  # Column heading clicked (again to reverse)
+        if not self.preview_table: return
+        self.preview_table.sort_by(col)
+        self.preview_offset = 0
+        self._render_preview()
+
+    def scroll_preview(self, action, amount, unit=None):  # Scrollbar callback: move the visible window
+        total = len(self.preview_table) if self.preview_table else 0
+        if action == "moveto":
+            self.preview_offset = int(float(amount) * total)
+        else:
+            self.preview_offset += int(amount) * (PREVIEW_ROWS if unit == "pages" else 1)
+        self._render_preview()
+
+    def _on_preview_wheel(self, e):  # Scroll the preview, not the page, while the pointer is over it
+        self.scroll_preview("scroll", int(-1 * (e.delta / 120)) * 3, "units")
+        return "break"
+
+    def _render_preview(self):  # Refill the fixed set of Treeview rows from the visible window
+        if self.preview_group is None: return  # Not built yet: _build_preview_group() renders the current table
+        table = self.preview_table
+        total = len(table) if table else 0
+        self.preview_offset = max(0, min(self.preview_offset, total - PREVIEW_ROWS))
+        rows = table.window(self.preview_offset, PREVIEW_ROWS) if table else []
+        existing = self.tree.get_children()
+        for i, (values, tags) in enumerate(rows):
+            if i < len(existing):
+                self.tree.item(existing[i], values=values, tags=tags)
+            else:
+                self.tree.insert("", tk.END, values=values, tags=tags)
+        if len(existing) > len(rows): self.tree.delete(*existing[len(rows):])
+        if total:
+            self.tree_scroll.set(self.preview_offset / total, (self.preview_offset + len(rows)) / total)
+            counts = self.preview_counts
+            self.preview_status.config(text=f"Rows {self.preview_offset + 1:,}–{self.preview_offset + len(rows):,} "
+                                            f"of {total:,}  ·  {counts['missing']:,} missing  ·  "
+                                            f"{counts['modified']:,} modified")
+        else:
+            self.tree_scroll.set(0, 1)
+            self.preview_status.config(text="No rows match this filter" if table and table.items else "")
 
     def process_files(self):  # Main logic to generate Blackboard import file
         target = self.bb_col_var.get();
+        patch = self.patch_var.get()
+        initial = (f"BB_Gradebook_{os.path.basename(self.blackboard_file_path)}" if patch else
+                   f"BB_Import_{os.path.basename(self.examsoft_file_path)}")
         out = filedialog.asksaveasfilename(initialdir=self.last_dir, title="Save File", defaultextension=".csv",
-                                           initialfile=f"BB_Import_{os.path.basename(self.examsoft_file_path)}",
-                                           filetypes=[("CSV files", "*.csv")])
+                                           initialfile=initial, filetypes=[("CSV files", "*.csv")])
         if not out: return
-        self.mapping_history[self.examsoft_score_col] = target;
+        policy = self._selected_policy()
+        remember(self.mapping_history, self.examsoft_score_col, target)
+        self.attempt_policies[target] = policy
+        self.patch_gradebook = patch
         self.save_config()
-        self.root.config(cursor="wait");
-        self.root.update()
-        try:
-            bb_u = {};
-            bb_d, bb_h = self._read_csv(self.blackboard_file_path)
-            u_c, f_c, l_c = self._find_header(bb_h, ["username"]), self._find_header(bb_h,
-                                                                                     ["first"]), self._find_header(bb_h,
-                                                                                                                   ["last"])
-            for r in bb_d:
-                uname = r.get(u_c, "").lower().strip()
-                if uname: bb_u[uname] = f"{r.get(f_c)} {r.get(l_c)}"
-            unique_s = {};
-            not_in_bb = [];
-            zero_count = 0;
-            scores = [];
-            es_d, es_h = self._read_csv(self.examsoft_file_path)
-            e_c, sid_c = self._find_header(es_h, ["email"]), self._find_header(es_h,
-                                                                               ["student", "id"]) or self._find_header(
-                es_h, ["email"])
-            for idx, row in enumerate(es_d, start=2):
-                raw_e = row.get(e_c, "").strip()
-                if not raw_e: continue
-                username = raw_e.split('@')[0].split('+')[0].lower().strip();
-                s_val = self.clean_score(row.get(self.examsoft_score_col, "0"))
-                sid = row.get(sid_c, "").strip() or username;
-                s_num = float(s_val or 0);
-                scores.append(s_num);
-                zero_count += (1 if s_num == 0 else 0)
-                record = {"Last Name": row.get(self._find_header(es_h, ["last"])),
-                          "First Name": row.get(self._find_header(es_h, ["first"])), "Username": username,
-                          "Student ID": sid, target: s_val}
-                if sid in unique_s:
-                    if s_num > float(unique_s[sid][target]): unique_s[sid] = record
-                else:
-                    unique_s[sid] = record
-                if bb_u and username not in bb_u: not_in_bb.append(
-                    f"Row {idx}: {record['First Name']} {record['Last Name']} ({username})")
-            rows = list(unique_s.values())
-            if rows and (zero_count / len(rows)) > 0.2:
-                self.root.config(cursor="")
-                if not messagebox.askyesno("Confirm", f"{zero_count} students have a score of 0. Continue?"):
-                    return
-                self.root.config(cursor="wait");
-                self.root.update()
-            stats = {"avg": round(sum(scores) / len(scores), 1) if scores else 0, "high": max(scores) if scores else 0,
-                     "low": min(scores) if scores else 0}
-            not_in_es = [f"- {name} ({u})" for u, name in bb_u.items() if u not in {r['Username'] for r in rows}]
-            with open(out, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=["Last Name", "First Name", "Username", "Student ID", target]);
-                writer.writeheader();
-                writer.writerows(rows)
-            self.root.config(cursor="");
-            self.show_success_state(out, len(rows), stats)
-            if not_in_bb or not_in_es:
-                a_path = os.path.normpath(os.path.join(os.path.dirname(out), "Audit_Report.txt"))
-                with open(a_path, 'w', encoding='utf-8') as f:
-                    f.write("EXAMSOFT TO BLACKBOARD AUDIT REPORT\n");
-                    f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n");
-                    f.write("=" * 35 + "\n\n")
-                    f.write(f"STATS: Avg {stats['avg']}% | High {stats['high']} | Low {stats['low']}\n\n")
-                    if not_in_bb: f.write(
-                        f"⚠️ IN EXAMSOFT ONLY ({len(not_in_bb)}):\n" + "\n".join([f"- {s}" for s in not_in_bb]) + "\n")
-                    if not_in_es: f.write(f"\n⚠️ MISSING SCORES ({len(not_in_es)}):\n" + "\n".join(not_in_es) + "\n")
-                if messagebox.askyesno("Audit Warning", "Roster mismatches detected. Open Audit Report?"): os.startfile(
-                    a_path)
-        except Exception as e:
-            self.root.config(cursor=""); messagebox.showerror("Error", str(e))
+        gradebook = self.blackboard_file_path if patch else None  # Copied with the scores filled in
+        es_path, es_schema, roster = self.examsoft_file_path, self.es_schema, self.roster_index
+        bb_path = self.blackboard_file_path
+        self.generate_btn.config(state="disabled")
+        self.run_in_background("export", "Matching scores to roster...",
+                               lambda job: self._build_import(job, es_path, es_schema, roster, target, policy, bb_path),
+                               lambda res: self._confirm_and_write(res, out, target, gradebook, bb_path),
+                               on_error=self._on_export_error, on_cancel=self._on_export_cancel)
+
+    def _build_import(self, job, es_path, es_schema, roster, target, policy,
+                      bb_path):  # Worker: match, dedup, stats (or cached)
+        def _merge():
+            es_d, _ = load_csv(es_path, job.check)
+            return build_import(es_d, es_schema, None, None, es_schema.score, progress=job.progress, roster=roster,
+                                policy=policy)
+
+        return self.results.merge(es_path, roster, es_schema.score, target, _merge, policy, bb_path)
+
+    def _confirm_and_write(self, res, out, target, gradebook,
+                           bb_path):  # Ask about zero scores, then write in the background
+        if too_many_zeros(res):
+            if not messagebox.askyesno("Confirm", f"{res['zero_count']} students have a score of 0. Continue?"):
+                self.generate_btn.config(state="normal");
+                return
+        self.run_in_background("export", "Writing import file...",
+                               lambda job: self._write_outputs(job, res, out, target, gradebook, bb_path),
+                               lambda a_path: self._on_export_written(res, out, a_path),
+                               on_error=self._on_export_error, on_cancel=self._on_export_cancel)
+
+    def _write_outputs(self, job, res, out, target, gradebook,
+                       bb_path):  # Worker: import CSV (or gradebook copy) + audit
+        if gradebook:
+            patch_gradebook(gradebook, out, {target: scores_by_username(res["rows"])}, job.check)
+        else:
+            write_import(out, res["rows"], target)
+        job.check()
+        a_path = write_audit_report(out, res)
+        self.results.set_last(bb_path, target, res["key"])  # Diff the next run against what was just exported
+        return a_path
+
+    def _on_export_written(self, res, out, a_path):  # Show the result once the files are on disk
+        self.generate_btn.config(state="normal")
+        self.show_success_state(out, len(res["rows"]), res["stats"], res.get("diff"), res.get("distribution"))
+        if a_path and messagebox.askyesno("Audit Warning", "Roster mismatches, guessed scores or changed grades "
+                                                           "detected. Open Audit Report?"):
+            os.startfile(a_path)
+
+    def _on_export_error(self, e):  # Define a function
+        self.generate_btn.config(state="normal");
+        messagebox.showerror("Error", str(e))
+
+    def _on_export_cancel(self):  # Define a function
+        self.generate_btn.config(state="normal")
 
 
 if __name__ == '__main__':  # Launch the application
     root = tk.Tk();
     app = ExamSoftToBlackboardApp(root);
-    root.mainloop()
-
-
-
-def select_examsoft_file(self):  # Open a file dialog to choose the ExamSoft CSV file
-    path = filedialog.askopenfilename(initialdir=self.last_dir, title="Select ExamSoft CSV", filetypes=[
-        ("CSV files", "*.csv")])  # Show a dialog for the user to select a file to open
-    if path:
-        try:
-            self.last_dir = os.path.dirname(path);
-            self.save_config()  # Remember the last directory the user accessed
-            d, h = self._read_csv(path)  # Call internal method to read and parse a CSV file
-            if not self._find_header(h, ["email"]): messagebox.showerror("Error",
-                                                                         "Missing 'Email' column."); return  # Helper function to locate a column by matching its name to expected keywords
-            self.examsoft_file_path = path;
-            self.es_label.config(text=f"📄 {self._truncate_filename(os.path.basename(path))} ({len(d)} rows)",
-                                 fg="#0078d4", font=("Segoe UI", 10, "bold"));
-            self.es_btn.config(text="Change File")  # Update the UI label to show selected file name and row count
-            self.es_section.configure(style="Success.TLabelframe");
-            self.identify_examsoft_score_column(h)
-            self.sep1.pack(fill=tk.X, padx=50, pady=5);
-            self.bb_section.pack(pady=10, fill=tk.X, padx=30);
-            self.update_preview()
-            self.root.after(100, lambda: self.main_canvas.yview_moveto(0.3));
-            self.perform_instant_audit()  # Schedule a scroll or update to the UI shortly after the current event loop
-        except Exception as e:
-            messagebox.showerror("Error", str(e))  # Show an error message dialog if something went wrong
-
-
-def select_blackboard_file(self):  # Open a file dialog to choose the Blackboard CSV file
-    path = filedialog.askopenfilename(initialdir=self.last_dir, title="Select Blackboard CSV", filetypes=[
-        ("CSV files", "*.csv")])  # Show a dialog for the user to select a file to open
-    if path:
-        try:
-            self.last_dir = os.path.dirname(path);
-            self.save_config()  # Remember the last directory the user accessed
-            d, h = self._read_csv(path);
-            self.blackboard_file_path = path  # Call internal method to read and parse a CSV file
-            u_col = self._find_header(h,
-                                      ["username"])  # Helper function to locate a column by matching its name to expected keywords
-            self.bb_usernames = {row.get(u_col, "").lower().strip() for row in d if row.get(u_col)}
-            self.bb_label.config(text=f"📄 {self._truncate_filename(os.path.basename(path))} ({len(d)} rows)",
-                                 fg="#0078d4", font=("Segoe UI", 10, "bold"));
-            self.bb_btn.config(text="Change File")  # Update the UI label to show selected file name and row count
-            ex = {"last name", "first name", "username", "student id", "last access", "availability"}
-            filtered = [col for col in h if col.lower() not in ex]
-            if filtered:
-                self.bb_section.configure(style="Success.TLabelframe");
-                self.bb_drop_frame.pack(side=tk.TOP, anchor="w", padx=10, pady=5);
-                self.bb_combo['values'] = filtered  # Populate the dropdown menu with column names
-                hist = self.mapping_history.get(self.examsoft_score_col)
-                self.bb_col_var.set(hist if hist in filtered else next(
-                    (c for c in filtered if self.examsoft_score_col.lower() in c.lower()), filtered[0]))
-                self.sep2.pack(fill=tk.X, padx=50, pady=5);
-                self.preview_group.pack(pady=15, fill=tk.BOTH, expand=True, padx=30)  # Show the preview table section
-            self.update_preview();
-            self.root.after(100, lambda: self.main_canvas.yview_moveto(1.0));
-            self.perform_instant_audit()  # Schedule a scroll or update to the UI shortly after the current event loop
-        except Exception as e:
-            messagebox.showerror("Error", str(e))  # Show an error message dialog if something went wrong
-
-
-def perform_instant_audit(self):  # Function definition
-    if not self.examsoft_file_path or not self.blackboard_file_path: return
-    try:
-        es_d, es_h = self._read_csv(self.examsoft_file_path);
-        bb_d, bb_h = self._read_csv(self.blackboard_file_path)  # Call internal method to read and parse a CSV file
-        e_c = self._find_header(es_h, ["email"]);
-        u_c = self._find_header(bb_h,
-                                ["username"])  # Helper function to locate a column by matching its name to expected keywords
-        es_u = {r.get(e_c, "").split('@')[0].split('+')[0].lower().strip() for r in es_d if r.get(e_c)}
-        bb_u = {r.get(u_c, "").lower().strip() for r in bb_d if r.get(u_c)}
-        matches = len(es_u.intersection(bb_u));
-        total = len(es_u)
-        percent = round((matches / total) * 100) if total > 0 else 0
-        self.audit_status_label.config(text=f"📊 Roster Sync: {matches} of {total} matched ({percent}%)",
-                                       fg="#107c10" if percent > 95 else "#d83b01")
-        self.audit_status_label.pack(pady=5, anchor="w", padx=5)
-    except:
-        pass
-
-
-def identify_examsoft_score_column(self, h):  # Function definition
-    cands = ["%", "pts", "raw", "score", "percentage"];
-    found = [col for col in h if any(c.lower() in col.lower() for c in cands)]
-    if found:
-        self.es_section.configure(style="Highlight.TLabelframe");
-        self.es_drop_frame.pack(side=tk.TOP, anchor="w", padx=10, pady=5);
-        self.es_combo['values'] = found
-        choice = next((col for col in found if "%" in col), found[0]);
-        self.es_col_var.set(choice);
-        self.examsoft_score_col = choice
-
-
-def show_success_state(self, p, c, stats=None):  # Function definition
-    self.preview_group.pack_forget();
-    self.success_panel.pack(pady=20, fill=tk.X, padx=30)  # Show the preview table section
-    self.success_label.config(text=f"✅ {c} Scores Mapped Successfully!");
-    self.success_label.pack(pady=(10, 0))
-    if stats: tk.Label(self.success_panel, text=f"Avg: {stats['avg']}% | High: {stats['high']} | Low: {stats['low']}",
-                       font=("Segoe UI", 10, "bold"), bg="#ffffff").pack(pady=5)
-    self.success_path_label.config(text=p);
-    self.success_path_label.pack(pady=10)
-    ttk.Button(self.success_panel, text="Open Exported CSV", command=lambda: os.startfile(p)).pack(pady=5)
-    ttk.Button(self.success_panel, text="Open Folder",
-               command=lambda: subprocess.Popen(f'explorer /select,"{os.path.normpath(p)}"')).pack(pady=5)
-    ttk.Button(self.success_panel, text="Exit Application", command=self.root.destroy).pack(side=tk.BOTTOM, pady=10)
-
-
-def clean_score(self, v):  # Function definition
-    if not v: return "0"
-    n = "".join(re.findall(r'[0-9.]+', str(v)))
-    try:
-        return str(round(float(n or 0), 2))
-    except:
-        return "0"
-
-
-def update_preview(self):  # Function definition
-    [self.tree.delete(i) for i in self.tree.get_children()]
-    if not self.examsoft_file_path or not self.examsoft_score_col: return
-    try:
-        d, h = self._read_csv(self.examsoft_file_path);
-        e_col = self._find_header(h, ["email"])  # Call internal method to read and parse a CSV file
-        for i, row in enumerate(d):
-            if i >= 12: break
-            raw_e = row.get(e_col, "").strip()
-            if not raw_e: continue
-            u = raw_e.split('@')[0].split('+')[0].lower().strip()
-            r = row.get(self.examsoft_score_col, "");
-            c = self.clean_score(r)
-            tags = []
-            if c != r.strip(): tags.append("modified")
-            if self.bb_usernames and u not in self.bb_usernames: tags.append("missing")
-            self.tree.insert("", tk.END, values=(u, row.get("StudentID", row.get("Student ID", "")), c),
-                             tags=tags)  # Add a new row to the preview TreeView
-        self.tree.tag_configure("missing", foreground="#d83b01");
-        self.tree.tag_configure("modified", foreground="#0078d4")
-    except Exception:
-        pass
-
-
-def process_files(self):  # Function definition
-    target = self.bb_col_var.get();
-    out = filedialog.asksaveasfilename(initialdir=self.last_dir, title="Save File", defaultextension=".csv",
-                                       initialfile=f"BB_Import_{os.path.basename(self.examsoft_file_path)}", filetypes=[
-            ("CSV files", "*.csv")])  # Remember the last directory the user accessed
-    if not out: return
-    self.mapping_history[self.examsoft_score_col] = target;
-    self.save_config()
-    self.root.config(cursor="wait");
-    self.root.update()
-    try:
-        bb_u = {};
-        bb_d, bb_h = self._read_csv(self.blackboard_file_path)  # Call internal method to read and parse a CSV file
-        u_c, f_c, l_c = self._find_header(bb_h, ["username"]), self._find_header(bb_h, ["first"]), self._find_header(
-            bb_h, ["last"])  # Helper function to locate a column by matching its name to expected keywords
-        for r in bb_d:
-            uname = r.get(u_c, "").lower().strip()
-            if uname: bb_u[uname] = f"{r.get(f_c)} {r.get(l_c)}"
-        unique_s = {};
-        not_in_bb = [];
-        zero_count = 0;
-        scores = [];
-        es_d, es_h = self._read_csv(self.examsoft_file_path)  # Call internal method to read and parse a CSV file
-        e_c, sid_c = self._find_header(es_h, ["email"]), self._find_header(es_h,
-                                                                           ["student", "id"]) or self._find_header(es_h,
-                                                                                                                   ["email"])  # Helper function to locate a column by matching its name to expected keywords
-        for idx, row in enumerate(es_d, start=2):
-            raw_e = row.get(e_c, "").strip()
-            if not raw_e: continue
-            username = raw_e.split('@')[0].split('+')[0].lower().strip();
-            s_val = self.clean_score(row.get(self.examsoft_score_col, "0"))
-            sid = row.get(sid_c, "").strip() or username;
-            s_num = float(s_val or 0);
-            scores.append(s_num);
-            zero_count += (1 if s_num == 0 else 0)
-            record = {"Last Name": row.get(self._find_header(es_h, ["last"])),
-                      "First Name": row.get(self._find_header(es_h, ["first"])), "Username": username,
-                      "Student ID": sid,
-                      target: s_val}  # Helper function to locate a column by matching its name to expected keywords
-            if sid in unique_s:
-                if s_num > float(unique_s[sid][target]): unique_s[sid] = record
-            else:
-                unique_s[sid] = record
-            if bb_u and username not in bb_u: not_in_bb.append(
-                f"Row {idx}: {record['First Name']} {record['Last Name']} ({username})")
-        rows = list(unique_s.values())
-        if rows and (zero_count / len(rows)) > 0.2:
-            self.root.config(cursor="")
-            if not messagebox.askyesno("Confirm", f"{zero_count} students have a score of 0. Continue?"):
-                return
-            self.root.config(cursor="wait");
-            self.root.update()
-        stats = {"avg": round(sum(scores) / len(scores), 1) if scores else 0, "high": max(scores) if scores else 0,
-                 "low": min(scores) if scores else 0}
-        not_in_es = [f"- {name} ({u})" for u, name in bb_u.items() if u not in {r['Username'] for r in rows}]
-        with open(out, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=["Last Name", "First Name", "Username", "Student ID", target]);
-            writer.writeheader();
-            writer.writerows(rows)
-        self.root.config(cursor="");
-        self.show_success_state(out, len(rows), stats)
-        if not_in_bb or not_in_es:
-            a_path = os.path.normpath(os.path.join(os.path.dirname(out), "Audit_Report.txt"))
-            with open(a_path, 'w', encoding='utf-8') as f:
-                f.write("EXAMSOFT TO BLACKBOARD AUDIT REPORT\n");
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n");
-                f.write("=" * 35 + "\n\n")
-                f.write(f"STATS: Avg {stats['avg']}% | High {stats['high']} | Low {stats['low']}\n\n")
-                if not_in_bb: f.write(
-                    f"⚠️ IN EXAMSOFT ONLY ({len(not_in_bb)}):\n" + "\n".join([f"- {s}" for s in not_in_bb]) + "\n")
-                if not_in_es: f.write(f"\n⚠️ MISSING SCORES ({len(not_in_es)}):\n" + "\n".join(not_in_es) + "\n")
-            if messagebox.askyesno("Audit Warning", "Roster mismatches detected. Open Audit Report?"): os.startfile(
-                a_path)
-    except Exception as e:
-        self.root.config(cursor=""); messagebox.showerror("Error",
-                                                          str(e))  # Show an error message dialog if something went wrong
-
-
-if __name__ == '__main__':
-    root = tk.Tk();
-    app = ExamSoftToBlackboardApp(root);
+    if os.environ.get(STARTUP_PROBE_ENV): root.after_idle(root.destroy)
     root.mainloop()
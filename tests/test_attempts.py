@@ -0,0 +1,49 @@
+import pytest  # Attempt policies
+
+from examsoft_to_blackboard.attempts import Attempts, check_policy, policy_for
+from examsoft_to_blackboard.core import merge_scores
+from examsoft_to_blackboard.headers import ColumnSchema
+from examsoft_to_blackboard.roster import RosterIndex
+
+ES_HEADERS = ["StudentID", "Last Name", "First Name", "Email", "%"]
+BB_HEADERS = ["Last Name", "First Name", "Username", "Student ID"]
+ATTEMPTS = [("1001", "jdoe", "70"), ("1002", "rroe", "90"), ("1001", "jdoe", "95"), ("1001", "jdoe", "60")]
+
+
+def _merge(policy, attempts=ATTEMPTS, roster=None):  # {username: score text} under a policy
+    rows = [dict(zip(ES_HEADERS, (sid, "Last", "First", f"{u}@example.com", s))) for sid, u, s in attempts]
+    res = merge_scores(rows, ColumnSchema(ES_HEADERS, "%"), roster if roster is not None else {}, policy=policy)
+    return {r.username: r.text for r in res["rows"]}
+
+
+@pytest.mark.parametrize("policy, expected", [
+    (None, "95.0"), ("max", "95.0"), ("first", "70.0"), ("latest", "60.0"), ("mean", "75.0"), ("drop_lowest", "82.5"),
+])
+def test_policies(policy, expected):  # Define a function
+    assert _merge(policy) == {"jdoe": expected, "rroe": "90.0"}
+
+
+def test_policies_across_two_exam_ids():  # One student under two ExamSoft IDs, joined through the roster
+    roster = RosterIndex.build([dict(zip(BB_HEADERS, ("Doe", "Jane", "jdoe", "1001")))], BB_HEADERS)
+    attempts = [("1001", "jdoe", "80"), ("9999", "jdoe", "40"), ("1001", "jdoe", "70")]
+    assert _merge("latest", attempts, roster) == {"jdoe": "70.0"}
+    assert _merge("max", attempts, roster) == {"jdoe": "80.0"}
+    assert _merge("mean", attempts, roster) == {"jdoe": "63.33"}
+    assert _merge("drop_lowest", attempts, roster) == {"jdoe": "75.0"}
+
+
+def test_attempts_accumulator():  # Define a function
+    acc = Attempts(50.0, 2)
+    acc.add(100.0, 5)
+    other = Attempts(30.0, 9)
+    acc.merge(other)
+    assert (acc.count, acc.low, acc.row) == (3, 30.0, 9)
+    assert acc.score("mean") == (60.0, "60.0") and acc.score("drop_lowest") == (75.0, "75.0")
+    assert Attempts(42.0, 2).score("drop_lowest") == (42.0, "42.0")  # A single attempt is never dropped
+
+
+def test_policy_names():  # Define a function
+    assert check_policy(None) == "max" and policy_for("Quiz 1", {"Quiz 1": "mean"}) == "mean"
+    assert policy_for("Quiz 1", {"Quiz 1": "mean"}, "first") == "first"
+    with pytest.raises(ValueError, match="Unknown attempt policy"):
+        check_policy("best")
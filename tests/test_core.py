@@ -0,0 +1,69 @@
+import json  # Conversion, streaming merge and patch mode
+import logging
+
+import pytest
+
+from examsoft_to_blackboard import metrics
+from examsoft_to_blackboard.core import convert, patch_gradebook
+from examsoft_to_blackboard.csvio import detect_format
+
+TARGET = "Quiz 1 [Total Pts: 100 Percentage] |1736330"
+GRADEBOOK = f"Last Name,First Name,Username,Student ID,{TARGET}\nDoe,Jane,jdoe,1001,\nRoe,Rick,rroe,1002,\n"
+
+
+def _write(path, text, encoding="utf-8"):  # Define a function
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def test_streaming_counts_records_not_lines(tmp_path):  # A quoted cell spanning lines is still one record
+    es = _write(tmp_path / "es.csv", 'StudentID,Last Name,First Name,Email,%,Comment\n'
+                                     '1001,Doe,Jane,jdoe@example.com,85,"two\nlines"\n'
+                                     '1002,Roe,Rick,rroe@example.com,70,"three\nmore\nlines"\n')
+    bb = _write(tmp_path / "bb.csv", GRADEBOOK)
+    sink = tmp_path / "metrics.jsonl"
+    handler = metrics.open_sink(str(sink))
+    try:
+        res = convert(es, bb, str(tmp_path / "out.csv"), target=TARGET, index_dir=None, streaming=True)
+    finally:
+        metrics.log.removeHandler(handler)
+        handler.close()
+        metrics.log.setLevel(logging.NOTSET)
+    assert res["row_count"] == 2 and len(res["rows"]) == 2
+    match = [r for r in map(json.loads, sink.read_text().splitlines()) if r["stage"] == "match"]
+    assert match and match[0]["rows"] == 2
+
+
+def _render(rows, delimiter, newline, quote_all):  # CSV text as a spreadsheet or Blackboard would write it
+    def cell(c): return f'"{c}"' if quote_all or delimiter in c else c
+    return newline.join(delimiter.join(cell(c) for c in row) for row in rows) + newline
+
+
+@pytest.mark.parametrize("encoding, delimiter, newline, quote_all", [
+    ("utf-8", ",", "\n", False), ("utf-8", ",", "\r\n", False), ("utf-8-sig", ",", "\r\n", False),
+    ("utf-8-sig", ",", "\r\n", True), ("utf-16", "\t", "\r\n", True), ("latin-1", "\t", "\n", False),
+])
+def test_patch_gradebook_is_byte_faithful(tmp_path, encoding, delimiter, newline, quote_all):  # Only targets change
+    rows = [["Last Name", "First Name", "Username", "Student ID", TARGET, "Notes"],
+            ["Doe", "Zoë", "jdoe", "1001", "", "late, excused"], ["Roe", "Rick", "RRoe", "1002", "50", ""],
+            ["Poe", "Ann", "apoe", "1003", "", "x"]]
+    bb = _write(tmp_path / "bb.csv", _render(rows, delimiter, newline, quote_all), encoding)
+    out = tmp_path / "out.csv"
+    res = patch_gradebook(bb, str(out), {TARGET: {"jdoe": "85.0", "rroe": "70.0", "nobody": "10.0"}})
+    assert res == {"rows": 3, "filled": {TARGET: 2}}
+    rows[1][4], rows[2][4] = "85.0", "70.0"
+    assert out.read_bytes() == _render(rows, delimiter, newline, quote_all).encode(encoding)
+
+
+def test_detect_format_keeps_a_missing_bom(tmp_path):  # Define a function
+    assert detect_format(_write(tmp_path / "plain.csv", GRADEBOOK))[0] == "utf-8"
+    assert detect_format(_write(tmp_path / "bom.csv", GRADEBOOK, "utf-8-sig"))[0] == "utf-8-sig"
+    assert detect_format(_write(tmp_path / "latin.csv", GRADEBOOK.replace("Jane", "Zoë"), "latin-1"))[0] == "latin-1"
+
+
+def test_patch_mode_convert(tmp_path):  # convert(patch=True) writes the whole gradebook, scores filled in
+    es = _write(tmp_path / "es.csv", "StudentID,Last Name,First Name,Email,%\n1001,Doe,Jane,jdoe@example.com,85\n")
+    bb = _write(tmp_path / "bb.csv", GRADEBOOK)
+    out = tmp_path / "out.csv"
+    convert(es, bb, str(out), target=TARGET, index_dir=None, patch=True)
+    assert out.read_text(encoding="utf-8") == GRADEBOOK.replace("jdoe,1001,", "jdoe,1001,85.0")
@@ -0,0 +1,19 @@
+from examsoft_to_blackboard.headers import ColumnSchema, score_columns  # Header resolution
+
+
+def test_student_id_aliases():  # Define a function
+    for header in ("Student ID", "StudentID", "studentid", "STUDENT_ID", "Student ID Number", "Exam Taker ID"):
+        assert ColumnSchema(["Email", header]).student_id == header
+    assert ColumnSchema(["Email", "ID", "Score"]).student_id == ""  # Any identifier; never the student ID
+    assert ColumnSchema(["ID", "Student ID"]).student_id == "Student ID"
+
+
+def test_field_aliases_do_not_cross():  # Define a function
+    schema = ColumnSchema(["Last Access", "Student Email", "Username", "Last Name", "First Name"])
+    assert (schema.last, schema.first, schema.email, schema.student_id) == ("Last Name", "First Name",
+                                                                             "Student Email", "")
+
+
+def test_score_columns_prefer_percent():  # Define a function
+    found, default = score_columns(["StudentID", "Email", "Pts", "Letter", "%", "Raw", "Attempts"])
+    assert found == ["Pts", "%", "Raw"] and default == "%"
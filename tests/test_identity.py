@@ -0,0 +1,59 @@
+from examsoft_to_blackboard.identity import (CONFLICT_CONFIDENCE, IdentityResolver, ids_compatible,  # Matching
+                                             normalise_id, normalise_name)
+from examsoft_to_blackboard.roster import RosterIndex
+
+HEADERS = ["Last Name", "First Name", "Username", "Student ID", "Email"]
+ROSTER = [("Garcia", "Stacy", "sgarcia", "0021918", "stacy.garcia@example.com"),
+          ("Lopez", "Nolan", "nlopez", "24809574", ""),
+          ("O'Brien", "Zoë", "zobrien", "31415926", ""),
+          ("Montgomery", "Christopher", "cmontgomery", "11111111", ""),
+          ("Montgomerie", "Christopher", "cmontgomerie", "22222222", "")]
+
+
+def _resolver(rows=ROSTER):  # Define a function
+    return IdentityResolver(RosterIndex.build([dict(zip(HEADERS, r)) for r in rows], HEADERS))
+
+
+def _row(resolver, username):  # Define a function
+    return resolver.roster.by_username[username]
+
+
+def test_normalisation():  # Define a function
+    assert normalise_id(" 0012345 ") == "12345" and normalise_id("A012") == "a012"
+    assert normalise_name("Zoë", "O'Brien") == normalise_name("o brien", "ZOE") == "brien o zoe"
+    assert ids_compatible("12345", "12354") and ids_compatible("12345", "12346") and ids_compatible("", "1")
+    assert not ids_compatible("12345", "54321") and not ids_compatible("123", "1234")
+
+
+def test_exact_matches_id_first_then_username():  # Define a function
+    r = _resolver()
+    match = r.exact("21918", "someone@else.edu")  # Leading zeros dropped by a spreadsheet
+    assert (match.row, match.method, match.confidence) == (_row(r, "sgarcia"), "id", 1.0)
+    match = r.exact("", "nlopez+exam@example.com")
+    assert (match.row, match.method) == (_row(r, "nlopez"), "username")
+    match = r.exact("", "Stacy.Garcia@example.com")  # The gradebook's own email column
+    assert match.row == _row(r, "sgarcia")
+    assert r.exact("", "", username="zobrien").row == _row(r, "zobrien")
+    assert r.exact("99999999", "nobody@example.com") is None
+
+
+def test_conflicting_id_and_username():  # The ID wins, with a lower confidence for the audit
+    r = _resolver()
+    match = r.exact("24809574", "sgarcia@example.com")
+    assert (match.row, match.method, match.confidence) == (_row(r, "nlopez"), "id", CONFLICT_CONFIDENCE)
+
+
+def test_resolve_falls_back_to_names():  # Define a function
+    r = _resolver()
+    found = r.resolve([("a", "", "x1@example.com", "x1", "ZOE", "O'BRIEN"),  # No accent
+                       ("b", "99999999", "x2@example.com", "x2", "Stacy", "Garcia"),  # ID clearly differs
+                       ("c", "", "nlopez@example.com", "nlopez", "Nolan", "Lopez")])
+    assert found["a"].row == _row(r, "zobrien") and found["a"].method == "name" and found["a"].confidence < 1
+    assert "b" not in found
+    assert found["c"].method == "username"
+
+
+def test_ambiguous_names_are_not_matched():  # Close to two students: nobody is matched
+    r = _resolver()
+    assert r.resolve([("a", "", "x@example.com", "x", "Christopher", "Montgomeri")]) == {}
+    assert r.resolve([("a", "", "x@example.com", "x", "Christofer", "Montgomery")])["a"].row == _row(r, "cmontgomery")
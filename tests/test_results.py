@@ -0,0 +1,56 @@
+from examsoft_to_blackboard.core import build_import, convert  # Result cache and roster digest
+from examsoft_to_blackboard.csvio import load_csv
+from examsoft_to_blackboard.results import ResultCache, roster_digest
+from examsoft_to_blackboard.roster import RosterIndex
+
+ES = "StudentID,Last Name,First Name,Email,%\n1001,Doe,Jane,jdoe@example.com,85\n1002,Roe,Rick,rroe@example.com,70\n"
+TARGET = "Quiz 1 [Total Pts: 100 Percentage] |1736330"
+
+
+def _write(path, text):  # Define a function
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def _roster(rows, headers=("Last Name", "First Name", "Username", "Student ID", "Email")):  # Define a function
+    return RosterIndex.build([dict(zip(headers, r)) for r in rows], list(headers))
+
+
+def test_convert_cached_without_name_columns(tmp_path):  # First/Last Name missing: the roster holds None names
+    es = _write(tmp_path / "es.csv", ES)
+    bb = _write(tmp_path / "bb.csv", f"Username,Student ID,{TARGET}\njdoe,1001,\nrroe,1002,\n")
+    cache = ResultCache(str(tmp_path / "cache"))
+    first = convert(es, bb, str(tmp_path / "out.csv"), target=TARGET, index_dir=None, results=cache)
+    again = convert(es, bb, str(tmp_path / "out.csv"), target=TARGET, index_dir=None, results=cache)
+    assert not first["cached"] and again["cached"]
+    assert [r.text for r in again["rows"]] == [r.text for r in first["rows"]]
+    assert again["diff"] == {"added": [], "removed": [], "changed": []}
+
+
+def test_roster_digest_covers_ids_and_emails():  # Define a function
+    base = _roster([("Doe", "Jane", "jdoe", "1001", "jdoe@example.com")])
+    assert roster_digest(base) == roster_digest(_roster([("Doe", "Jane", "jdoe", "1001", "jdoe@example.com")]))
+    assert roster_digest(base) != roster_digest(_roster([("Doe", "Jane", "jdoe", "1002", "jdoe@example.com")]))
+    assert roster_digest(base) != roster_digest(_roster([("Doe", "Jane", "jdoe", "1001", "jane@example.com")]))
+
+
+def test_cache_round_trip_and_last_run(tmp_path):  # Define a function
+    es = _write(tmp_path / "es.csv", ES)
+    roster = _roster([("Doe", "Jane", "jdoe", "1001", ""), ("Roe", "Rick", "rroe", "1002", "")])
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.key(es, roster, "%", TARGET)
+    assert cache.get(key) is None
+    assert cache.key(es, roster, "%", TARGET, policy="latest") != key
+    calls = []
+
+    def compute():  # Define a function
+        calls.append(1)
+        rows, headers = load_csv(es)
+        return build_import(rows, headers, None, None, "%", roster=roster)
+
+    res = cache.merge(es, roster, "%", TARGET, compute, gradebook_path="bb.csv")
+    assert not res["cached"] and cache.get(key) is not None
+    assert cache.merge(es, roster, "%", TARGET, compute, gradebook_path="bb.csv")["cached"] and len(calls) == 1
+    assert cache.last_key("bb.csv", TARGET) is None  # Nothing exported yet
+    cache.set_last("bb.csv", TARGET, key)
+    assert cache.last_key("bb.csv", TARGET) == key and cache.last_key("other.csv", TARGET) is None
@@ -0,0 +1,46 @@
+import pytest  # Score cell normalisation
+
+from examsoft_to_blackboard.core import merge_scores, preview_rows
+from examsoft_to_blackboard.headers import ColumnSchema
+from examsoft_to_blackboard.scores import ScoreParser, parse_score, read_score
+
+HEADERS = ["StudentID", "Last Name", "First Name", "Email", "%"]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("85.5", (85.5, "85.5")), ("85.5%", (85.5, "85.5")), (" 85.5 pts", (85.5, "85.5")), ("100", (100.0, "100.0")),
+    ("85,5", (85.5, "85.5")), ("85,50", (85.5, "85.5")), ("1,234.5", (1234.5, "1234.5")),
+    ("1,234,567", (1234567.0, "1234567.0")), ("38/50", (76.0, "76.0")), ("-5", (-5.0, "-5.0")),
+    ("", (0.0, "0")), (None, (0.0, "0")), ("N/A", (0.0, "0")), ("absent", (0.0, "0")), ("abc", (0.0, "0")),
+])
+def test_parse_score(raw, expected):  # Define a function
+    assert parse_score(raw) == expected
+
+
+@pytest.mark.parametrize("raw, guess", [
+    ("85", None), ("85,5", None), ("1,234.5", None), ("38/50", None), ("N/A", None), ("", None),
+    ("85,500", "ambiguous"), ("1,234", "ambiguous"),
+    ("1e3", "partial"), ("1.2.3", "partial"), ("Q2: 85", "partial"),
+    ("abc", "unreadable"), ("38/0", "unreadable"),
+])
+def test_read_score_reports_guesses(raw, guess):  # Define a function
+    assert read_score(raw)[2] == guess
+
+
+def test_column_matches_cell_by_cell():  # Define a function
+    values = ["85", "85,500", "1e3", "", "38/50", "85"]
+    numbers, texts, guesses = ScoreParser().column(values)
+    assert list(zip(numbers, texts, guesses)) == [read_score(v) for v in values]
+
+
+def _rows(scores):  # ExamSoft rows, one student per score
+    return [dict(zip(HEADERS, (str(i), f"Last{i}", f"First{i}", f"s{i}@example.com", s)))
+            for i, s in enumerate(scores, start=1)]
+
+
+def test_guessed_cells_reach_the_audit_and_preview():  # Define a function
+    rows = _rows(["90", "85,500", "1e3"])
+    res = merge_scores(rows, ColumnSchema(HEADERS, "%"), {})
+    assert [line.split(":")[0] for line in res["modified"]] == ["Row 3", "Row 4"]
+    tags = {user: tags for (user, _, _), tags in preview_rows(rows, HEADERS, "%", None, limit=None)}
+    assert "modified" in tags["s2"] and "modified" in tags["s3"]
@@ -0,0 +1,29 @@
+import pytest  # Upload client against the local mock gradebook server
+
+from examsoft_to_blackboard.mockserver import MockGradebookServer
+from examsoft_to_blackboard.upload import GradebookClient, UploadError
+
+COLUMN = "_1736330_1"
+
+
+def _server(**kwargs):  # Define a function
+    return MockGradebookServer({COLUMN: "Quiz 1"}, ["jdoe", "rroe"], **kwargs)
+
+
+def test_expired_token_is_renewed_without_a_retry():  # Define a function
+    with _server() as srv, GradebookClient(srv.url, srv.course_id, key="key", secret="secret", retries=0) as client:
+        assert client.set_grade(COLUMN, "jdoe", 85.0)[0] == 200
+        srv.tokens.clear()  # Every issued token expires
+        assert client.set_grade(COLUMN, "rroe", 70.0) == (200, "")
+        assert srv.grades == {(COLUMN, "jdoe"): 85.0, (COLUMN, "rroe"): 70.0} and client.retried == 0
+
+
+def test_throttling_is_retried_then_gives_up():  # Define a function
+    with _server(throttle_every=2) as srv, GradebookClient(srv.url, srv.course_id, key="key", secret="secret",
+                                                            retries=2, backoff=0.001) as client:
+        assert client.set_grade(COLUMN, "jdoe", 85.0)[0] == 200  # Token (1), grade throttled (2), grade again (3)
+        assert client.retried == 1
+    with _server(fail_rate=1.0) as srv, GradebookClient(srv.url, srv.course_id, token="t", retries=1,
+                                                        backoff=0.001) as client:
+        with pytest.raises(UploadError, match="after 2 attempts"):
+            client.set_grade(COLUMN, "jdoe", 85.0)